@@ -1,9 +1,9 @@
 """
 Endpoints para gestión de embeddings
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from core.database import get_db
+from core.database import get_db, SessionLocal
 
 router = APIRouter()
 
@@ -23,3 +23,89 @@ async def generar_embedding(
     resultado = await embedding_service.generar_embedding_fallo(fallo_id)
     
     return {"mensaje": "Embedding generado exitosamente", "fallo_id": fallo_id}
+
+
+def _backfill_en_segundo_plano(modelo: str):
+    """Corre fuera del request, con su propia sesión"""
+    from core.services.embedding_set_service import EmbeddingSetService
+    
+    db = SessionLocal()
+    try:
+        EmbeddingSetService(db).backfill(modelo)
+    finally:
+        db.close()
+
+
+@router.get("/sets")
+async def listar_sets(db: Session = Depends(get_db)):
+    """
+    Sets de embeddings por modelo con su estado y progreso
+    """
+    from core.services.embedding_set_service import EmbeddingSetService
+    
+    return EmbeddingSetService(db).listar()
+
+
+@router.post("/sets")
+async def crear_set(
+    modelo: str = Query(..., min_length=1),
+    dimensiones: int = Query(..., gt=0, le=16000),
+    activar: bool = Query(False, description="Activarlo de inmediato (solo para el primer set)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Registrar un modelo nuevo. Desde ese momento los fallos nuevos
+    se embeben también con este modelo.
+    """
+    from core.services.embedding_set_service import EmbeddingSetService
+    
+    embedding_set = EmbeddingSetService(db).crear_set(modelo, dimensiones, activar)
+    return {"modelo": embedding_set.modelo, "dimensiones": embedding_set.dimensiones, "estado": embedding_set.estado}
+
+
+@router.post("/sets/{modelo:path}/backfill", status_code=202)
+async def backfill_set(modelo: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Completar el set en segundo plano, en lotes y con pausas
+    """
+    from core.models import EmbeddingSet
+    
+    if db.get(EmbeddingSet, modelo) is None:
+        raise HTTPException(status_code=404, detail="Set de embeddings no encontrado")
+    
+    background_tasks.add_task(_backfill_en_segundo_plano, modelo)
+    return {"mensaje": "Backfill iniciado", "modelo": modelo}
+
+
+@router.post("/sets/{modelo:path}/activar")
+async def activar_set(
+    modelo: str,
+    forzar: bool = Query(False, description="Activar aunque falten fallos por embeber"),
+    db: Session = Depends(get_db)
+):
+    """
+    Corte atómico: las búsquedas pasan a usar este set
+    """
+    from core.services.embedding_set_service import EmbeddingSetService
+    
+    try:
+        embedding_set = EmbeddingSetService(db).activar(modelo, forzar)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {"modelo": embedding_set.modelo, "estado": embedding_set.estado, "activado_en": embedding_set.activado_en}
+
+
+@router.delete("/sets/{modelo:path}")
+async def eliminar_set(modelo: str, db: Session = Depends(get_db)):
+    """
+    Borrar los vectores e índice de un set que ya no se usa
+    """
+    from core.services.embedding_set_service import EmbeddingSetService
+    
+    try:
+        EmbeddingSetService(db).eliminar(modelo)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {"mensaje": "Set eliminado", "modelo": modelo}
@@ -1,33 +1,97 @@
 """
 Endpoints para gestión de etiquetas
 """
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import Optional, List
-from core.database import get_db
+import json
+from fastapi import APIRouter, Request, Response
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Optional, List, Callable
+from core.config import settings
+from core.database import SessionLocal
 from core.models import Etiqueta
 from core.schemas import EtiquetaResponse
+from core.services.catalogo_service import SQL_FIRMA, catalogo_etiquetas
 
 router = APIRouter()
 
 
+def _firma_etiquetas() -> Optional[tuple]:
+    """Firma de la tabla etiquetas (None si la base no responde: se sigue sirviendo la cache)"""
+    db = SessionLocal()
+    try:
+        return tuple(db.execute(SQL_FIRMA).one())
+    except SQLAlchemyError:
+        return None
+    finally:
+        db.close()
+
+
+def _coincide(si_no_coincide: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match con comparación débil (RFC 9110): acepta listas
+    separadas por coma, etiquetas W/ y '*'
+    """
+    if not si_no_coincide:
+        return False
+    for candidato in si_no_coincide.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _respuesta_cacheada(request: Request, clave: str, cargar: Callable[[], object]) -> Response:
+    """
+    Sirve desde el catálogo cacheado con ETag fuerte y Cache-Control.
+    Un If-None-Match que coincide responde 304 sin leer el catálogo.
+    """
+    headers = {"Cache-Control": f"public, max-age={settings.CATALOGO_MAX_AGE_SECONDS}"}
+    si_no_coincide = request.headers.get("if-none-match")
+    catalogo_etiquetas.revalidar(_firma_etiquetas)
+
+    etag = catalogo_etiquetas.etag(clave)
+    if etag and _coincide(si_no_coincide, etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    def serializar() -> bytes:
+        return json.dumps(cargar(), ensure_ascii=False, default=str).encode("utf-8")
+
+    cuerpo, etag = catalogo_etiquetas.obtener(clave, serializar)
+    headers["ETag"] = etag
+    if _coincide(si_no_coincide, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cuerpo, media_type="application/json", headers=headers)
+
+
 @router.get("/", response_model=List[EtiquetaResponse])
 async def listar_etiquetas(
-    categoria: Optional[str] = None,
-    db: Session = Depends(get_db)
+    request: Request,
+    categoria: Optional[str] = None
 ):
     """Listar todas las etiquetas disponibles"""
-    query = db.query(Etiqueta)
-    
-    if categoria:
-        query = query.filter(Etiqueta.categoria == categoria)
-    
-    etiquetas = query.all()
-    return etiquetas
+    def cargar():
+        db = SessionLocal()
+        try:
+            query = db.query(Etiqueta)
+
+            if categoria:
+                query = query.filter(Etiqueta.categoria == categoria)
+
+            return [EtiquetaResponse.model_validate(e).model_dump() for e in query.all()]
+        finally:
+            db.close()
+
+    return _respuesta_cacheada(request, f"etiquetas:{categoria or ''}", cargar)
 
 
 @router.get("/categorias")
-async def listar_categorias(db: Session = Depends(get_db)):
+async def listar_categorias(request: Request):
     """Listar todas las categorías de etiquetas"""
-    categorias = db.query(Etiqueta.categoria).distinct().all()
-    return {"categorias": [cat[0] for cat in categorias if cat[0]]
+    def cargar():
+        db = SessionLocal()
+        try:
+            categorias = db.query(Etiqueta.categoria).distinct().all()
+            return {"categorias": [cat[0] for cat in categorias if cat[0]]}
+        finally:
+            db.close()
+
+    return _respuesta_cacheada(request, "categorias", cargar)
@@ -1,12 +1,15 @@
 """
 Endpoints para gestión de fallos
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from core.database import get_db
 from core.models import Fallo
-from core.schemas import FalloResponse, FalloCreate
+from core.schemas import FalloResponse, FalloCreate, FalloBulkResponse
 
 router = APIRouter()
 
@@ -40,6 +43,76 @@ async def obtener_fallo(
     return fallo
 
 
+@router.get("/{fallo_id}/normas")
+async def obtener_normas_fallo(
+    fallo_id: int,
+    db: Session = Depends(get_db)
+):
+    """Normas y artículos citados por un fallo (extraídos del texto completo)"""
+    from core.services.normativa_service import NormativaService
+
+    if db.query(Fallo.id).filter(Fallo.id == fallo_id).first() is None:
+        raise HTTPException(status_code=404, detail="Fallo no encontrado")
+    return NormativaService(db).normas_de_fallo(fallo_id)
+
+
+@router.get("/{fallo_id}/similares")
+async def obtener_similares_fallo(
+    fallo_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    etiquetas: Optional[List[str]] = Query(None),
+    materia: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    norma: Optional[str] = Query(None, description="Ej: 'art 245 LCT'"),
+    explain: bool = Query(False, description="Incluir tiempos por etapa y plan de la consulta"),
+    db: Session = Depends(get_db)
+):
+    """
+    Fallos parecidos a este (usa su embedding guardado como consulta),
+    con los mismos filtros que la búsqueda híbrida
+    """
+    from api.routes.search import _validar_norma
+    from core.metrics import perfilar
+    from core.services.search_service import SearchService
+
+    _validar_norma(norma)
+    if db.query(Fallo.id).filter(Fallo.id == fallo_id).first() is None:
+        raise HTTPException(status_code=404, detail="Fallo no encontrado")
+
+    with perfilar("similares", explain) as perfil:
+        try:
+            resultados = await SearchService(db).buscar_similares(
+                fallo_id=fallo_id,
+                limit=limit,
+                etiquetas=etiquetas,
+                materia=materia,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                norma=norma
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        respuesta = {"fallo_id": fallo_id, "resultados": resultados, "total": len(resultados)}
+    if explain:
+        respuesta["explain"] = perfil.resumen()
+    return respuesta
+
+
+@router.get("/{fallo_id}/duplicados")
+async def obtener_duplicados_fallo(
+    fallo_id: int,
+    db: Session = Depends(get_db)
+):
+    """Fallo canónico y copias casi idénticas del grupo del fallo"""
+    from core.services.duplicado_service import DuplicadoService
+
+    grupo = DuplicadoService(db).grupo(fallo_id)
+    if grupo["canonico_id"] is None:
+        raise HTTPException(status_code=404, detail="Fallo no encontrado")
+    return grupo
+
+
 @router.post("/", response_model=FalloResponse)
 async def crear_fallo(
     fallo_data: FalloCreate,
@@ -51,3 +124,48 @@ async def crear_fallo(
     db.commit()
     db.refresh(fallo)
     return fallo
+
+
+@router.post("/bulk", response_model=FalloBulkResponse)
+async def crear_fallos_bulk(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Alta masiva de fallos (usado por el scraper)
+    Acepta un array JSON o NDJSON (Content-Type: application/x-ndjson).
+    Deduplica por url_original/expediente y devuelve id y estado por fila.
+    """
+    from core.services.fallo_service import FalloService, CREADO, DUPLICADO, INVALIDO
+
+    cuerpo = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            filas = [json.loads(linea) for linea in cuerpo.splitlines() if linea.strip()]
+        else:
+            filas = json.loads(cuerpo)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+
+    if not isinstance(filas, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un array JSON o NDJSON")
+
+    fallos, errores = [], {}
+    for indice, fila in enumerate(filas):
+        try:
+            fallos.append(FalloCreate(**fila))
+        except (ValidationError, TypeError) as e:
+            fallos.append(None)
+            errores[indice] = str(e)
+
+    resultados = FalloService(db).crear_fallos_bulk(fallos)
+    for resultado in resultados:
+        if resultado["estado"] == INVALIDO:
+            resultado["error"] = errores.get(resultado["indice"])
+
+    return {
+        "creados": sum(1 for r in resultados if r["estado"] == CREADO),
+        "duplicados": sum(1 for r in resultados if r["estado"] == DUPLICADO),
+        "invalidos": len(errores),
+        "resultados": resultados
+    }
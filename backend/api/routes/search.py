@@ -1,14 +1,28 @@
 """
 Endpoints de búsqueda semántica e híbrida
 """
-from fastapi import APIRouter, Depends, Query
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from core.database import get_db
+from core.metrics import perfilar
+from core.services.normativa_service import interpretar_consulta
 from core.services.search_service import SearchService
 
 router = APIRouter()
 
+DESCRIPCION_NORMA = "Solo fallos que citan la norma o artículo (Ej: 'art 245 LCT', 'Ley 20744')"
+
+
+def _validar_norma(norma: Optional[str]):
+    """400 si el filtro de norma no se puede interpretar"""
+    if norma:
+        try:
+            interpretar_consulta(norma)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.get("/semantica")
 async def buscar_semantica(
@@ -16,19 +30,34 @@ async def buscar_semantica(
     limit: int = Query(10, ge=1, le=100),
     materia: Optional[str] = None,
     tipo_proceso: Optional[str] = None,
+    norma: Optional[str] = Query(None, description=DESCRIPCION_NORMA),
+    facetas: bool = Query(False, description="Incluir conteos por faceta"),
+    rerank: bool = Query(False, description="Re-ordenar los primeros resultados con el re-ranker"),
+    explain: bool = Query(False, description="Incluir tiempos por etapa y plan de la consulta"),
     db: Session = Depends(get_db)
 ):
     """
     Búsqueda semántica de fallos usando embeddings
     """
-    search_service = SearchService(db)
-    resultados = await search_service.buscar_semantica(
-        query=query,
-        limit=limit,
-        materia=materia,
-        tipo_proceso=tipo_proceso
-    )
-    return {"resultados": resultados, "total": len(resultados)}
+    _validar_norma(norma)
+    with perfilar("semantica", explain) as perfil:
+        search_service = SearchService(db)
+        resultados = await search_service.buscar_semantica(
+            query=query,
+            limit=search_service.candidatos(limit, rerank),
+            materia=materia,
+            tipo_proceso=tipo_proceso,
+            norma=norma
+        )
+        rerank_aplicado = False
+        if rerank:
+            resultados, rerank_aplicado = await search_service.reordenar(query, resultados, limit)
+        respuesta = {"resultados": resultados, "total": len(resultados), "rerank": rerank_aplicado}
+        if facetas:
+            respuesta["facetas"] = search_service.facetas(materia=materia, tipo_proceso=tipo_proceso, norma=norma)
+    if explain:
+        respuesta["explain"] = perfil.resumen()
+    return respuesta
 
 
 @router.get("/hibrida")
@@ -37,20 +66,122 @@ async def buscar_hibrida(
     limit: int = Query(10, ge=1, le=100),
     etiquetas: Optional[List[str]] = Query(None),
     materia: Optional[str] = None,
-    fecha_desde: Optional[str] = None,
-    fecha_hasta: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    norma: Optional[str] = Query(None, description=DESCRIPCION_NORMA),
+    facetas: bool = Query(False, description="Incluir conteos por faceta"),
+    rerank: bool = Query(False, description="Re-ordenar los primeros resultados con el re-ranker"),
+    explain: bool = Query(False, description="Incluir tiempos por etapa y plan de la consulta"),
     db: Session = Depends(get_db)
 ):
     """
     Búsqueda híbrida: combina filtros SQL con búsqueda semántica
     """
+    _validar_norma(norma)
+    with perfilar("hibrida", explain) as perfil:
+        search_service = SearchService(db)
+        resultados = await search_service.buscar_hibrida(
+            query=query,
+            limit=search_service.candidatos(limit, rerank),
+            etiquetas=etiquetas,
+            materia=materia,
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            norma=norma
+        )
+        rerank_aplicado = False
+        if rerank:
+            resultados, rerank_aplicado = await search_service.reordenar(query, resultados, limit)
+        respuesta = {"resultados": resultados, "total": len(resultados), "rerank": rerank_aplicado}
+        if facetas:
+            respuesta["facetas"] = search_service.facetas(
+                materia=materia,
+                etiquetas=etiquetas,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                norma=norma
+            )
+    if explain:
+        respuesta["explain"] = perfil.resumen()
+    return respuesta
+
+
+@router.get("/pasajes")
+async def buscar_pasajes(
+    query: str = Query(..., description="Consulta en lenguaje natural"),
+    limit: int = Query(10, ge=1, le=100),
+    agregacion: str = Query("max", pattern="^(max|sum)$", description="Puntaje del fallo: mejor pasaje o suma"),
+    materia: Optional[str] = None,
+    tipo_proceso: Optional[str] = None,
+    norma: Optional[str] = Query(None, description=DESCRIPCION_NORMA),
+    rerank: bool = Query(False, description="Re-ordenar los primeros resultados con el re-ranker"),
+    explain: bool = Query(False, description="Incluir tiempos por etapa y plan de la consulta"),
+    db: Session = Depends(get_db)
+):
+    """
+    Búsqueda en el texto completo de los fallos, por pasajes
+    (devuelve el pasaje que mejor coincide en cada fallo)
+    """
+    _validar_norma(norma)
+    with perfilar("pasajes", explain) as perfil:
+        search_service = SearchService(db)
+        resultados = await search_service.buscar_pasajes(
+            query=query,
+            limit=search_service.candidatos(limit, rerank),
+            agregacion=agregacion,
+            materia=materia,
+            tipo_proceso=tipo_proceso,
+            norma=norma
+        )
+        rerank_aplicado = False
+        if rerank:
+            resultados, rerank_aplicado = await search_service.reordenar(query, resultados, limit)
+        respuesta = {"resultados": resultados, "total": len(resultados), "rerank": rerank_aplicado}
+    if explain:
+        respuesta["explain"] = perfil.resumen()
+    return respuesta
+
+
+@router.get("/normativa")
+async def buscar_normativa(
+    norma: str = Query(..., description="Norma o artículo (Ej: 'art 245 LCT', 'Ley 20744 Art 245')"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    explain: bool = Query(False, description="Incluir tiempos por etapa y plan de la consulta"),
+    db: Session = Depends(get_db)
+):
+    """
+    Fallos que citan una norma o artículo: búsqueda exacta en el índice de
+    citas (sin embeddings), de los que más la mencionan a los que menos
+    """
+    _validar_norma(norma)
+    with perfilar("normativa", explain) as perfil:
+        respuesta = SearchService(db).buscar_normativa(norma, limit=limit, offset=offset)
+    if explain:
+        respuesta["explain"] = perfil.resumen()
+    return respuesta
+
+
+@router.get("/facetas")
+async def obtener_facetas(
+    etiquetas: Optional[List[str]] = Query(None),
+    materia: Optional[str] = None,
+    tipo_proceso: Optional[str] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    norma: Optional[str] = Query(None, description=DESCRIPCION_NORMA),
+    db: Session = Depends(get_db)
+):
+    """
+    Conteos por faceta para los filtros dados (sin consulta semántica)
+    """
+    _validar_norma(norma)
     search_service = SearchService(db)
-    resultados = await search_service.buscar_hibrida(
-        query=query,
-        limit=limit,
-        etiquetas=etiquetas,
+    return search_service.facetas(
         materia=materia,
+        tipo_proceso=tipo_proceso,
+        etiquetas=etiquetas,
         fecha_desde=fecha_desde,
-        fecha_hasta=fecha_hasta
+        fecha_hasta=fecha_hasta,
+        norma=norma
     )
-    return {"resultados": resultados, "total": len(resultados)}
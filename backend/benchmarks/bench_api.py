@@ -0,0 +1,427 @@
+"""
+Benchmark de carga de la API de JurisAR
+
+1. Siembra (--fallos N): crea el esquema si hace falta y carga un corpus
+   sintético reproducible (--semilla) de N fallos. Los fallos pasan por
+   el pipeline de ingesta real (extract → tag → embed, con pasajes), con
+   IA y embeddings reemplazados por los stubs determinísticos de
+   core/services/stubs.py: sin red ni costos. Se informa el throughput
+   de la ingesta.
+2. Carga: cada escenario (búsquedas, listado y detalle de fallos, alta
+   masiva) se ejecuta con --concurrencia clientes durante --duracion
+   segundos, después de --calentamiento segundos que no se miden.
+3. Informe: requests, errores, requests/s y p50/p95/p99 por escenario.
+   --guardar-baseline guarda el resultado; --baseline lo compara y sale
+   con código 1 si el p95 empeora o el throughput cae más de --tolerancia.
+
+Si no se indica --url, la API se levanta con uvicorn dentro del proceso
+(con los stubs y sin cache de búsquedas, salvo --cache). Con --url el
+servidor externo debería correr con IA_PROVIDER, EMBEDDING_PROVIDER y
+RERANK_PROVIDER en 'stub'. Con --asgi no hay red: cliente y API
+comparten el event loop (sirve para perfilar, no para medir concurrencia).
+
+Uso (desde backend/, con DATABASE_URL apuntando a una base de pruebas):
+    python -m benchmarks.bench_api --fallos 2000 --solo-sembrar
+    python -m benchmarks.bench_api --concurrencia 16 --duracion 30 --guardar-baseline benchmarks/baseline_api.json
+    python -m benchmarks.bench_api --concurrencia 16 --duracion 30 --baseline benchmarks/baseline_api.json
+    python -m benchmarks.bench_api --url http://localhost:8000 --escenarios semantica hibrida
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import resumen_latencias
+
+FIXTURE = Path(__file__).parent / "fixtures" / "embeddings_legal_es.json"
+PREFIJO_CORPUS = "https://bench.local/corpus/"
+PREFIJO_ALTAS = "https://bench.local/alta/"
+
+# materia → (objeto del juicio, temas del considerando)
+CORPUS = {
+    "LABORAL": ("DESPIDO", [
+        "el actor reclama la indemnización por despido sin causa del art. 245 de la Ley 20.744",
+        "la relación laboral no se encontraba debidamente registrada",
+        "se reclaman horas extras y diferencias salariales por categoría",
+        "corresponden los incrementos indemnizatorios de la Ley 25.323",
+    ]),
+    "CIVIL": ("DAÑOS Y PERJUICIOS", [
+        "el accidente de tránsito ocurrió en la intersección de ruta nacional 9",
+        "la responsabilidad objetiva del dueño o guardián de la cosa riesgosa",
+        "se reclama daño moral, lucro cesante y gastos médicos",
+        "la citada en garantía opone la exclusión de cobertura",
+    ]),
+    "PENAL": ("ROBO", [
+        "el imputado fue sorprendido en flagrancia por el personal policial",
+        "la defensa plantea la nulidad del allanamiento por falta de orden",
+        "el fiscal solicita la prisión preventiva por riesgo de fuga",
+        "corresponde la suspensión del juicio a prueba",
+    ]),
+    "FAMILIA": ("ALIMENTOS", [
+        "la madre reclama una cuota alimentaria para el hijo menor",
+        "el progenitor no conviviente incumplió el régimen de comunicación",
+        "se fija la cuota en un porcentaje de los haberes del alimentante",
+        "el interés superior del niño guía la decisión",
+    ]),
+    "CONTENCIOSO": ("AMPARO", [
+        "la obra social negó la cobertura integral de la prestación",
+        "el Estado provincial omitió resolver el reclamo administrativo",
+        "la municipalidad dispuso la clausura sin sumario previo",
+        "se cuestiona la razonabilidad del acto administrativo",
+    ]),
+}
+APELLIDOS = ["PEREZ", "GOMEZ", "RODRIGUEZ", "FERNANDEZ", "LOPEZ", "MARTINEZ", "SOSA", "QUISPE", "MAMANI", "CRUZ"]
+NOMBRES = ["JUAN", "MARIA", "CARLOS", "ANA", "JORGE", "LUCIA", "PEDRO", "SILVIA"]
+RESOLUCIONES = ["hacer lugar a la demanda", "rechazar la demanda", "confirmar la sentencia apelada", "revocar la sentencia apelada"]
+
+
+# ----------------------------------------------------------------------
+# Corpus sintético y siembra
+# ----------------------------------------------------------------------
+
+def generar_fallo(rng: random.Random, numero: int, prefijo: str = PREFIJO_CORPUS, expediente: str = "BENCH") -> dict:
+    """Fallo sintético con texto de varios párrafos (alcanza para varios pasajes)"""
+    materia = rng.choice(list(CORPUS))
+    objeto, temas = CORPUS[materia]
+    actor = f"{rng.choice(APELLIDOS)} {rng.choice(NOMBRES)}"
+    demandado = f"{rng.choice(APELLIDOS)} {rng.choice(NOMBRES)}"
+    considerandos = " ".join(
+        f"{n}) Que {rng.choice(temas)}, conforme surge de las constancias de autos y de la prueba producida."
+        for n in range(1, rng.randint(8, 16))
+    )
+    return {
+        "caratula": f"{actor} C/ {demandado} S/ {objeto}",
+        "fecha_fallo": f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "tribunal": f"Cámara de Apelaciones - Sala {rng.randint(1, 4)}",
+        "expediente": f"{expediente}-{numero}",
+        "materia": materia,
+        "texto_completo": (
+            f"San Salvador de Jujuy. VISTOS los autos caratulados {actor} C/ {demandado} S/ {objeto}, "
+            f"y CONSIDERANDO: {considerandos} Por ello, el Tribunal RESUELVE: {rng.choice(RESOLUCIONES)}."
+        ),
+        "url_original": f"{prefijo}{numero}",
+    }
+
+
+def preparar_base():
+    """Crea la extensión vector, las tablas y aplica las migraciones (base de pruebas vacía)"""
+    from database.migrar import migrar
+
+    migrar()
+
+
+def sembrar(n: int, semilla: int) -> Optional[dict]:
+    """Completa el corpus hasta n fallos y los pasa por el pipeline. Devuelve el throughput."""
+    from sqlalchemy import func
+
+    from core.database import SessionLocal
+    from core.models import Fallo
+    from core.schemas import FalloCreate
+    from core.services.embedding_providers import modelo_por_defecto
+    from core.services.embedding_set_service import EmbeddingSetService
+    from core.services.fallo_service import CREADO, FalloService
+    from core.services.pipeline_service import PipelineIngesta
+    from core.services.stubs import DIMENSIONES_EMBEDDING
+
+    db = SessionLocal()
+    try:
+        existentes = db.query(func.count(Fallo.id)).filter(Fallo.url_original.like(f"{PREFIJO_CORPUS}%")).scalar()
+        if existentes >= n:
+            return None
+
+        sets = EmbeddingSetService(db)
+        if not sets.listar():
+            sets.crear_set(modelo_por_defecto(), DIMENSIONES_EMBEDDING, activar=True)
+
+        # La semilla depende del número de fallo: el corpus es el mismo aunque se siembre por partes
+        fallos = [
+            FalloCreate(**generar_fallo(random.Random(semilla * 1_000_003 + numero), numero))
+            for numero in range(existentes, n)
+        ]
+        # El alta masiva los deja en la etapa 'scraped' del pipeline
+        resultados = FalloService(db).crear_fallos_bulk(fallos)
+        creados = sum(1 for r in resultados if r["estado"] == CREADO)
+    finally:
+        db.close()
+
+    inicio = time.perf_counter()
+    estadisticas = asyncio.run(PipelineIngesta().ejecutar(scrapear=False))
+    segundos = time.perf_counter() - inicio
+    return {
+        "fallos": creados,
+        "segundos": round(segundos, 2),
+        "fallos_por_segundo": round(creados / segundos, 1) if segundos else 0.0,
+        "etapas": estadisticas,
+    }
+
+
+def limpiar_altas() -> int:
+    """Borra los fallos del escenario de alta masiva: el corpus medido no crece entre corridas"""
+    from sqlalchemy import text
+
+    from core.database import engine
+
+    with engine.begin() as conn:
+        return conn.execute(
+            text("DELETE FROM fallos WHERE url_original LIKE :prefijo"), {"prefijo": f"{PREFIJO_ALTAS}%"}
+        ).rowcount
+
+
+# ----------------------------------------------------------------------
+# Escenarios
+# ----------------------------------------------------------------------
+
+Pedido = Tuple[str, str, dict]
+
+
+def crear_escenarios(rng: random.Random, consultas: List[str], ids: List[int]) -> Dict[str, Callable[[], Pedido]]:
+    """Generadores de pedidos por escenario: (método, ruta, kwargs de httpx)"""
+    materias = list(CORPUS)
+    corrida = uuid.uuid4().hex[:8]
+    contador_alta = iter(range(10 ** 9))
+
+    def busqueda(ruta: str, **extra) -> Callable[[], Pedido]:
+        def generar() -> Pedido:
+            params = {"query": rng.choice(consultas), "limit": 10, **extra}
+            if rng.random() < 0.3:
+                params["materia"] = rng.choice(materias)
+            return "GET", ruta, {"params": params}
+        return generar
+
+    def alta_masiva() -> Pedido:
+        fallos = [
+            generar_fallo(rng, next(contador_alta), f"{PREFIJO_ALTAS}{corrida}/", f"ALTA-{corrida}")
+            for _ in range(20)
+        ]
+        return "POST", "/api/v1/fallos/bulk", {"json": fallos}
+
+    return {
+        "semantica": busqueda("/api/v1/search/semantica"),
+        "semantica_rerank": busqueda("/api/v1/search/semantica", rerank=True),
+        "hibrida": busqueda("/api/v1/search/hibrida"),
+        "pasajes": busqueda("/api/v1/search/pasajes"),
+        "facetas": lambda: ("GET", "/api/v1/search/facetas", {"params": {"materia": rng.choice(materias)}}),
+        "fallos_listado": lambda: (
+            "GET", "/api/v1/fallos/", {"params": {"skip": rng.randint(0, max(len(ids) - 20, 0)), "limit": 20}}
+        ),
+        "fallo_detalle": lambda: ("GET", f"/api/v1/fallos/{rng.choice(ids)}", {}),
+        "ingesta_bulk": alta_masiva,
+    }
+
+
+async def obtener_ids(cliente: httpx.AsyncClient, maximo: int = 1000) -> List[int]:
+    """Ids de fallos existentes (para el escenario de detalle)"""
+    ids: List[int] = []
+    while len(ids) < maximo:
+        response = await cliente.get("/api/v1/fallos/", params={"skip": len(ids), "limit": 100})
+        response.raise_for_status()
+        pagina = [fallo["id"] for fallo in response.json()]
+        ids.extend(pagina)
+        if len(pagina) < 100:
+            break
+    return ids
+
+
+async def conducir(
+    cliente: httpx.AsyncClient,
+    generar: Callable[[], Pedido],
+    concurrencia: int,
+    duracion: float,
+    calentamiento: float
+) -> dict:
+    """Ejecuta un escenario con `concurrencia` clientes en lazo cerrado"""
+    latencias: List[float] = []
+    errores: Dict[str, int] = {}
+    inicio_medicion = time.perf_counter() + calentamiento
+    fin = inicio_medicion + duracion
+
+    async def cliente_virtual():
+        while time.perf_counter() < fin:
+            metodo, ruta, kwargs = generar()
+            inicio = time.perf_counter()
+            try:
+                response = await cliente.request(metodo, ruta, **kwargs)
+                error = str(response.status_code) if response.status_code >= 400 else None
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            if inicio < inicio_medicion:
+                continue
+            latencias.append(time.perf_counter() - inicio)
+            if error is not None:
+                errores[error] = errores.get(error, 0) + 1
+
+    await asyncio.gather(*(cliente_virtual() for _ in range(concurrencia)))
+    medido = time.perf_counter() - inicio_medicion
+    return {
+        "requests": len(latencias),
+        "errores": sum(errores.values()),
+        "errores_por_tipo": errores,
+        "requests_por_segundo": round(len(latencias) / medido, 1) if medido > 0 else 0.0,
+        **resumen_latencias(latencias),
+    }
+
+
+# ----------------------------------------------------------------------
+# Baseline
+# ----------------------------------------------------------------------
+
+def comparar(actual: dict, baseline: dict, tolerancia: float) -> List[str]:
+    """Regresiones de p95, throughput y errores respecto de la baseline"""
+    regresiones = []
+    for nombre, medicion in actual["escenarios"].items():
+        base = baseline.get("escenarios", {}).get(nombre)
+        if base is None:
+            continue
+        if base["p95_ms"] and medicion["p95_ms"] > base["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {base['p95_ms']} → {medicion['p95_ms']} ms")
+        if base["requests_por_segundo"] and medicion["requests_por_segundo"] < base["requests_por_segundo"] * (1 - tolerancia):
+            regresiones.append(
+                f"{nombre}: throughput {base['requests_por_segundo']} → {medicion['requests_por_segundo']} req/s"
+            )
+        if medicion["errores"] > base["errores"]:
+            regresiones.append(f"{nombre}: errores {base['errores']} → {medicion['errores']}")
+    return regresiones
+
+
+# ----------------------------------------------------------------------
+# Servidor y ejecución
+# ----------------------------------------------------------------------
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(puerto: int):
+    """uvicorn en un hilo (un worker, como un pod de la API)"""
+    import uvicorn
+    from main import app
+
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning"))
+    hilo = threading.Thread(target=servidor.run, daemon=True)
+    hilo.start()
+    while not servidor.started:
+        if not hilo.is_alive():
+            raise RuntimeError("No se pudo iniciar la API")
+        time.sleep(0.05)
+    return servidor, hilo
+
+
+async def medir(args, base_url: str, transporte=None) -> dict:
+    consultas = [c["texto"] for c in json.loads(FIXTURE.read_text(encoding="utf-8"))["consultas"]]
+    rng = random.Random(args.semilla)
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limites, transport=transporte) as cliente:
+        ids = await obtener_ids(cliente)
+        if not ids:
+            raise SystemExit("La base no tiene fallos: sembrar con --fallos N")
+        escenarios = crear_escenarios(rng, consultas, ids)
+
+        resultados = {}
+        for nombre in args.escenarios:
+            resultados[nombre] = await conducir(
+                cliente, escenarios[nombre], args.concurrencia, args.duracion, args.calentamiento
+            )
+            print(json.dumps({"escenario": nombre, **resultados[nombre]}, ensure_ascii=False), file=sys.stderr)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="API externa (por defecto se levanta una en el proceso)")
+    parser.add_argument("--asgi", action="store_true", help="API en el mismo event loop, sin red")
+    parser.add_argument("--fallos", type=int, default=0, help="Sembrar hasta N fallos sintéticos")
+    parser.add_argument("--solo-sembrar", action="store_true")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--escenarios", nargs="+", default=["semantica", "hibrida", "pasajes", "fallos_listado", "fallo_detalle", "ingesta_bulk"])
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--duracion", type=float, default=15.0, help="Segundos medidos por escenario")
+    parser.add_argument("--calentamiento", type=float, default=3.0)
+    parser.add_argument("--cache", action="store_true", help="Mantiene la cache de búsquedas activa")
+    parser.add_argument("--proveedores-reales", action="store_true", help="No reemplaza IA ni embeddings por stubs")
+    parser.add_argument("--salida", default=None, help="Archivo JSON con el resultado")
+    parser.add_argument("--baseline", default=None, help="Resultado previo contra el que comparar")
+    parser.add_argument("--guardar-baseline", default=None)
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento admitido (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    desconocidos = set(args.escenarios) - set(crear_escenarios(random.Random(), [""], [0]))
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    # Antes de importar core: la configuración se lee al importar
+    if not args.proveedores_reales:
+        for variable in ("IA_PROVIDER", "EMBEDDING_PROVIDER", "RERANK_PROVIDER"):
+            os.environ[variable] = "stub"
+    if not args.cache:
+        os.environ["SEARCH_CACHE"] = "false"
+    os.environ.setdefault("EMBEDDING_WARMUP", "false")
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parametros": {
+            "concurrencia": args.concurrencia,
+            "duracion": args.duracion,
+            "cache": args.cache,
+            "proveedores": "reales" if args.proveedores_reales else "stub",
+            "modo": "url" if args.url else "asgi" if args.asgi else "uvicorn",
+        },
+    }
+
+    if args.fallos:
+        preparar_base()
+        siembra = sembrar(args.fallos, args.semilla)
+        if siembra is not None:
+            informe["ingesta_pipeline"] = siembra
+            print(json.dumps({"ingesta_pipeline": siembra}, ensure_ascii=False), file=sys.stderr)
+    if args.solo_sembrar:
+        return
+
+    if args.url:
+        informe["escenarios"] = asyncio.run(medir(args, args.url))
+    elif args.asgi:
+        from main import app
+        informe["escenarios"] = asyncio.run(medir(args, "http://bench", httpx.ASGITransport(app=app)))
+    else:
+        puerto = _puerto_libre()
+        servidor, hilo = iniciar_servidor(puerto)
+        try:
+            informe["escenarios"] = asyncio.run(medir(args, f"http://127.0.0.1:{puerto}"))
+        finally:
+            servidor.should_exit = True
+            hilo.join(timeout=10)
+
+    if "ingesta_bulk" in args.escenarios:
+        try:
+            print(f"Fallos de alta masiva borrados: {limpiar_altas()}", file=sys.stderr)
+        except Exception as e:
+            print(f"No se pudieron borrar los fallos de alta masiva: {e}", file=sys.stderr)
+
+    print(json.dumps(informe, indent=2, ensure_ascii=False))
+    for ruta in (args.salida, args.guardar_baseline):
+        if ruta:
+            Path(ruta).write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.baseline:
+        regresiones = comparar(informe, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+        print("Sin regresiones respecto de la baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de alta de fallos: endpoint fila a fila vs. endpoint masivo
+
+Requiere la API corriendo contra una base de pruebas.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_bulk_fallos --url http://localhost:8000 --filas 5000
+"""
+import argparse
+import json
+import time
+import uuid
+
+import httpx
+
+
+def generar_fallos(n: int, prefijo: str) -> list:
+    """Fallos sintéticos con url_original única por corrida"""
+    return [
+        {
+            "caratula": f"PEREZ JUAN C/ EMPRESA {i} S.A. S/ DESPIDO",
+            "fecha_fallo": f"2024-03-{1 + i % 28:02d}",
+            "tribunal": "Tribunal del Trabajo - Sala I",
+            "expediente": f"{prefijo}-{i}",
+            "materia": "LABORAL",
+            "texto_completo": "VISTOS y CONSIDERANDO: despido sin causa, art. 245 LCT. " * 20,
+            "url_original": f"https://bench.local/{prefijo}/{i}",
+        }
+        for i in range(n)
+    ]
+
+
+def medir_fila_a_fila(client: httpx.Client, fallos: list) -> float:
+    inicio = time.perf_counter()
+    for fallo in fallos:
+        client.post("/api/v1/fallos/", json=fallo).raise_for_status()
+    return time.perf_counter() - inicio
+
+
+def medir_bulk(client: httpx.Client, fallos: list, lote: int, ndjson: bool) -> float:
+    inicio = time.perf_counter()
+    for i in range(0, len(fallos), lote):
+        parte = fallos[i:i + lote]
+        if ndjson:
+            cuerpo = "\n".join(json.dumps(f) for f in parte)
+            response = client.post(
+                "/api/v1/fallos/bulk",
+                content=cuerpo,
+                headers={"Content-Type": "application/x-ndjson"}
+            )
+        else:
+            response = client.post("/api/v1/fallos/bulk", json=parte)
+        response.raise_for_status()
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--filas", type=int, default=2000)
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--ndjson", action="store_true")
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=300) as client:
+        individuales = generar_fallos(args.filas, f"uno-{uuid.uuid4().hex[:8]}")
+        masivos = generar_fallos(args.filas, f"bulk-{uuid.uuid4().hex[:8]}")
+
+        t_individual = medir_fila_a_fila(client, individuales)
+        t_bulk = medir_bulk(client, masivos, args.lote, args.ndjson)
+
+    for nombre, segundos in (("fila_a_fila", t_individual), ("bulk", t_bulk)):
+        print(json.dumps({
+            "modo": nombre,
+            "filas": args.filas,
+            "segundos": round(segundos, 2),
+            "filas_por_segundo": round(args.filas / segundos, 1),
+        }))
+    print(f"Aceleración: x{t_individual / t_bulk:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark de proveedores de embeddings: OpenAI vs. modelo local en CPU
+
+Mide sobre un set de fallos y consultas en español (fixtures/):
+- latencia de una consulta (p50/p95/p99), que es lo que paga cada búsqueda
+- throughput de indexación (documentos por segundo, en lotes)
+- calidad de recuperación: recall@k y MRR de las consultas contra los fallos
+- con --rafaga N: N consultas concurrentes, cada una con su llamada vs.
+  agrupadas por el micro-batcher (llamadas al proveedor y latencias)
+
+No requiere base de datos. El proveedor openai necesita OPENAI_API_KEY y
+el local sentence-transformers.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_embeddings --proveedores openai local
+    python -m benchmarks.bench_embeddings --proveedores local --local-backend onnx
+    python -m benchmarks.bench_embeddings --proveedores openai --rafaga 200
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks.common import resumen_latencias
+from core.config import settings
+from core.services.embedding_batcher import EmbeddingBatcher
+from core.services.embedding_providers import ProveedorEmbeddings, ProveedorLocal, ProveedorOpenAI
+
+FIXTURE = Path(__file__).parent / "fixtures" / "embeddings_legal_es.json"
+
+
+def crear_proveedor(nombre: str, local_backend: str) -> ProveedorEmbeddings:
+    if nombre == "openai":
+        return ProveedorOpenAI(settings.OPENAI_EMBEDDING_MODEL)
+    if nombre == "local":
+        return ProveedorLocal(settings.EMBEDDING_LOCAL_MODEL, backend=local_backend)
+    from core.services.stubs import StubProveedorEmbeddings
+    return StubProveedorEmbeddings("stub")
+
+
+def coseno(a: list, b: list) -> float:
+    producto = sum(x * y for x, y in zip(a, b))
+    normas = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return producto / normas if normas else 0.0
+
+
+def calidad(vectores_docs: dict, vectores_consultas: List[list], consultas: list, k: int) -> dict:
+    """recall@k y MRR (ranking por similitud coseno exacta)"""
+    recall, mrr = 0.0, 0.0
+    for vector, consulta in zip(vectores_consultas, consultas):
+        ranking = sorted(vectores_docs, key=lambda i: -coseno(vector, vectores_docs[i]))
+        relevantes = set(consulta["relevantes"])
+        recall += len(relevantes & set(ranking[:k])) / len(relevantes)
+        posicion = next((p for p, i in enumerate(ranking, 1) if i in relevantes), None)
+        mrr += 1 / posicion if posicion else 0.0
+    n = len(consultas)
+    return {f"recall@{k}": round(recall / n, 3), "mrr": round(mrr / n, 3)}
+
+
+async def medir(proveedor: ProveedorEmbeddings, fixture: dict, repeticiones: int, lote: int, k: int) -> dict:
+    inicio = time.perf_counter()
+    proveedor.calentar()
+    calentamiento = time.perf_counter() - inicio
+
+    documentos = fixture["documentos"]
+    consultas = fixture["consultas"]
+
+    # Throughput de indexación, en lotes como el backfill
+    inicio = time.perf_counter()
+    vectores_docs = {}
+    for desde in range(0, len(documentos), lote):
+        parte = documentos[desde:desde + lote]
+        for doc, vector in zip(parte, await proveedor.embeber([d["texto"] for d in parte])):
+            vectores_docs[doc["id"]] = vector
+    duracion_indexado = time.perf_counter() - inicio
+
+    # Latencia de consultas de a una, como en /search/semantica
+    latencias, vectores_consultas = [], []
+    for repeticion in range(repeticiones):
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            vector = (await proveedor.embeber([consulta["texto"]]))[0]
+            latencias.append(time.perf_counter() - inicio)
+            if repeticion == 0:
+                vectores_consultas.append(vector)
+
+    return {
+        "proveedor": proveedor.nombre,
+        "modelo": proveedor.modelo,
+        "dimensiones": len(next(iter(vectores_docs.values()))),
+        "calentamiento_s": round(calentamiento, 2),
+        "consulta": resumen_latencias(latencias),
+        "docs_por_segundo": round(len(documentos) / duracion_indexado, 1),
+        **calidad(vectores_docs, vectores_consultas, consultas, k),
+    }
+
+
+async def medir_rafaga(proveedor: ProveedorEmbeddings, consultas: list, n: int) -> dict:
+    """N consultas simultáneas (con repetidas), sin y con micro-batching"""
+    textos = [consultas[i % len(consultas)]["texto"] for i in range(n)]
+
+    async def cronometrar(coro):
+        inicio = time.perf_counter()
+        await coro
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    latencias = await asyncio.gather(*(cronometrar(proveedor.embeber([t])) for t in textos))
+    directo = {"llamadas": n, "total_s": round(time.perf_counter() - inicio, 3), **resumen_latencias(latencias)}
+
+    batcher = EmbeddingBatcher(proveedor)
+    inicio = time.perf_counter()
+    latencias = await asyncio.gather(*(cronometrar(batcher.embeber(t)) for t in textos))
+    agrupado = {
+        "llamadas": batcher.estadisticas["llamadas"],
+        "deduplicados": batcher.estadisticas["deduplicados"],
+        "total_s": round(time.perf_counter() - inicio, 3),
+        **resumen_latencias(latencias),
+    }
+    return {"proveedor": proveedor.nombre, "rafaga": n, "directo": directo, "micro_batching": agrupado}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--proveedores", nargs="+", choices=["openai", "local", "stub"], default=["openai", "local"])
+    parser.add_argument("--local-backend", choices=["torch", "onnx"], default=settings.EMBEDDING_LOCAL_BACKEND)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--lote", type=int, default=settings.EMBEDDING_BACKFILL_LOTE)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--rafaga", type=int, default=0, help="Consultas concurrentes a medir con micro-batching")
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    args = parser.parse_args()
+
+    fixture = json.loads(Path(args.fixture).read_text(encoding="utf-8"))
+    for nombre in args.proveedores:
+        proveedor = crear_proveedor(nombre, args.local_backend)
+        resultado = asyncio.run(medir(proveedor, fixture, args.repeticiones, args.lote, args.k))
+        print(json.dumps(resultado, ensure_ascii=False))
+        if args.rafaga:
+            resultado = asyncio.run(medir_rafaga(proveedor, fixture["consultas"], args.rafaga))
+            print(json.dumps(resultado, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
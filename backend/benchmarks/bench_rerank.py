@@ -0,0 +1,96 @@
+"""
+Benchmark del re-ranking: calidad (nDCG@k) y latencia de la segunda etapa
+
+Sobre el fixture de fallos y consultas en español:
+1. primera etapa: orden por similitud coseno con el proveedor de embeddings
+2. segunda etapa: el re-ranker re-puntúa los top-N en una llamada por consulta
+
+Reporta nDCG@k de ambas etapas, latencia del re-ranking (p50/p95/p99) y
+cuántas consultas cayeron al orden original por el presupuesto de latencia.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_rerank --embeddings local --reranker cross-encoder
+    python -m benchmarks.bench_rerank --embeddings stub --reranker stub
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from pathlib import Path
+
+from benchmarks.bench_embeddings import FIXTURE, coseno, crear_proveedor
+from benchmarks.common import resumen_latencias
+from core.config import settings
+from core.services.rerank_service import RerankService, RerankerCrossEncoder, RerankerLLM, RerankerStub
+
+
+def ndcg(ranking: list, relevantes: set, k: int) -> float:
+    """nDCG@k con relevancia binaria"""
+    dcg = sum(1 / math.log2(p + 1) for p, i in enumerate(ranking[:k], 1) if i in relevantes)
+    ideal = sum(1 / math.log2(p + 1) for p in range(1, min(len(relevantes), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def crear_reranker(nombre: str):
+    if nombre == "llm":
+        return RerankerLLM()
+    if nombre == "stub":
+        return RerankerStub()
+    return RerankerCrossEncoder()
+
+
+async def medir(args) -> dict:
+    fixture = json.loads(Path(args.fixture).read_text(encoding="utf-8"))
+    documentos = {d["id"]: d for d in fixture["documentos"]}
+    proveedor = crear_proveedor(args.embeddings, settings.EMBEDDING_LOCAL_BACKEND)
+    reranker = crear_reranker(args.reranker)
+    reranker.calentar()
+    servicio = RerankService(reranker)
+
+    vectores = dict(zip(documentos, await proveedor.embeber([d["texto"] for d in documentos.values()])))
+
+    ndcg_base, ndcg_rerank, latencias, fallbacks = 0.0, 0.0, [], 0
+    for consulta in fixture["consultas"]:
+        vector = (await proveedor.embeber([consulta["texto"]]))[0]
+        primera = sorted(documentos, key=lambda i: -coseno(vector, vectores[i]))
+        resultados = [{"id": i, "caratula": documentos[i]["texto"]} for i in primera]
+
+        inicio = time.perf_counter()
+        reordenados, aplicado = await servicio.reordenar(
+            consulta["texto"], resultados, top_n=args.top_n, timeout_ms=args.timeout_ms
+        )
+        latencias.append(time.perf_counter() - inicio)
+        fallbacks += not aplicado
+
+        relevantes = set(consulta["relevantes"])
+        ndcg_base += ndcg(primera, relevantes, args.k)
+        ndcg_rerank += ndcg([r["id"] for r in reordenados], relevantes, args.k)
+
+    n = len(fixture["consultas"])
+    return {
+        "embeddings": proveedor.nombre,
+        "reranker": reranker.nombre,
+        "top_n": args.top_n,
+        f"ndcg@{args.k}_primera_etapa": round(ndcg_base / n, 3),
+        f"ndcg@{args.k}_rerank": round(ndcg_rerank / n, 3),
+        "rerank": resumen_latencias(latencias),
+        "fallbacks": fallbacks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--embeddings", choices=["openai", "local", "stub"], default="local")
+    parser.add_argument("--reranker", choices=["cross-encoder", "llm", "stub"], default=settings.RERANK_PROVIDER)
+    parser.add_argument("--top-n", type=int, default=settings.RERANK_TOP_N)
+    parser.add_argument("--timeout-ms", type=float, default=settings.RERANK_TIMEOUT_MS)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(medir(args)), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark de los motores de scraping (http vs playwright)
+contra un sitio local que imita el buscador de Jujuy.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_scrapers --paginas 20 --por-pagina 10
+    python -m benchmarks.bench_scrapers --engine http
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from core.config import settings
+from benchmarks.common import MonitorRSS
+
+
+def _html_listado(index: int, por_pagina: int) -> str:
+    items = []
+    for n in range(por_pagina):
+        fallo_id = index * por_pagina + n
+        items.append(f"""
+        <div class="resultado-fallo">
+            <a href="/fallo/{fallo_id}"><span class="caratula">PEREZ JUAN C/ EMPRESA {fallo_id} S.A. S/ DESPIDO</span></a>
+            <span class="fecha">{1 + fallo_id % 28:02d}/03/2024</span>
+            <span class="tribunal">Tribunal del Trabajo - Sala {1 + fallo_id % 3}</span>
+        </div>""")
+    return f"<html><body><div id='resultados'>{''.join(items)}</div></body></html>"
+
+
+def _html_detalle(fallo_id: int) -> str:
+    parrafo = (
+        "San Salvador de Jujuy. VISTOS los autos caratulados del expediente "
+        f"N° {fallo_id}, y CONSIDERANDO: que el actor reclama la indemnización "
+        "prevista en el art. 245 de la Ley 20.744 por despido sin causa. "
+    )
+    return f"<html><body><div class='texto-fallo'>{parrafo * 40}</div></body></html>"
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    por_pagina = 10
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.startswith("/fallo/"):
+            cuerpo = _html_detalle(int(url.path.rsplit("/", 1)[-1]))
+        else:
+            index = int(parse_qs(url.query).get("index", ["0"])[0])
+            cuerpo = _html_listado(index, self.por_pagina)
+
+        datos = cuerpo.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def log_message(self, *args):
+        pass
+
+
+def levantar_sitio_fixture(por_pagina: int) -> ThreadingHTTPServer:
+    """Levanta el sitio fixture en un puerto libre de localhost"""
+    _FixtureHandler.por_pagina = por_pagina
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def medir(engine: str, base_url: str, paginas: int) -> dict:
+    """Ejecuta un motor y devuelve páginas/seg y RSS máximo"""
+    from scrapers.jujuy_scraper import scrape_fallos_jujuy
+
+    with MonitorRSS() as monitor:
+        inicio = time.perf_counter()
+        fallos = scrape_fallos_jujuy(max_pages=paginas, engine=engine, base_url=base_url)
+        duracion = time.perf_counter() - inicio
+
+    # Cada fallo implica descargar su detalle, más una página de listado por índice
+    total_paginas = paginas + len(fallos)
+    return {
+        "engine": engine,
+        "fallos": len(fallos),
+        "paginas": total_paginas,
+        "segundos": round(duracion, 2),
+        "paginas_por_segundo": round(total_paginas / duracion, 1),
+        "rss_max_mb": monitor.maximo_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--por-pagina", type=int, default=10)
+    parser.add_argument("--engine", choices=["http", "playwright", "ambos"], default="ambos")
+    args = parser.parse_args()
+
+    # Sin demora entre páginas: se mide el costo del motor, no la cortesía con el sitio
+    settings.SCRAPER_DELAY_SECONDS = 0
+
+    servidor = levantar_sitio_fixture(args.por_pagina)
+    base_url = f"http://127.0.0.1:{servidor.server_port}/buscador"
+
+    engines = ["http", "playwright"] if args.engine == "ambos" else [args.engine]
+    try:
+        for engine in engines:
+            print(json.dumps(medir(engine, base_url, args.paginas), ensure_ascii=False))
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Utilidades comunes para los benchmarks
+"""
+import os
+import threading
+import time
+from typing import List, Dict
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por interpolación lineal (p entre 0 y 100)"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (k - inferior)
+
+
+def resumen_latencias(latencias: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 en milisegundos"""
+    return {
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+class MonitorRSS:
+    """
+    Mide el RSS máximo del proceso y sus hijos (ej: Chromium de Playwright).
+    Sin psutil solo se mide el proceso actual.
+    """
+
+    def __init__(self, intervalo: float = 0.05):
+        self.intervalo = intervalo
+        self.maximo = 0
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _rss_actual(self) -> int:
+        if psutil is None:
+            import resource
+            # ru_maxrss está en KB en Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+        proceso = psutil.Process(os.getpid())
+        total = proceso.memory_info().rss
+        for hijo in proceso.children(recursive=True):
+            try:
+                total += hijo.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    def _muestrear(self):
+        while not self._detener.is_set():
+            self.maximo = max(self.maximo, self._rss_actual())
+            time.sleep(self.intervalo)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+        self.maximo = max(self.maximo, self._rss_actual())
+
+    @property
+    def maximo_mb(self) -> float:
+        return round(self.maximo / (1024 * 1024), 1)
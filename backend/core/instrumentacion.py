@@ -0,0 +1,215 @@
+"""
+Instrumentación de la API, los servicios y el scraper
+
+- MiddlewareMetricas: latencia y cantidad de requests por ruta (ASGI puro)
+- instrumentar(): decorador que mide duración y errores de una llamada
+  a un servicio (embeddings, IA, búsqueda, scraper)
+- registrar_tokens(): consumo de tokens de OpenAI/Anthropic
+- registrar_salida(): validación de la salida estructurada del análisis
+- medidores del pool de conexiones de SQLAlchemy
+
+Con OTEL_ENABLED y opentelemetry instalado cada request y cada llamada
+instrumentada abren un span; como el contexto viaja en contextvars, la
+búsqueda queda ligada a sus llamadas al proveedor de embeddings y a la
+base. El exporter se configura por fuera (ej: opentelemetry-instrument).
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+
+from core.config import settings
+from core.metrics import registro
+
+try:
+    from opentelemetry import trace
+except ImportError:  # dependencia opcional
+    trace = None
+
+HTTP_LATENCIA = registro.histograma(
+    "jurisar_http_request_segundos",
+    "Latencia de los requests HTTP por ruta",
+    ["metodo", "ruta", "estado"]
+)
+HTTP_REQUESTS = registro.contador(
+    "jurisar_http_requests_total",
+    "Requests HTTP atendidos",
+    ["metodo", "ruta", "estado"]
+)
+LLAMADA_LATENCIA = registro.histograma(
+    "jurisar_llamada_segundos",
+    "Duración de las llamadas a servicios",
+    ["componente", "operacion", "resultado"]
+)
+LLAMADA_ERRORES = registro.contador(
+    "jurisar_llamada_errores_total",
+    "Errores en llamadas a servicios",
+    ["componente", "operacion", "tipo"]
+)
+TOKENS = registro.contador(
+    "jurisar_tokens_total",
+    "Tokens consumidos en APIs de IA",
+    ["proveedor", "modelo", "tipo"]
+)
+SALIDAS_IA = registro.contador(
+    "jurisar_ia_salidas_total",
+    "Salidas del análisis con IA por resultado de la validación (valida, reparada, invalida)",
+    ["proveedor", "resultado"]
+)
+TOKENS_DESPERDICIADOS = registro.contador(
+    "jurisar_ia_tokens_desperdiciados_total",
+    "Tokens gastados en reparaciones o en salidas descartadas",
+    ["proveedor", "motivo"]
+)
+SCRAPER_ITEMS = registro.contador(
+    "jurisar_scraper_items_total",
+    "Páginas de listado y fallos obtenidos por el scraper",
+    ["tipo"]
+)
+
+_trazador = None
+
+
+def _obtener_trazador():
+    global _trazador
+    if _trazador is None and trace is not None and settings.OTEL_ENABLED:
+        _trazador = trace.get_tracer("jurisar")
+    return _trazador
+
+
+@contextmanager
+def span(nombre: str, **atributos):
+    """Span de OpenTelemetry (no hace nada si está deshabilitado)"""
+    trazador = _obtener_trazador()
+    if trazador is None:
+        yield None
+        return
+    with trazador.start_as_current_span(nombre, attributes=atributos) as actual:
+        yield actual
+
+
+def instrumentar(componente: str, operacion: str = None):
+    """
+    Decorador para funciones sync o async: histograma de duración por
+    resultado (ok/error), contador de errores por tipo y span opcional.
+    """
+    def decorador(funcion):
+        nombre = operacion or funcion.__name__
+
+        def registrar(inicio: float, error: Exception = None):
+            resultado = "ok" if error is None else "error"
+            LLAMADA_LATENCIA.observar(
+                time.perf_counter() - inicio, componente=componente, operacion=nombre, resultado=resultado
+            )
+            if error is not None:
+                LLAMADA_ERRORES.inc(componente=componente, operacion=nombre, tipo=type(error).__name__)
+
+        if inspect.iscoroutinefunction(funcion):
+            @functools.wraps(funcion)
+            async def envoltura(*args, **kwargs):
+                inicio = time.perf_counter()
+                with span(f"{componente}.{nombre}"):
+                    try:
+                        resultado = await funcion(*args, **kwargs)
+                    except Exception as e:
+                        registrar(inicio, e)
+                        raise
+                registrar(inicio)
+                return resultado
+        else:
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                inicio = time.perf_counter()
+                with span(f"{componente}.{nombre}"):
+                    try:
+                        resultado = funcion(*args, **kwargs)
+                    except Exception as e:
+                        registrar(inicio, e)
+                        raise
+                registrar(inicio)
+                return resultado
+
+        return envoltura
+    return decorador
+
+
+def registrar_tokens(proveedor: str, modelo: str, entrada: int = 0, salida: int = 0):
+    if entrada:
+        TOKENS.inc(entrada, proveedor=proveedor, modelo=modelo, tipo="entrada")
+    if salida:
+        TOKENS.inc(salida, proveedor=proveedor, modelo=modelo, tipo="salida")
+
+
+def registrar_salida(proveedor: str, resultado: str, reparacion: int = 0, descartados: int = 0):
+    """Resultado de validar la salida estructurada y tokens que no aportaron al análisis"""
+    SALIDAS_IA.inc(proveedor=proveedor, resultado=resultado)
+    if reparacion:
+        TOKENS_DESPERDICIADOS.inc(reparacion, proveedor=proveedor, motivo="reparacion")
+    if descartados:
+        TOKENS_DESPERDICIADOS.inc(descartados, proveedor=proveedor, motivo="descartado")
+
+
+def registrar_pool(engine):
+    """Medidores del pool de conexiones (en uso, libres, overflow, tamaño)"""
+    pool = engine.pool
+
+    def leer():
+        valores = {}
+        for estado, metodo in (("en_uso", "checkedout"), ("libres", "checkedin"),
+                               ("overflow", "overflow"), ("tamano", "size")):
+            if hasattr(pool, metodo):
+                valores[(estado,)] = getattr(pool, metodo)()
+        return valores
+
+    registro.medidor(
+        "jurisar_db_pool_conexiones",
+        "Conexiones del pool de SQLAlchemy",
+        ["estado"],
+        funcion=leer
+    )
+
+
+def _plantilla_ruta(scope) -> str:
+    """Plantilla de la ruta (ej: /api/v1/fallos/{fallo_id}) para no abrir una serie por URL"""
+    route = scope.get("route")
+    if route is None:
+        return "sin_ruta"
+    if getattr(route, "path_regex", None) is not None and route.path_regex.match(scope["path"]):
+        return route.path
+    # Routers incluidos con prefijo: la ruta matcheada es relativa
+    ruta = scope["path"]
+    for nombre, valor in scope.get("path_params", {}).items():
+        ruta = ruta.replace(f"/{valor}", "/{" + nombre + "}", 1)
+    return ruta
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI: latencia por ruta (plantilla, no la URL concreta)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = {"codigo": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        with span(f"HTTP {scope['method']}") as actual:
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                ruta = _plantilla_ruta(scope)
+                labels = {"metodo": scope["method"], "ruta": ruta, "estado": str(estado["codigo"])}
+                HTTP_LATENCIA.observar(time.perf_counter() - inicio, **labels)
+                HTTP_REQUESTS.inc(**labels)
+                if actual is not None:
+                    actual.update_name(f"HTTP {scope['method']} {ruta}")
+                    actual.set_attribute("http.status_code", estado["codigo"])
@@ -0,0 +1,220 @@
+"""
+Métricas en proceso con exposición en formato texto de Prometheus
+
+Registro mínimo (contadores, medidores e histogramas con labels) sin
+dependencias externas; GET /metrics lo expone. Cada worker de uvicorn
+tiene su propio registro: Prometheus los scrapea por separado.
+
+También incluye el perfil por etapas de una búsqueda: medir_etapa()
+registra la duración en el histograma y, si el request pidió
+explain=true, en el Perfil del request (vía contextvar).
+"""
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(nombres: Sequence[str], valores: Tuple, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class _Metrica(ABC):
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, labels: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _clave(self, labels: dict) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def exponer(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"] + self._muestras()
+
+    @abstractmethod
+    def _muestras(self) -> List[str]:
+        """Líneas de muestra en formato texto de Prometheus"""
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple, float] = {}
+
+    def inc(self, valor: float = 1.0, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            return [f"{self.nombre}{_labels(self.labels, k)} {v}" for k, v in self._valores.items()]
+
+
+class Medidor(_Metrica):
+    """Gauge: valor fijado o leído de una función al exponer"""
+    tipo = "gauge"
+
+    def __init__(self, *args, funcion: Optional[Callable[[], Dict[Tuple, float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple, float] = {}
+        self.funcion = funcion
+
+    def set(self, valor: float, **labels):
+        with self._lock:
+            self._valores[self._clave(labels)] = valor
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = dict(self._valores)
+        if self.funcion is not None:
+            try:
+                valores.update(self.funcion())
+            except Exception:
+                pass
+        return [f"{self.nombre}{_labels(self.labels, k)} {v}" for k, v in valores.items()]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = BUCKETS_LATENCIA, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}
+
+    def observar(self, valor: float, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def _muestras(self) -> List[str]:
+        lineas = []
+        with self._lock:
+            for clave, (conteos, suma, total) in self._series.items():
+                for limite, conteo in zip(self.buckets, conteos):
+                    le = 'le="%s"' % limite
+                    lineas.append(f"{self.nombre}_bucket{_labels(self.labels, clave, le)} {conteo}")
+                le = 'le="+Inf"'
+                lineas.append(f"{self.nombre}_bucket{_labels(self.labels, clave, le)} {total}")
+                lineas.append(f"{self.nombre}_sum{_labels(self.labels, clave)} {suma}")
+                lineas.append(f"{self.nombre}_count{_labels(self.labels, clave)} {total}")
+        return lineas
+
+
+class Registro:
+    """Conjunto de métricas del proceso"""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, clase, nombre: str, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = self._metricas[nombre] = clase(nombre, *args, **kwargs)
+            return metrica
+
+    def contador(self, nombre: str, ayuda: str, labels: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador, nombre, ayuda, labels)
+
+    def medidor(self, nombre: str, ayuda: str, labels: Sequence[str] = (), funcion=None) -> Medidor:
+        return self._registrar(Medidor, nombre, ayuda, labels, funcion=funcion)
+
+    def histograma(self, nombre: str, ayuda: str, labels: Sequence[str] = (), buckets=BUCKETS_LATENCIA) -> Histograma:
+        return self._registrar(Histograma, nombre, ayuda, labels, buckets=buckets)
+
+    def exponer(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+BUSQUEDA_ETAPA = registro.histograma(
+    "jurisar_busqueda_etapa_segundos",
+    "Duración de cada etapa de una búsqueda",
+    ["endpoint", "etapa"]
+)
+
+
+# ----------------------------------------------------------------------
+# Perfil por etapas de una búsqueda
+# ----------------------------------------------------------------------
+
+class Perfil:
+    """Tiempos por etapa y datos del plan de un request de búsqueda"""
+
+    def __init__(self, endpoint: str, explain: bool = False):
+        self.endpoint = endpoint
+        self.explain = explain
+        self.inicio = time.perf_counter()
+        self.etapas: Dict[str, float] = {}
+        self.detalle: Dict[str, object] = {}
+
+    def registrar(self, etapa: str, segundos: float):
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + segundos
+
+    def resumen(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 2),
+            "etapas_ms": {etapa: round(s * 1000, 2) for etapa, s in self.etapas.items()},
+            **self.detalle,
+        }
+
+
+perfil_actual: ContextVar[Optional[Perfil]] = ContextVar("perfil_actual", default=None)
+
+
+@contextmanager
+def medir_etapa(etapa: str):
+    """Mide una etapa de la búsqueda en curso (histograma + perfil del request)"""
+    perfil = perfil_actual.get()
+    inicio = time.perf_counter()
+    try:
+        yield perfil
+    finally:
+        duracion = time.perf_counter() - inicio
+        BUSQUEDA_ETAPA.observar(duracion, endpoint=perfil.endpoint if perfil else "", etapa=etapa)
+        if perfil is not None:
+            perfil.registrar(etapa, duracion)
+
+
+@contextmanager
+def perfilar(endpoint: str, explain: bool = False):
+    """Activa un Perfil para el request actual"""
+    perfil = Perfil(endpoint, explain)
+    token = perfil_actual.set(perfil)
+    try:
+        yield perfil
+    finally:
+        perfil_actual.reset(token)
+        BUSQUEDA_ETAPA.observar(time.perf_counter() - perfil.inicio, endpoint=endpoint, etapa="total")
@@ -1,9 +1,10 @@
 """
 Modelos SQLAlchemy para la base de datos
 """
-from sqlalchemy import Column, Integer, String, Text, Date, Float, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Text, Date, Float, ForeignKey, TIMESTAMP, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from core.database import Base
 
 
@@ -15,20 +16,23 @@ class Fallo(Base):
     caratula = Column(Text, nullable=False)
     fecha_fallo = Column(Date)
     tribunal = Column(String(255))
-    expediente = Column(String(100))
+    expediente = Column(String(100), index=True)
     materia = Column(String(100))
     tipo_proceso = Column(String(100))
     juez = Column(String(255))
     texto_completo = Column(Text)
     resumen_ia = Column(Text)
     resultado = Column(String(50))
-    url_original = Column(Text)
+    url_original = Column(Text, unique=True)  # clave de deduplicación de la ingesta
+    hash_contenido = Column(String(64))  # sha256 del texto, para detectar cambios
+    # Copia casi idéntica de otro fallo (re-publicación, OCR); None si es el canónico
+    canonico_id = Column(Integer, ForeignKey("fallos.id", ondelete="SET NULL"), index=True)
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     
     # Relaciones
     etiquetas = relationship("FalloEtiqueta", back_populates="fallo", cascade="all, delete-orphan")
-    embedding = relationship("Embedding", back_populates="fallo", uselist=False, cascade="all, delete-orphan")
+    embeddings = relationship("Embedding", back_populates="fallo", cascade="all, delete-orphan")
 
 
 class Etiqueta(Base):
@@ -58,13 +62,153 @@ class FalloEtiqueta(Base):
     etiqueta = relationship("Etiqueta", back_populates="fallos")
 
 
+class FalloNorma(Base):
+    """
+    Norma (y artículo) citada por un fallo, extraída del texto completo.
+    articulo = '' es la cita de la norma en general.
+    """
+    __tablename__ = "fallo_normas"
+    
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True)
+    norma = Column(String(60), primary_key=True)  # Ej: LEY 20744, CCYC, CODIGO PENAL
+    articulo = Column(String(20), primary_key=True, server_default="")  # Ej: 245, 14 BIS
+    menciones = Column(Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        # Búsqueda exacta "fallos que citan el art. 245 de la ley 20744"
+        Index("ix_fallo_normas_norma_articulo", "norma", "articulo", "fallo_id"),
+    )
+
+
+class FalloFirma(Base):
+    """Firma MinHash del texto completo de un fallo (detección de duplicados)"""
+    __tablename__ = "fallo_firmas"
+    
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True)
+    firma = Column(ARRAY(BigInteger), nullable=False)
+    actualizado_en = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class FalloBandaLSH(Base):
+    """
+    Clave de cada banda de la firma MinHash. Dos fallos con la misma
+    (banda, clave) son candidatos a duplicado.
+    """
+    __tablename__ = "fallo_lsh"
+    
+    banda = Column(SmallInteger, primary_key=True)
+    clave = Column(BigInteger, primary_key=True)
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
 class Embedding(Base):
-    """Modelo para almacenar embeddings vectoriales"""
+    """
+    Modelo para almacenar embeddings vectoriales
+    Un fallo tiene un vector por modelo (ver EmbeddingSet)
+    """
     __tablename__ = "embeddings"
     
     fallo_id = Column(Integer, ForeignKey("fallos.id"), primary_key=True)
+    modelo = Column(String(50), primary_key=True)
     embedding = Column(String)  # Se almacenará como texto, pgvector lo maneja como vector
-    modelo = Column(String(50))
+    hash_documento = Column(String(64))  # hash del documento de búsqueda embebido
     
     # Relación
-    fallo = relationship("Fallo", back_populates="embedding")
+    fallo = relationship("Fallo", back_populates="embeddings")
+
+
+class FalloChunk(Base):
+    """
+    Pasaje de texto_completo embebido para búsqueda a nivel pasaje.
+    Se guardan solo los offsets del pasaje (el texto ya está en fallos).
+    """
+    __tablename__ = "fallo_chunks"
+    
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True)
+    modelo = Column(String(50), primary_key=True)
+    orden = Column(Integer, primary_key=True)
+    inicio = Column(Integer, nullable=False)  # offset de caracteres en texto_completo
+    fin = Column(Integer, nullable=False)
+    embedding = Column(String)  # vector de pgvector (índice HNSW parcial por modelo)
+    hash_texto = Column(String(64))  # hash de texto_completo al momento de partirlo
+
+
+class FalloVecino(Base):
+    """
+    Vecino más cercano precalculado de un fallo en un set de embeddings
+    (orden 0 es el más parecido). Lo recalcula un proceso offline.
+    """
+    __tablename__ = "fallo_vecinos"
+    
+    modelo = Column(String(50), primary_key=True)
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True)
+    orden = Column(SmallInteger, primary_key=True)
+    vecino_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), nullable=False, index=True)
+    similitud = Column(Float, nullable=False)
+    calculado_en = Column(TIMESTAMP, server_default=func.now())
+
+
+class EmbeddingSet(Base):
+    """
+    Conjunto de embeddings de un modelo. Solo uno está 'activo' (sirve
+    las búsquedas); uno nuevo se construye en paralelo ('construyendo')
+    hasta que se activa y el anterior pasa a 'retirado'.
+    """
+    __tablename__ = "embedding_sets"
+    
+    modelo = Column(String(50), primary_key=True)
+    dimensiones = Column(Integer, nullable=False)
+    estado = Column(String(20), nullable=False, default="construyendo")  # construyendo | activo | retirado
+    creado_en = Column(TIMESTAMP, server_default=func.now())
+    activado_en = Column(TIMESTAMP)
+    
+    __table_args__ = (
+        # Nunca puede haber dos sets activos a la vez
+        Index("ux_embedding_sets_activo", "estado", unique=True, postgresql_where=text("estado = 'activo'")),
+    )
+
+
+class ScraperEstado(Base):
+    """Marca de avance (high-water mark) por fuente para el crawl incremental"""
+    __tablename__ = "scraper_estado"
+    
+    fuente = Column(String(50), primary_key=True)
+    ultima_fecha = Column(Date)
+    ultima_url = Column(Text)
+    actualizado_en = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class IngestaEstado(Base):
+    """Etapa completada por cada fallo en el pipeline de ingesta"""
+    __tablename__ = "ingesta_estado"
+    
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True)
+    etapa = Column(String(20), nullable=False, index=True)  # scraped | extracted | tagged | embedded | error
+    intentos = Column(Integer, default=0)
+    error = Column(Text)
+    actualizado_en = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class DocumentoBusqueda(Base):
+    """
+    Documento de búsqueda materializado por fallo: texto que se embebe,
+    su hash y los campos que muestran los resultados de búsqueda
+    """
+    __tablename__ = "search_documents"
+    
+    fallo_id = Column(Integer, ForeignKey("fallos.id", ondelete="CASCADE"), primary_key=True)
+    texto = Column(Text, nullable=False)
+    hash = Column(String(64), nullable=False)
+    caratula = Column(Text, nullable=False)
+    resumen_ia = Column(Text)
+    fecha_fallo = Column(Date)
+    tribunal = Column(String(255))
+    materia = Column(String(100), index=True)
+    tipo_proceso = Column(String(100), index=True)
+    etiquetas = Column(ARRAY(String(100)), server_default="{}")
+    canonico_id = Column(Integer)  # fallos.canonico_id, para colapsar duplicados
+    actualizado_en = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_search_documents_etiquetas", "etiquetas", postgresql_using="gin"),
+    )
@@ -1,8 +1,8 @@
 """
 Schemas Pydantic para validación de datos
 """
-from pydantic import BaseModel
-from datetime import date
+from pydantic import BaseModel, Field, field_validator
+from datetime import date, datetime
 from typing import Optional, List
 
 
@@ -26,6 +26,22 @@ class FalloCreate(FalloBase):
     pass
 
 
+class FalloBulkItemResultado(BaseModel):
+    """Resultado de una fila de la ingesta masiva"""
+    indice: int
+    id: Optional[int] = None
+    estado: str  # creado | duplicado | invalido
+    error: Optional[str] = None
+
+
+class FalloBulkResponse(BaseModel):
+    """Schema de respuesta para la ingesta masiva de fallos"""
+    creados: int
+    duplicados: int
+    invalidos: int
+    resultados: List[FalloBulkItemResultado]
+
+
 class EtiquetaResponse(BaseModel):
     """Schema de respuesta para etiquetas"""
     id: int
@@ -41,8 +57,9 @@ class EtiquetaResponse(BaseModel):
 class FalloResponse(FalloBase):
     """Schema de respuesta para fallos"""
     id: int
-    created_at: Optional[str] = None
-    updated_at: Optional[str] = None
+    canonico_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
     
     class Config:
         from_attributes = True
@@ -51,3 +68,26 @@ class FalloResponse(FalloBase):
 class FalloDetalleResponse(FalloResponse):
     """Schema de respuesta detallada con etiquetas"""
     etiquetas: List[EtiquetaResponse] = []
+
+
+class AnalisisFallo(BaseModel):
+    """Salida estructurada del análisis de un fallo con IA (esquema de la herramienta de Claude)"""
+    resumen: str = Field(description="Resumen ejecutivo (máximo 150 palabras): hechos, conflicto legal y resolución")
+    palabras_clave: List[str] = Field(default_factory=list, description="Hasta 10 términos jurídicos relevantes")
+    materia: Optional[str] = Field(None, description="Civil, Penal, Laboral, Familia o Contencioso Administrativo")
+    tipo_proceso: Optional[str] = Field(None, description="Ej: Amparo, Recurso de Apelación, Juicio Ordinario")
+    subtemas: List[str] = Field(default_factory=list, description="Ej: Despido, Daños y Perjuicios")
+    resultado: Optional[str] = Field(None, description="Ej: Se hizo lugar, Se rechazó, Se confirmó, Se revocó")
+    actor: Optional[str] = Field(None, description="Actor o demandante")
+    demandado: Optional[str] = None
+    normas_citadas: List[str] = Field(default_factory=list, description="Leyes, artículos o códigos mencionados")
+
+    @field_validator("palabras_clave", "subtemas", "normas_citadas", mode="before")
+    @classmethod
+    def _lista(cls, valor):
+        # Desvíos frecuentes que no justifican una reparación: null o una lista separada por comas
+        if valor is None:
+            return []
+        if isinstance(valor, str):
+            return [parte.strip() for parte in valor.split(",") if parte.strip()]
+        return valor
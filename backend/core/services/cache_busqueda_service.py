@@ -0,0 +1,274 @@
+"""
+Cache de resultados de búsqueda (semántica e híbrida)
+
+La clave es (consulta normalizada, filtros, límite) y cada entrada guarda
+la versión del índice con la que se calculó. Toda transacción que escribe
+fallos, documentos de búsqueda, embeddings o sets incrementa la versión
+al confirmarse.
+
+Dos niveles:
+- LRU en proceso (siempre)
+- SQLite local compartido entre workers y con la ingesta
+  (SEARCH_CACHE_SQLITE, por defecto en el directorio temporal del sistema);
+  también guarda la versión del índice. Sin él, lo que escribe la ingesta
+  en otro proceso no invalida la cache de la API hasta el TTL.
+
+Stale-while-revalidate: una entrada vencida (por TTL o por versión) se
+sigue sirviendo hasta SEARCH_CACHE_STALE_SECONDS mientras se recalcula
+en segundo plano, así una consulta frecuente nunca espera un recálculo.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.metrics import perfil_actual
+from core.models import DocumentoBusqueda, Embedding, EmbeddingSet, Fallo
+
+FRESCA = "fresca"
+VENCIDA = "vencida"
+
+
+def normalizar_consulta(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+def clave_busqueda(tipo: str, query: str, limit: int, **filtros) -> str:
+    """Clave estable: los filtros vacíos no cuentan y las listas se ordenan"""
+    filtros = {
+        nombre: sorted(valor) if isinstance(valor, (list, tuple, set)) else valor
+        for nombre, valor in filtros.items()
+        if valor
+    }
+    contenido = json.dumps([tipo, normalizar_consulta(query), limit, filtros], sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class _NivelCompartido:
+    """Nivel SQLite en disco local, compartido entre procesos"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        with self._conexion() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta (id, version) VALUES (1, 0)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entradas "
+                "(clave TEXT PRIMARY KEY, version INTEGER, creado REAL, valor TEXT)"
+            )
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.ruta, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def version(self) -> int:
+        return self._conexion().execute("SELECT version FROM meta WHERE id = 1").fetchone()[0]
+
+    def incrementar_version(self):
+        self._conexion().execute("UPDATE meta SET version = version + 1 WHERE id = 1")
+
+    def leer(self, clave: str) -> Optional[Tuple[int, float, list]]:
+        fila = self._conexion().execute(
+            "SELECT version, creado, valor FROM entradas WHERE clave = ?", (clave,)
+        ).fetchone()
+        return (fila[0], fila[1], json.loads(fila[2])) if fila else None
+
+    def escribir(self, clave: str, version: int, creado: float, valor: list):
+        conn = self._conexion()
+        conn.execute(
+            "INSERT OR REPLACE INTO entradas (clave, version, creado, valor) VALUES (?, ?, ?, ?)",
+            (clave, version, creado, json.dumps(valor, default=str))
+        )
+        # Poda simple: descarta lo que ya no se serviría ni como vencido
+        conn.execute("DELETE FROM entradas WHERE creado < ?", (time.time() - settings.SEARCH_CACHE_STALE_SECONDS,))
+
+
+class CacheBusquedas:
+    """LRU versionada con nivel compartido opcional y stale-while-revalidate"""
+
+    def __init__(self):
+        self._version_local = 0
+        self._entradas: "OrderedDict[str, Tuple[int, float, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._compartido: Optional[_NivelCompartido] = None
+        self._en_curso: Dict[str, asyncio.Future] = {}
+        self._revalidando: Dict[str, asyncio.Task] = {}
+        self.estadisticas = {"aciertos": 0, "vencidas": 0, "fallos": 0}
+        if settings.SEARCH_CACHE_SQLITE:
+            try:
+                self._compartido = _NivelCompartido(settings.SEARCH_CACHE_SQLITE)
+            except sqlite3.Error as e:
+                print(f"Cache de búsquedas sin nivel compartido ({settings.SEARCH_CACHE_SQLITE}): {e}")
+
+    def version(self) -> int:
+        """Versión del índice (la del nivel compartido si está activo)"""
+        if self._compartido is not None:
+            try:
+                return self._compartido.version()
+            except sqlite3.Error:
+                pass
+        return self._version_local
+
+    def invalidar(self):
+        """Incrementa la versión: las entradas existentes pasan a vencidas"""
+        with self._lock:
+            self._version_local += 1
+        if self._compartido is not None:
+            try:
+                self._compartido.incrementar_version()
+            except sqlite3.Error:
+                pass
+
+    def _leer(self, clave: str) -> Optional[Tuple[int, float, list]]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                return entrada
+        if self._compartido is not None:
+            try:
+                entrada = self._compartido.leer(clave)
+            except sqlite3.Error:
+                return None
+            if entrada is not None:
+                self._guardar_local(clave, entrada)
+            return entrada
+        return None
+
+    def _guardar_local(self, clave: str, entrada: Tuple[int, float, list]):
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > settings.SEARCH_CACHE_MAX:
+                self._entradas.popitem(last=False)
+
+    def _guardar(self, clave: str, version: int, valor: list):
+        entrada = (version, time.time(), valor)
+        self._guardar_local(clave, entrada)
+        if self._compartido is not None:
+            try:
+                self._compartido.escribir(clave, *entrada)
+            except sqlite3.Error:
+                pass
+
+    def _estado(self, entrada: Tuple[int, float, list], version: int) -> Optional[str]:
+        version_entrada, creado, _ = entrada
+        edad = time.time() - creado
+        if version_entrada == version and edad < settings.SEARCH_CACHE_TTL_SECONDS:
+            return FRESCA
+        if edad < settings.SEARCH_CACHE_STALE_SECONDS:
+            return VENCIDA
+        return None
+
+    async def _calcular(self, clave: str, calcular: Callable[[], Awaitable[list]]) -> list:
+        """Calcula y guarda; pedidos simultáneos de la misma clave esperan el mismo cálculo"""
+        futuro = self._en_curso.get(clave)
+        if futuro is not None:
+            try:
+                return await asyncio.shield(futuro)
+            except asyncio.CancelledError:
+                if not futuro.cancelled():
+                    raise
+                # Se canceló el pedido que calculaba, no este: lo calcula este
+                return await self._calcular(clave, calcular)
+
+        futuro = self._en_curso[clave] = asyncio.get_running_loop().create_future()
+        try:
+            version = self.version()
+            valor = await calcular()
+            self._guardar(clave, version, valor)
+            futuro.set_result(valor)
+            return valor
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except BaseException as e:
+            futuro.set_exception(e)
+            futuro.exception()
+            raise
+        finally:
+            if not futuro.done():
+                futuro.cancel()
+            self._en_curso.pop(clave, None)
+
+    def _revalidar(self, clave: str, recalcular: Callable[[], Awaitable[list]]):
+        if clave in self._revalidando or clave in self._en_curso:
+            return
+
+        async def tarea():
+            try:
+                await self._calcular(clave, recalcular)
+            except Exception as e:
+                print(f"Error revalidando búsqueda cacheada: {e}")
+            finally:
+                self._revalidando.pop(clave, None)
+
+        self._revalidando[clave] = asyncio.get_running_loop().create_task(tarea())
+
+    async def obtener(
+        self,
+        clave: str,
+        calcular: Callable[[], Awaitable[list]],
+        recalcular: Callable[[], Awaitable[list]]
+    ) -> list:
+        """
+        Resultado cacheado o calculado con `calcular`. Una entrada vencida
+        se devuelve igual y se revalida en segundo plano con `recalcular`
+        (que no puede depender de la sesión del request).
+        """
+        entrada = self._leer(clave)
+        estado = self._estado(entrada, self.version()) if entrada is not None else None
+        perfil = perfil_actual.get()
+        if perfil is not None:
+            perfil.detalle["cache"] = estado or "fallo"
+
+        if estado == FRESCA:
+            self.estadisticas["aciertos"] += 1
+            return entrada[2]
+        if estado == VENCIDA:
+            self.estadisticas["vencidas"] += 1
+            self._revalidar(clave, recalcular)
+            return entrada[2]
+
+        self.estadisticas["fallos"] += 1
+        return await self._calcular(clave, calcular)
+
+
+cache_busquedas = CacheBusquedas()
+
+_MODELOS_INDICE = (Fallo, DocumentoBusqueda, Embedding, EmbeddingSet)
+
+
+def marcar_cambio_busqueda(db: Session):
+    """Para escrituras con SQL directo: invalida la cache al hacer commit"""
+    db.info["invalidar_busquedas"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _detectar_cambios_indice(session, flush_context):
+    if any(isinstance(obj, _MODELOS_INDICE) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["invalidar_busquedas"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session):
+    if session.info.pop("invalidar_busquedas", False):
+        cache_busquedas.invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marca(session):
+    session.info.pop("invalidar_busquedas", None)
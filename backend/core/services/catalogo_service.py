@@ -0,0 +1,104 @@
+"""
+Cache en proceso del catálogo de etiquetas (tesauro)
+
+Las respuestas se guardan ya serializadas a bytes junto con su ETag, de
+modo que un acierto o un 304 no tocan pydantic. La cache se invalida al
+confirmar (commit) una transacción de este proceso que insertó, modificó o
+borró etiquetas. Los cambios de otros procesos (ingesta, otros workers) se
+detectan con una firma de la tabla que se consulta como máximo cada
+CATALOGO_REVALIDAR_SEGUNDOS.
+"""
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models import Etiqueta
+
+# Cambia con cualquier alta, baja o modificación de etiquetas
+SQL_FIRMA = text("""
+    SELECT count(*), COALESCE(max(id), 0),
+           COALESCE(sum(hashtext(nombre || '|' || COALESCE(categoria, '') || '|' || COALESCE(es_generada, ''))), 0)
+    FROM etiquetas
+""")
+
+
+class CatalogoEtiquetas:
+    """Cache versionada de respuestas pre-serializadas"""
+
+    def __init__(self):
+        self.version = 0
+        self._entradas: Dict[str, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self._firma: Optional[tuple] = None
+        self._revalidado = 0.0
+
+    def invalidar(self):
+        """Descarta todas las respuestas cacheadas"""
+        with self._lock:
+            self.version += 1
+            self._entradas.clear()
+
+    def revalidar(self, consultar_firma: Callable[[], Optional[tuple]]):
+        """
+        Invalida si la tabla etiquetas cambió desde la última firma. Consulta
+        la base como máximo cada CATALOGO_REVALIDAR_SEGUNDOS.
+        """
+        ahora = time.monotonic()
+        if ahora - self._revalidado < settings.CATALOGO_REVALIDAR_SEGUNDOS:
+            return
+        self._revalidado = ahora
+        firma = consultar_firma()
+        if firma is None:
+            return
+        if self._firma is not None and firma != self._firma:
+            self.invalidar()
+        self._firma = firma
+
+    def etag(self, clave: str) -> Optional[str]:
+        """ETag de la respuesta cacheada (None si no está en cache)"""
+        entrada = self._entradas.get(clave)
+        return entrada[1] if entrada else None
+
+    def obtener(self, clave: str, cargar: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """
+        Devuelve (cuerpo, etag). En un fallo de cache llama a `cargar`.
+        El ETag es el hash del contenido, así coincide entre workers.
+        """
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            return entrada
+
+        version = self.version
+        cuerpo = cargar()
+        entrada = (cuerpo, '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"')
+
+        with self._lock:
+            # Si se invalidó mientras se cargaba, no se guarda el dato viejo
+            if version == self.version:
+                self._entradas[clave] = entrada
+        return entrada
+
+
+catalogo_etiquetas = CatalogoEtiquetas()
+
+
+@event.listens_for(Session, "after_flush")
+def _detectar_cambios_etiquetas(session, flush_context):
+    if any(isinstance(obj, Etiqueta) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["invalidar_catalogo"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(session):
+    if session.info.pop("invalidar_catalogo", False):
+        catalogo_etiquetas.invalidar()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_marca(session):
+    session.info.pop("invalidar_catalogo", None)
@@ -0,0 +1,266 @@
+"""
+Servicio de pasajes (chunks) de texto_completo
+
+El documento de búsqueda solo tiene carátula + resumen + etiquetas; el
+razonamiento del fallo queda en texto_completo. Se lo parte en pasajes
+solapados, cada uno con su vector en fallo_chunks, y la búsqueda por
+pasajes agrega los mejores pasajes de cada fallo (máximo o suma)
+devolviendo el mejor como resaltado.
+
+El crecimiento se acota con CHUNK_MAX_POR_FALLO y guardando solo los
+offsets de cada pasaje, no su texto. Lo que queda después del último
+pasaje permitido no se indexa (se informa al indexar).
+"""
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import engine
+from core.metrics import medir_etapa
+from core.services.cache_busqueda_service import marcar_cambio_busqueda
+from core.services.crawl_service import hash_contenido
+from core.services.embedding_service import EmbeddingService
+from core.services.embedding_set_service import nombre_indice, set_activo, sets_escritura
+
+AGREGACIONES = ("max", "sum")
+
+# Cortes preferidos, del más fuerte al más débil
+_CORTES = (re.compile(r"\n\s*\n"), re.compile(r"[.;:]\s"), re.compile(r"\s"))
+
+
+def dividir_en_pasajes(
+    texto: str,
+    tamano: Optional[int] = None,
+    solapamiento: Optional[int] = None,
+    maximo: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """
+    Offsets (inicio, fin) de pasajes de ~tamano caracteres que se solapan
+    en ~solapamiento. Cada corte se corre al último fin de párrafo,
+    oración o palabra dentro de la segunda mitad de la ventana.
+    """
+    tamano = tamano or settings.CHUNK_TAMANO
+    solapamiento = settings.CHUNK_SOLAPAMIENTO if solapamiento is None else solapamiento
+    maximo = maximo or settings.CHUNK_MAX_POR_FALLO
+
+    pasajes = []
+    inicio, largo = 0, len(texto)
+    while inicio < largo and len(pasajes) < maximo:
+        fin = min(inicio + tamano, largo)
+        if fin < largo:
+            ventana = texto[inicio + tamano // 2:fin]
+            for corte in _CORTES:
+                coincidencias = list(corte.finditer(ventana))
+                if coincidencias:
+                    fin = inicio + tamano // 2 + coincidencias[-1].end()
+                    break
+
+        pasaje = texto[inicio:fin]
+        recorte = len(pasaje) - len(pasaje.lstrip())
+        if pasaje.strip():
+            pasajes.append((inicio + recorte, inicio + len(pasaje.rstrip())))
+
+        if fin >= largo:
+            break
+        inicio = max(fin - solapamiento, inicio + 1)
+    return pasajes
+
+
+class ChunkService:
+    """Indexado y búsqueda de pasajes"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.embedding_service = EmbeddingService(db)
+
+    def crear_indice(self, modelo: str, dimensiones: int):
+        """Índice HNSW parcial de los pasajes de un modelo (CONCURRENTLY)"""
+        literal = modelo.replace("'", "''")
+        nombre = nombre_indice(modelo, "fallo_chunks")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} "
+                f"ON fallo_chunks USING hnsw ((embedding::vector({dimensiones})) vector_cosine_ops) "
+                f"WHERE modelo = '{literal}'"
+            ))
+
+    async def indexar_fallo(self, fallo_id: int, modelos: Optional[List[str]] = None) -> int:
+        """
+        Parte el texto_completo del fallo y embebe sus pasajes en lotes,
+        para cada set de escritura cuyo troceo no esté vigente.
+
+        Returns:
+            Cantidad de pasajes embebidos
+        """
+        fila = self.db.execute(
+            text("SELECT texto_completo FROM fallos WHERE id = :id"), {"id": fallo_id}
+        ).first()
+        if fila is None:
+            raise ValueError(f"Fallo {fallo_id} no encontrado")
+        if not fila.texto_completo:
+            return 0
+
+        texto = fila.texto_completo
+        hash_texto = hash_contenido(texto)
+        modelos = modelos or [modelo for modelo, _ in sets_escritura(self.db)]
+        vigentes = {
+            f.modelo for f in self.db.execute(
+                text("SELECT DISTINCT modelo FROM fallo_chunks WHERE fallo_id = :id AND hash_texto = :hash"),
+                {"id": fallo_id, "hash": hash_texto}
+            )
+        }
+
+        pasajes = dividir_en_pasajes(texto)
+        if pasajes and texto[pasajes[-1][1]:].strip():
+            print(
+                f"Fallo {fallo_id}: solo se indexan sus primeros {len(pasajes)} pasajes (CHUNK_MAX_POR_FALLO); "
+                f"quedan {len(texto) - pasajes[-1][1]} caracteres sin indexar"
+            )
+        embebidos = 0
+        for modelo in modelos:
+            if modelo in vigentes:
+                continue
+
+            vectores = []
+            for desde in range(0, len(pasajes), settings.EMBEDDING_BACKFILL_LOTE):
+                lote = pasajes[desde:desde + settings.EMBEDDING_BACKFILL_LOTE]
+                vectores += await self.embedding_service.generar_embeddings(
+                    [texto[inicio:fin] for inicio, fin in lote], modelo
+                )
+
+            marcar_cambio_busqueda(self.db)
+            self.db.execute(
+                text("DELETE FROM fallo_chunks WHERE fallo_id = :id AND modelo = :modelo"),
+                {"id": fallo_id, "modelo": modelo}
+            )
+            if pasajes:
+                self.db.execute(
+                    text("""
+                        INSERT INTO fallo_chunks (fallo_id, modelo, orden, inicio, fin, embedding, hash_texto)
+                        VALUES (:fallo_id, :modelo, :orden, :inicio, :fin, CAST(:embedding AS vector), :hash_texto)
+                    """),
+                    [
+                        {
+                            "fallo_id": fallo_id,
+                            "modelo": modelo,
+                            "orden": orden,
+                            "inicio": inicio,
+                            "fin": fin,
+                            "embedding": "[" + ",".join(map(str, vector)) + "]",
+                            "hash_texto": hash_texto,
+                        }
+                        for orden, ((inicio, fin), vector) in enumerate(zip(pasajes, vectores))
+                    ]
+                )
+            embebidos += len(pasajes)
+
+        self.db.commit()
+        return embebidos
+
+    def pendientes(self, modelo: str, limite: int) -> List[int]:
+        """
+        Fallos con texto y sin pasajes en el set de un modelo (las copias no
+        se indexan). Un texto solo de espacios, tabs o saltos de línea no
+        produce pasajes: no cuenta como pendiente, o se lo reintentaría siempre.
+        """
+        return list(self.db.execute(text("""
+            SELECT f.id
+            FROM fallos f
+            WHERE f.texto_completo ~ '[^[:space:]]'
+              AND f.canonico_id IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM fallo_chunks c WHERE c.fallo_id = f.id AND c.modelo = :modelo
+              )
+            ORDER BY f.id
+            LIMIT :limite
+        """), {"modelo": modelo, "limite": limite}).scalars())
+
+    async def buscar_pasajes(
+        self,
+        query: str,
+        limit: int = 10,
+        agregacion: str = "max",
+        materia: Optional[str] = None,
+        tipo_proceso: Optional[str] = None,
+        norma: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Búsqueda por pasajes: trae por ANN los pasajes más cercanos,
+        agrega por fallo (máxima similitud o suma) y devuelve el mejor
+        pasaje de cada fallo como resaltado.
+        """
+        from core.services.normativa_service import filtro_norma_sql
+        from core.services.duplicado_service import colapsar_duplicados, limite_con_duplicados
+        from core.services.search_service import ajustar_ann, distancia_sql, ejecutar_busqueda
+
+        if agregacion not in AGREGACIONES:
+            raise ValueError(f"Agregación inválida: {agregacion}")
+
+        modelo, dimensiones = set_activo(self.db)
+        with medir_etapa("embedding"):
+            query_embedding = await self.embedding_service.generar_embedding(query, modelo)
+
+        distancia = distancia_sql(dimensiones, alias="c")
+        params = {
+            "query_embedding": "[" + ",".join(map(str, query_embedding)) + "]",
+            "modelo": modelo,
+            "candidatos": limit * settings.CHUNK_CANDIDATOS_POR_RESULTADO,
+        }
+
+        # Los filtros van dentro de hits, antes del LIMIT de candidatos:
+        # aplicados después dejarían menos fallos que limit
+        filtros = ""
+        if materia:
+            filtros += " AND d.materia = :materia"
+            params["materia"] = materia
+
+        if tipo_proceso:
+            filtros += " AND d.tipo_proceso = :tipo_proceso"
+            params["tipo_proceso"] = tipo_proceso
+
+        filtros += filtro_norma_sql(norma, params)
+        ajustar_ann(self.db, filtros)
+
+        sql = f"""
+        WITH hits AS (
+            SELECT c.fallo_id, c.inicio, c.fin, 1 - ({distancia}) AS similitud
+            FROM fallo_chunks c
+            {"JOIN search_documents d ON d.fallo_id = c.fallo_id" if filtros else ""}
+            WHERE c.modelo = :modelo {filtros}
+            ORDER BY {distancia}
+            LIMIT :candidatos
+        ),
+        agregados AS (
+            SELECT fallo_id, max(similitud) AS maxima, sum(similitud) AS suma, count(*) AS pasajes
+            FROM hits
+            GROUP BY fallo_id
+        ),
+        mejores AS (
+            SELECT DISTINCT ON (fallo_id) fallo_id, inicio, fin
+            FROM hits
+            ORDER BY fallo_id, similitud DESC
+        )
+        SELECT
+            d.fallo_id AS id,
+            d.caratula,
+            d.resumen_ia,
+            d.fecha_fallo,
+            d.tribunal,
+            d.materia,
+            d.canonico_id,
+            {"a.maxima" if agregacion == "max" else "a.suma"} AS similitud,
+            a.pasajes,
+            substring(f.texto_completo FROM m.inicio + 1 FOR m.fin - m.inicio) AS pasaje
+        FROM agregados a
+        JOIN mejores m ON m.fallo_id = a.fallo_id
+        JOIN search_documents d ON d.fallo_id = a.fallo_id
+        JOIN fallos f ON f.id = a.fallo_id
+        ORDER BY similitud DESC
+        LIMIT :limit
+        """
+        params["limit"] = limite_con_duplicados(limit)
+
+        return colapsar_duplicados(ejecutar_busqueda(self.db, sql, params), limit)
@@ -0,0 +1,185 @@
+"""
+Servicio de crawl incremental de fuentes de jurisprudencia
+"""
+import hashlib
+from datetime import date
+from typing import Optional, List, Dict, Callable
+from urllib.parse import urljoin
+
+from dateutil import parser as date_parser
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models import Fallo, ScraperEstado
+
+FUENTE_JUJUY = "jujuy"
+
+
+def hash_contenido(texto: Optional[str]) -> Optional[str]:
+    """sha256 del texto normalizado (espacios colapsados) para detectar cambios"""
+    if not texto:
+        return None
+    normalizado = " ".join(texto.split())
+    return hashlib.sha256(normalizado.encode("utf-8")).hexdigest()
+
+
+def normalizar_url(url: Optional[str]) -> Optional[str]:
+    """URL absoluta respecto del buscador (las marcas viejas pueden ser relativas)"""
+    return urljoin(settings.SCRAPER_JUJUY_URL, url) if url else None
+
+
+def parsear_fecha(texto: Optional[str]) -> Optional[date]:
+    """Convierte la fecha del listado (dd/mm/aaaa u otros formatos) a date"""
+    if not texto:
+        return None
+    try:
+        return date_parser.parse(texto, dayfirst=True, fuzzy=True).date()
+    except (ValueError, OverflowError):
+        return None
+
+
+class CrawlService:
+    """
+    Crawl incremental: recuerda la marca de avance por fuente, deja de
+    paginar al llegar a fallos conocidos y solo devuelve como pendientes
+    los fallos nuevos o cuyo contenido cambió.
+    """
+
+    def __init__(self, db: Session, fuente: str = FUENTE_JUJUY):
+        self.db = db
+        self.fuente = fuente
+
+    def obtener_marca(self) -> Optional[ScraperEstado]:
+        """Marca de avance de la fuente (None si nunca se crawleó)"""
+        return self.db.query(ScraperEstado).filter(ScraperEstado.fuente == self.fuente).first()
+
+    def predicado_conocido(self, marca: Optional[ScraperEstado]) -> Optional[Callable[[Dict], bool]]:
+        """
+        Un fallo del listado es conocido si es la última URL vista o si es
+        anterior a la fecha más nueva registrada, y además ya está guardado
+        con la misma carátula y fecha (si el sitio lo corrigió se vuelve a
+        descargar). Los de la misma fecha se vuelven a revisar, porque el
+        sitio puede publicar varios por día.
+        """
+        if marca is None or (marca.ultima_url is None and marca.ultima_fecha is None):
+            return None
+        ultima_url = normalizar_url(marca.ultima_url)
+
+        def es_conocido(item: Dict) -> bool:
+            url = normalizar_url(item.get('url'))
+            fecha = parsear_fecha(item.get('fecha'))
+            if not (ultima_url and url == ultima_url) and not (marca.ultima_fecha and fecha and fecha < marca.ultima_fecha):
+                return False
+            guardado = self.db.query(Fallo.caratula, Fallo.fecha_fallo).filter(Fallo.url_original == url).first()
+            return guardado is not None and guardado.caratula == item.get('caratula') and (
+                fecha is None or guardado.fecha_fallo == fecha
+            )
+
+        return es_conocido
+
+    def ejecutar(
+        self,
+        max_pages: Optional[int] = None,
+        engine: Optional[str] = None,
+        incremental: Optional[bool] = None
+    ) -> Dict[str, List[int]]:
+        """
+        Ejecuta el scraper de la fuente y persiste el resultado.
+
+        Returns:
+            {"nuevos": [ids], "modificados": [ids], "sin_cambios": [ids]}
+            Solo nuevos y modificados deben encolarse para etiquetado y embedding.
+        """
+        from scrapers.jujuy_scraper import scrape_fallos_jujuy
+
+        incremental = settings.SCRAPER_INCREMENTAL if incremental is None else incremental
+        marca = self.obtener_marca()
+        es_conocido = self.predicado_conocido(marca) if incremental else None
+
+        fallos = scrape_fallos_jujuy(max_pages=max_pages, engine=engine, es_conocido=es_conocido)
+
+        resultado = self.guardar(fallos)
+        self.actualizar_marca(fallos, marca)
+        return resultado
+
+    def guardar(self, fallos: List[Dict], commit: bool = True) -> Dict[str, List[int]]:
+        """
+        Inserta los fallos nuevos y actualiza los que cambiaron de contenido.
+        Los existentes se buscan por url_original en una sola consulta.
+        Con commit=False solo hace flush (el llamador confirma).
+        """
+        resultado = {"nuevos": [], "modificados": [], "sin_cambios": []}
+
+        # Una URL repetida en el mismo listado se guarda una sola vez
+        unicos, vistas = [], set()
+        for item in fallos:
+            url = normalizar_url(item.get('url'))
+            if url and url in vistas:
+                continue
+            vistas.add(url)
+            unicos.append({**item, 'url': url})
+        fallos = unicos
+        urls = [f['url'] for f in fallos if f.get('url')]
+
+        existentes = {}
+        if urls:
+            existentes = {
+                fallo.url_original: fallo
+                for fallo in self.db.query(Fallo).filter(Fallo.url_original.in_(urls))
+            }
+
+        nuevos = []
+        for item in fallos:
+            texto = item.get('texto_completo')
+            hash_nuevo = hash_contenido(texto or item.get('caratula'))
+            fallo = existentes.get(item.get('url'))
+
+            if fallo is None:
+                fallo = Fallo(
+                    caratula=item['caratula'],
+                    fecha_fallo=parsear_fecha(item.get('fecha')),
+                    tribunal=item.get('tribunal'),
+                    texto_completo=texto,
+                    url_original=item.get('url'),
+                    hash_contenido=hash_nuevo
+                )
+                self.db.add(fallo)
+                nuevos.append(fallo)
+                if fallo.url_original:
+                    existentes[fallo.url_original] = fallo
+            elif not texto and fallo.texto_completo:
+                # Falló la descarga del detalle: no se pisa el texto guardado
+                resultado["sin_cambios"].append(fallo.id)
+            elif fallo.hash_contenido != hash_nuevo:
+                fallo.caratula = item['caratula']
+                fallo.tribunal = item.get('tribunal') or fallo.tribunal
+                if texto:
+                    fallo.texto_completo = texto
+                fallo.hash_contenido = hash_nuevo
+                resultado["modificados"].append(fallo.id)
+            else:
+                resultado["sin_cambios"].append(fallo.id)
+
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
+        resultado["nuevos"] = [fallo.id for fallo in nuevos]
+        return resultado
+
+    def actualizar_marca(self, fallos: List[Dict], marca: Optional[ScraperEstado] = None):
+        """Avanza la marca con la fecha más nueva y la primera URL del listado"""
+        if not fallos:
+            return
+
+        fechas = [f for f in (parsear_fecha(item.get('fecha')) for item in fallos) if f]
+
+        if marca is None:
+            marca = ScraperEstado(fuente=self.fuente)
+            self.db.add(marca)
+
+        if fechas and (marca.ultima_fecha is None or max(fechas) >= marca.ultima_fecha):
+            marca.ultima_fecha = max(fechas)
+        marca.ultima_url = normalizar_url(fallos[0].get('url')) or marca.ultima_url
+
+        self.db.commit()
@@ -0,0 +1,126 @@
+"""
+Servicio del documento de búsqueda materializado (tabla search_documents)
+"""
+import hashlib
+from typing import Optional, List, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models import DocumentoBusqueda
+from core.services.cache_busqueda_service import marcar_cambio_busqueda
+
+SQL_DOCUMENTOS = """
+SELECT
+    f.id,
+    f.caratula,
+    f.resumen_ia,
+    f.fecha_fallo,
+    f.tribunal,
+    f.materia,
+    f.tipo_proceso,
+    f.canonico_id,
+    d.hash AS hash_actual,
+    COALESCE(
+        array_agg(et.nombre ORDER BY et.nombre) FILTER (WHERE et.nombre IS NOT NULL),
+        '{{}}'
+    ) AS etiquetas
+FROM fallos f
+LEFT JOIN search_documents d ON d.fallo_id = f.id
+LEFT JOIN fallo_etiquetas fe ON fe.fallo_id = f.id
+LEFT JOIN etiquetas et ON et.id = fe.etiqueta_id
+WHERE {filtro}
+GROUP BY f.id, d.hash
+"""
+
+
+def construir_documento(caratula: str, resumen_ia: Optional[str], etiquetas: Iterable[str]) -> str:
+    """
+    Documento de búsqueda que se embebe:
+    Carátula + Resumen IA + Etiquetas
+    """
+    documento = f"{caratula}\n\n"
+
+    if resumen_ia:
+        documento += f"{resumen_ia}\n\n"
+
+    etiquetas = list(etiquetas)
+    if etiquetas:
+        documento += f"Etiquetas: {', '.join(etiquetas)}\n\n"
+
+    return documento
+
+
+def hash_documento(documento: str) -> str:
+    return hashlib.sha256(documento.encode("utf-8")).hexdigest()
+
+
+class DocumentoService:
+    """Mantiene search_documents al día de forma incremental"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refrescar(self, fallo_ids: Optional[Iterable[int]] = None, commit: bool = True) -> List[int]:
+        """
+        Reconstruye los documentos de los fallos indicados, o de los que
+        cambiaron desde su última materialización si no se indican.
+        Una sola consulta trae los fallos con sus etiquetas (sin lazy loads).
+
+        Returns:
+            Ids de los fallos cuyo documento cambió (requieren re-embedding)
+        """
+        if fallo_ids is not None:
+            fallo_ids = list(fallo_ids)
+            if not fallo_ids:
+                return []
+            sql = SQL_DOCUMENTOS.format(filtro="f.id = ANY(:ids)")
+            params = {"ids": fallo_ids}
+        else:
+            sql = SQL_DOCUMENTOS.format(
+                filtro="d.fallo_id IS NULL OR f.updated_at > d.actualizado_en"
+            )
+            params = {}
+
+        filas, cambiados = [], []
+        for fila in self.db.execute(text(sql), params):
+            documento = construir_documento(fila.caratula, fila.resumen_ia, fila.etiquetas)
+            nuevo_hash = hash_documento(documento)
+            if nuevo_hash != fila.hash_actual:
+                cambiados.append(fila.id)
+
+            filas.append({
+                "fallo_id": fila.id,
+                "texto": documento,
+                "hash": nuevo_hash,
+                "caratula": fila.caratula,
+                "resumen_ia": fila.resumen_ia,
+                "fecha_fallo": fila.fecha_fallo,
+                "tribunal": fila.tribunal,
+                "materia": fila.materia,
+                "tipo_proceso": fila.tipo_proceso,
+                "etiquetas": list(fila.etiquetas),
+                "canonico_id": fila.canonico_id,
+            })
+
+        if cambiados:
+            marcar_cambio_busqueda(self.db)
+        for inicio in range(0, len(filas), settings.BULK_LOTE_FILAS):
+            stmt = insert(DocumentoBusqueda).values(filas[inicio:inicio + settings.BULK_LOTE_FILAS])
+            columnas = {c: stmt.excluded[c] for c in filas[0] if c != "fallo_id"}
+            columnas["actualizado_en"] = text("now()")
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=[DocumentoBusqueda.fallo_id],
+                set_=columnas
+            ))
+
+        if commit:
+            self.db.commit()
+        return cambiados
+
+    def obtener(self, fallo_id: int) -> Optional[DocumentoBusqueda]:
+        """Documento materializado de un fallo (lo refresca si hace falta)"""
+        self.refrescar([fallo_id])
+        return self.db.get(DocumentoBusqueda, fallo_id, populate_existing=True)
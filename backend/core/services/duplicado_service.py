@@ -0,0 +1,331 @@
+"""
+Detección de fallos casi duplicados (re-publicaciones, otra URL, OCR)
+
+Cada texto_completo se reduce a una firma MinHash de sus shingles de
+palabras (one-permutation hashing: un solo hash por shingle, repartido en
+DEDUP_PERMUTACIONES cubetas, con densificación por rotación de las vacías).
+La firma se parte en DEDUP_BANDAS bandas y cada banda se guarda como clave
+en fallo_lsh: los candidatos son los fallos que comparten alguna clave, así
+que cada fallo nuevo se compara contra unos pocos y no contra el corpus.
+
+Un texto parecido no alcanza: los fallos de modelo (misma plantilla, otras
+partes) superan DEDUP_UMBRAL. Solo se vinculan si además son el mismo caso
+(mismo expediente o carátulas parecidas) o si el texto es casi idéntico.
+
+La copia queda vinculada al fallo canónico (fallos.canonico_id): la ingesta
+le copia el análisis del canónico en lugar de llamar a la IA, no la embebe,
+y las búsquedas la muestran agrupada bajo un único resultado. registrar()
+toma un advisory lock de la transacción: dos extracciones simultáneas de
+copias no pueden quedar ambas como canónicas.
+"""
+import hashlib
+import re
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.instrumentacion import instrumentar
+from core.metrics import medir_etapa
+from core.models import Fallo
+from core.services.cache_busqueda_service import marcar_cambio_busqueda
+from core.services.etiquetador_service import plegar
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+_MASCARA = (1 << 62) - 1
+_ROTACION = 0x9E3779B97F4A7C15
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]")
+
+
+def _hash64(contenido: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(contenido, digest_size=8).digest(), "big")
+
+
+def firma_minhash(texto: str, permutaciones: Optional[int] = None) -> Optional[List[int]]:
+    """
+    Firma MinHash de los shingles de palabras del texto (sin tildes ni
+    mayúsculas). None si el texto es demasiado corto para compararlo.
+    """
+    palabras = _PALABRA.findall(plegar(texto or ""))
+    if len(palabras) < settings.DEDUP_MIN_PALABRAS:
+        return None
+
+    cubetas = permutaciones or settings.DEDUP_PERMUTACIONES
+    k = settings.DEDUP_SHINGLE
+    shingles = {" ".join(palabras[i:i + k]) for i in range(len(palabras) - k + 1)}
+
+    minimos: List[Optional[int]] = [None] * cubetas
+    for shingle in shingles:
+        cubeta, valor = divmod(_hash64(shingle.encode("utf-8")), 1 << 57)
+        cubeta %= cubetas
+        if minimos[cubeta] is None or valor < minimos[cubeta]:
+            minimos[cubeta] = valor
+
+    # Densificación: una cubeta vacía toma el mínimo de la siguiente no vacía
+    # (circular), marcado con la distancia para que solo coincida con otra
+    # firma que lo tomó desde la misma posición
+    firma = []
+    for cubeta in range(cubetas):
+        distancia = 0
+        while minimos[(cubeta + distancia) % cubetas] is None:
+            distancia += 1
+        valor = minimos[(cubeta + distancia) % cubetas]
+        firma.append(valor if not distancia else (valor ^ (distancia * _ROTACION)) & _MASCARA)
+    return firma
+
+
+def claves_lsh(firma: List[int], bandas: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(banda, clave) de cada banda de filas consecutivas de la firma"""
+    bandas = bandas or settings.DEDUP_BANDAS
+    filas = len(firma) // bandas
+    return [
+        (banda, int.from_bytes(
+            hashlib.blake2b(struct.pack(f">{filas}q", *firma[banda * filas:(banda + 1) * filas]),
+                            digest_size=8).digest(),
+            "big", signed=True
+        ))
+        for banda in range(bandas)
+    ]
+
+
+def similitud_firmas(a: Optional[List[int]], b: Optional[List[int]]) -> float:
+    """Jaccard estimado: fracción de posiciones iguales (0 si falta alguna firma)"""
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def mismo_caso(similitud: float, caratula_a: Optional[str], expediente_a: Optional[str],
+               caratula_b: Optional[str], expediente_b: Optional[str]) -> bool:
+    """
+    Si dos fallos de texto parecido (>= DEDUP_UMBRAL) son el mismo: texto casi
+    idéntico, mismo expediente o carátulas parecidas
+    """
+    if similitud >= settings.DEDUP_UMBRAL_TEXTO:
+        return True
+    expediente_a = _NO_ALFANUMERICO.sub("", plegar(expediente_a or ""))
+    if expediente_a and expediente_a == _NO_ALFANUMERICO.sub("", plegar(expediente_b or "")):
+        return True
+    palabras_a = set(_PALABRA.findall(plegar(caratula_a or "")))
+    palabras_b = set(_PALABRA.findall(plegar(caratula_b or "")))
+    if not palabras_a or not palabras_b:
+        return False
+    return len(palabras_a & palabras_b) / len(palabras_a | palabras_b) >= settings.DEDUP_UMBRAL_CARATULA
+
+
+def colapsar_duplicados(resultados: List[dict], limit: int) -> List[dict]:
+    """
+    Un resultado por fallo canónico, el mejor ubicado. Los ids de las demás
+    copias encontradas van en 'duplicados' (sin DEDUP_COLAPSAR solo recorta).
+    """
+    if not settings.DEDUP_COLAPSAR:
+        return resultados[:limit]
+
+    grupos: Dict[int, dict] = {}
+    with medir_etapa("colapsar"):
+        for resultado in resultados:
+            canonico = resultado.pop("canonico_id", None) or resultado["id"]
+            if canonico in grupos:
+                grupos[canonico]["duplicados"].append(resultado["id"])
+            else:
+                resultado["duplicados"] = []
+                grupos[canonico] = resultado
+    return list(grupos.values())[:limit]
+
+
+def limite_con_duplicados(limit: int) -> int:
+    """Candidatos a pedir para que, colapsadas las copias, queden limit resultados"""
+    return limit * settings.DEDUP_SOBREPEDIDO if settings.DEDUP_COLAPSAR else limit
+
+
+class DuplicadoService:
+    """Firmas MinHash, buckets LSH y vínculo de cada copia con su fallo canónico"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _candidatos(self, fallo_id: int, claves: List[Tuple[int, int]]) -> list:
+        """(fallo_id, firma, caratula, expediente) de los fallos que comparten alguna banda"""
+        return self.db.execute(text("""
+            SELECT DISTINCT ON (l.fallo_id) l.fallo_id, f.firma, fa.caratula, fa.expediente
+            FROM unnest(CAST(:bandas AS smallint[]), CAST(:claves AS bigint[])) AS b(banda, clave)
+            JOIN fallo_lsh l ON l.banda = b.banda AND l.clave = b.clave
+            JOIN fallo_firmas f ON f.fallo_id = l.fallo_id
+            JOIN fallos fa ON fa.id = l.fallo_id
+            WHERE l.fallo_id <> :fallo_id
+        """), {
+            "bandas": [banda for banda, _ in claves],
+            "claves": [clave for _, clave in claves],
+            "fallo_id": fallo_id,
+        }).all()
+
+    def _vincular(self, fallo_id: int, canonico_id: Optional[int]):
+        """Fija el canónico del fallo; sus propias copias pasan al nuevo canónico"""
+        ids = [fallo_id]
+        if canonico_id is not None:
+            ids += [fila[0] for fila in self.db.execute(
+                text("SELECT id FROM fallos WHERE canonico_id = :fallo_id"), {"fallo_id": fallo_id}
+            )]
+        cambiados = 0
+        # updated_at: el índice de facetas relee los fallos que cambiaron
+        for tabla, columna, marca in (("fallos", "id", "updated_at"), ("search_documents", "fallo_id", "actualizado_en")):
+            cambiados += self.db.execute(text(f"""
+                UPDATE {tabla} SET canonico_id = :canonico_id, {marca} = now()
+                WHERE {columna} = ANY(:ids) AND canonico_id IS DISTINCT FROM :canonico_id
+            """), {"canonico_id": canonico_id, "ids": ids}).rowcount
+        if cambiados:
+            marcar_cambio_busqueda(self.db)
+
+    def registrar(self, fallo_id: int, texto: str, commit: bool = True) -> dict:
+        """
+        Calcula la firma del fallo, la indexa en los buckets LSH y lo vincula
+        con el canónico del candidato más parecido que supere DEDUP_UMBRAL y
+        sea el mismo caso (mismo_caso)
+
+        Returns:
+            canonico_id (None si el fallo es canónico), similitud y candidatos
+        """
+        # Serializa el registro hasta el commit: un fallo registrado en paralelo
+        # ya tiene sus bandas a la vista cuando se buscan los candidatos
+        self.db.execute(text("SELECT pg_advisory_xact_lock(hashtext('jurisar:duplicados'))"))
+        firma = firma_minhash(texto)
+        self.db.execute(text("DELETE FROM fallo_lsh WHERE fallo_id = :fallo_id"), {"fallo_id": fallo_id})
+        if firma is None:
+            self.db.execute(text("DELETE FROM fallo_firmas WHERE fallo_id = :fallo_id"), {"fallo_id": fallo_id})
+            self._vincular(fallo_id, None)
+            if commit:
+                self.db.commit()
+            return {"fallo_id": fallo_id, "canonico_id": None, "similitud": None, "candidatos": 0}
+
+        claves = claves_lsh(firma)
+        candidatos = self._candidatos(fallo_id, claves)
+        propio = self.db.execute(
+            text("SELECT caratula, expediente FROM fallos WHERE id = :id"), {"id": fallo_id}
+        ).first()
+        # De más parecido a menos (a igual parecido, el más antiguo)
+        parecidos = sorted(
+            ((similitud_firmas(firma, candidato.firma), candidato) for candidato in candidatos),
+            key=lambda par: (-par[0], par[1].fallo_id)
+        )
+        mejor_id = next((
+            candidato.fallo_id for parecido, candidato in parecidos
+            if parecido >= settings.DEDUP_UMBRAL and propio is not None and mismo_caso(
+                parecido, propio.caratula, propio.expediente, candidato.caratula, candidato.expediente
+            )
+        ), None)
+        similitud = parecidos[0][0] if parecidos else 0.0
+
+        canonico_id = None
+        if mejor_id is not None:
+            canonico_id = self.db.execute(
+                text("SELECT COALESCE(canonico_id, id) FROM fallos WHERE id = :id"), {"id": mejor_id}
+            ).scalar()
+            if canonico_id == fallo_id:
+                # El candidato es copia de este fallo: este sigue siendo el canónico
+                canonico_id = None
+
+        self.db.execute(text("""
+            INSERT INTO fallo_firmas (fallo_id, firma) VALUES (:fallo_id, :firma)
+            ON CONFLICT (fallo_id) DO UPDATE SET firma = EXCLUDED.firma, actualizado_en = now()
+        """), {"fallo_id": fallo_id, "firma": firma})
+        self.db.execute(text("""
+            INSERT INTO fallo_lsh (banda, clave, fallo_id) VALUES (:banda, :clave, :fallo_id)
+        """), [{"banda": banda, "clave": clave, "fallo_id": fallo_id} for banda, clave in claves])
+        self._vincular(fallo_id, canonico_id)
+
+        if commit:
+            self.db.commit()
+        return {
+            "fallo_id": fallo_id,
+            "canonico_id": canonico_id,
+            "similitud": round(similitud, 3) if parecidos else None,
+            "candidatos": len(candidatos),
+        }
+
+    def copiar_analisis(self, fallo: Fallo) -> bool:
+        """
+        Copia al duplicado el análisis y las etiquetas de su canónico, sin IA.
+        False si el canónico todavía no fue analizado, o si el vínculo (de
+        reglas anteriores) no es el mismo caso: entonces lo deshace, así el
+        fallo se analiza y se embebe por su cuenta.
+        """
+        canonico = self.db.get(Fallo, fallo.canonico_id) if fallo.canonico_id else None
+        if canonico is None or not canonico.resumen_ia:
+            return False
+
+        firmas = dict(self.db.execute(
+            text("SELECT fallo_id, firma FROM fallo_firmas WHERE fallo_id = ANY(:ids)"),
+            {"ids": [fallo.id, canonico.id]}
+        ).all())
+        similitud = similitud_firmas(firmas.get(fallo.id), firmas.get(canonico.id))
+        if not mismo_caso(similitud, fallo.caratula, fallo.expediente, canonico.caratula, canonico.expediente):
+            self._vincular(fallo.id, None)
+            self.db.commit()
+            self.db.refresh(fallo)
+            return False
+
+        from core.services.documento_service import DocumentoService
+
+        fallo.resumen_ia = canonico.resumen_ia
+        fallo.materia = canonico.materia or fallo.materia
+        fallo.tipo_proceso = canonico.tipo_proceso or fallo.tipo_proceso
+        fallo.resultado = canonico.resultado or fallo.resultado
+        self.db.flush()
+        self.db.execute(text("""
+            INSERT INTO fallo_etiquetas (fallo_id, etiqueta_id, confianza)
+            SELECT :fallo_id, etiqueta_id, confianza FROM fallo_etiquetas WHERE fallo_id = :canonico_id
+            ON CONFLICT (fallo_id, etiqueta_id) DO UPDATE SET confianza = EXCLUDED.confianza
+        """), {"fallo_id": fallo.id, "canonico_id": canonico.id})
+        DocumentoService(self.db).refrescar([fallo.id], commit=False)
+        self.db.commit()
+        return True
+
+    def grupo(self, fallo_id: int) -> dict:
+        """Canónico y copias del grupo al que pertenece un fallo"""
+        canonico_id = self.db.execute(
+            text("SELECT COALESCE(canonico_id, id) FROM fallos WHERE id = :id"), {"id": fallo_id}
+        ).scalar()
+        if canonico_id is None:
+            return {"canonico_id": None, "duplicados": []}
+        duplicados = [fila[0] for fila in self.db.execute(
+            text("SELECT id FROM fallos WHERE canonico_id = :canonico_id ORDER BY id"), {"canonico_id": canonico_id}
+        )]
+        return {"canonico_id": canonico_id, "duplicados": duplicados}
+
+    @instrumentar("duplicados", "deduplicar_corpus")
+    def deduplicar_corpus(self, lote: int = 500) -> dict:
+        """
+        Firma y vincula todos los fallos con texto, en orden de id: ante
+        copias, queda como canónico el primero que se ingresó
+        """
+        ultimo_id, fallos, duplicados, candidatos = 0, 0, 0, 0
+        inicio = time.perf_counter()
+        while True:
+            filas = self.db.execute(text("""
+                SELECT id, texto_completo
+                FROM fallos
+                WHERE id > :ultimo_id AND btrim(COALESCE(texto_completo, '')) <> ''
+                ORDER BY id
+                LIMIT :lote
+            """), {"ultimo_id": ultimo_id, "lote": lote}).all()
+            if not filas:
+                break
+            ultimo_id = filas[-1].id
+            for fila in filas:
+                resultado = self.registrar(fila.id, fila.texto_completo, commit=False)
+                duplicados += resultado["canonico_id"] is not None
+                candidatos += resultado["candidatos"]
+            self.db.commit()
+            fallos += len(filas)
+
+        segundos = time.perf_counter() - inicio
+        return {
+            "fallos": fallos,
+            "duplicados": duplicados,
+            "candidatos_por_fallo": round(candidatos / fallos, 2) if fallos else None,
+            "fallos_por_segundo": round(fallos / segundos, 1) if segundos else None,
+            "segundos": round(segundos, 2),
+        }
@@ -0,0 +1,115 @@
+"""
+Micro-batching de embeddings de consultas
+
+Las búsquedas concurrentes piden un embedding cada una. El batcher junta
+los textos que llegan dentro de una ventana de pocos milisegundos, los
+manda al proveedor en una sola llamada multi-input (o un solo lote del
+modelo local) y reparte los vectores a cada llamador. Un texto idéntico
+que ya está en vuelo no se vuelve a pedir: se espera el mismo resultado.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.services.embedding_providers import ProveedorEmbeddings, obtener_proveedor
+
+
+class _EstadoLoop:
+    """Cola pendiente de un event loop (los futures no cruzan loops)"""
+
+    def __init__(self):
+        self.pendientes: List[str] = []
+        self.en_vuelo: Dict[str, asyncio.Future] = {}
+        self.temporizador: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """Coalescedor de pedidos de embeddings para un proveedor"""
+
+    def __init__(
+        self,
+        proveedor: ProveedorEmbeddings,
+        ventana_ms: Optional[float] = None,
+        max_lote: Optional[int] = None
+    ):
+        self.proveedor = proveedor
+        self.ventana = (settings.EMBEDDING_BATCH_VENTANA_MS if ventana_ms is None else ventana_ms) / 1000
+        self.max_lote = max_lote or settings.EMBEDDING_BATCH_MAX
+        self._estados = weakref.WeakKeyDictionary()
+        self.estadisticas = {"pedidos": 0, "deduplicados": 0, "llamadas": 0, "textos": 0}
+
+    def _estado(self, loop: asyncio.AbstractEventLoop) -> _EstadoLoop:
+        estado = self._estados.get(loop)
+        if estado is None:
+            estado = self._estados[loop] = _EstadoLoop()
+        return estado
+
+    async def embeber(self, texto: str) -> list:
+        """Vector de un texto, compartiendo la llamada con los pedidos concurrentes"""
+        loop = asyncio.get_running_loop()
+        estado = self._estado(loop)
+        self.estadisticas["pedidos"] += 1
+
+        futuro = estado.en_vuelo.get(texto)
+        if futuro is not None:
+            self.estadisticas["deduplicados"] += 1
+        else:
+            futuro = estado.en_vuelo[texto] = loop.create_future()
+            estado.pendientes.append(texto)
+            if len(estado.pendientes) >= self.max_lote:
+                self._despachar(estado)
+            elif estado.temporizador is None:
+                estado.temporizador = loop.call_later(self.ventana, self._despachar, estado)
+
+        # shield: si un llamador se cancela, el resto sigue esperando el vector
+        return await asyncio.shield(futuro)
+
+    def _despachar(self, estado: _EstadoLoop):
+        if estado.temporizador is not None:
+            estado.temporizador.cancel()
+            estado.temporizador = None
+        textos, estado.pendientes = estado.pendientes, []
+        if textos:
+            asyncio.ensure_future(self._enviar(estado, textos))
+
+    async def _enviar(self, estado: _EstadoLoop, textos: List[str]):
+        self.estadisticas["llamadas"] += 1
+        self.estadisticas["textos"] += len(textos)
+        vectores, error = None, None
+        try:
+            vectores = await self.proveedor.embeber(textos)
+            if len(vectores) != len(textos):
+                error = ValueError(
+                    f"El proveedor {self.proveedor.nombre} devolvió {len(vectores)} vectores para {len(textos)} textos"
+                )
+        except Exception as e:
+            error = e
+        finally:
+            # Ningún llamador queda esperando: vector, error, o cancelación
+            # si la tarea misma se canceló (CancelledError no es Exception)
+            for posicion, texto in enumerate(textos):
+                futuro = estado.en_vuelo.pop(texto, None)
+                if futuro is None or futuro.done():
+                    continue
+                if error is not None:
+                    futuro.set_exception(error)
+                    # Evita el aviso de "exception never retrieved" si nadie espera
+                    futuro.exception()
+                elif vectores is not None:
+                    futuro.set_result(vectores[posicion])
+                else:
+                    futuro.cancel()
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def obtener_batcher(modelo: str) -> EmbeddingBatcher:
+    """Batcher (único por proceso) del proveedor de un modelo"""
+    with _batchers_lock:
+        batcher = _batchers.get(modelo)
+        if batcher is None:
+            batcher = _batchers[modelo] = EmbeddingBatcher(obtener_proveedor(modelo))
+    return batcher
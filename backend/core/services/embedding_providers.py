@@ -0,0 +1,156 @@
+"""
+Proveedores de embeddings intercambiables
+
+- openai: API de OpenAI (una llamada de red por lote).
+- local: modelo multilingüe de sentence-transformers en CPU, sin red
+  (backend 'torch' u 'onnx').
+- stub: vectores determinísticos (offline, benchmarks).
+
+El proveedor de cada modelo se resuelve por nombre: el modelo de
+EMBEDDING_LOCAL_MODEL va al proveedor local y el resto a OpenAI, así un
+set de embeddings (ver embedding_set_service) puede migrar de un
+proveedor a otro con el mismo backfill + corte atómico.
+"""
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from core.config import settings
+from core.instrumentacion import registrar_tokens
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # dependencia opcional (solo para EMBEDDING_PROVIDER=local)
+    SentenceTransformer = None
+
+
+class ProveedorEmbeddings(ABC):
+    """Interfaz común de los proveedores"""
+
+    nombre = "base"
+
+    def __init__(self, modelo: str):
+        self.modelo = modelo
+
+    @abstractmethod
+    async def embeber(self, textos: List[str]) -> List[list]:
+        """Un vector por texto, en el mismo orden"""
+
+    def calentar(self):
+        """Carga perezosa anticipada (se llama al iniciar la API)"""
+
+
+class ProveedorOpenAI(ProveedorEmbeddings):
+    """Embeddings vía API de OpenAI"""
+
+    nombre = "openai"
+
+    def __init__(self, modelo: str):
+        super().__init__(modelo)
+        self._cliente = None
+
+    def _obtener_cliente(self):
+        if self._cliente is None:
+            from openai import OpenAI
+            self._cliente = OpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._cliente
+
+    def _embeber(self, textos: List[str]) -> List[list]:
+        response = self._obtener_cliente().embeddings.create(model=self.modelo, input=textos)
+        if response.usage is not None:
+            registrar_tokens("openai", self.modelo, entrada=response.usage.prompt_tokens)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def embeber(self, textos: List[str]) -> List[list]:
+        # El cliente es sincrónico: se ejecuta fuera del event loop
+        return await asyncio.to_thread(self._embeber, textos)
+
+    def calentar(self):
+        self._obtener_cliente()
+
+
+class ProveedorLocal(ProveedorEmbeddings):
+    """Modelo de sentence-transformers en CPU con inferencia por lotes"""
+
+    nombre = "local"
+
+    def __init__(self, modelo: str, backend: Optional[str] = None):
+        super().__init__(modelo)
+        self.backend = backend or settings.EMBEDDING_LOCAL_BACKEND
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        if self._modelo is None:
+            if SentenceTransformer is None:
+                raise RuntimeError(
+                    "EMBEDDING_PROVIDER=local requiere sentence-transformers "
+                    "(pip install sentence-transformers, y onnxruntime para el backend onnx)"
+                )
+            with self._lock:
+                if self._modelo is None:
+                    kwargs = {"device": "cpu"}
+                    if self.backend != "torch":
+                        kwargs["backend"] = self.backend
+                    self._modelo = SentenceTransformer(self.modelo, **kwargs)
+        return self._modelo
+
+    def _embeber(self, textos: List[str]) -> List[list]:
+        vectores = self._cargar().encode(
+            textos,
+            batch_size=settings.EMBEDDING_LOCAL_LOTE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectores.tolist()
+
+    async def embeber(self, textos: List[str]) -> List[list]:
+        return await asyncio.to_thread(self._embeber, textos)
+
+    @property
+    def dimensiones(self) -> int:
+        return self._cargar().get_sentence_embedding_dimension()
+
+    def calentar(self):
+        # La primera inferencia inicializa los kernels: no la paga la primera consulta
+        self._embeber(["calentamiento del modelo de embeddings"])
+
+
+_proveedores: Dict[tuple, ProveedorEmbeddings] = {}
+_proveedores_lock = threading.Lock()
+
+
+def modelo_por_defecto() -> str:
+    """Modelo a usar cuando todavía no hay un set de embeddings activo"""
+    if settings.EMBEDDING_PROVIDER == "local":
+        return settings.EMBEDDING_LOCAL_MODEL
+    return settings.OPENAI_EMBEDDING_MODEL
+
+
+def tipo_proveedor(modelo: str) -> str:
+    if settings.EMBEDDING_PROVIDER == "stub":
+        return "stub"
+    if modelo == settings.EMBEDDING_LOCAL_MODEL:
+        return "local"
+    return "openai"
+
+
+def obtener_proveedor(modelo: Optional[str] = None) -> ProveedorEmbeddings:
+    """Proveedor (único por proceso) que genera los vectores de un modelo"""
+    modelo = modelo or modelo_por_defecto()
+    clave = (tipo_proveedor(modelo), modelo)
+
+    with _proveedores_lock:
+        proveedor = _proveedores.get(clave)
+        if proveedor is None:
+            if clave[0] == "stub":
+                from core.services.stubs import StubProveedorEmbeddings
+                proveedor = StubProveedorEmbeddings(modelo)
+            elif clave[0] == "local":
+                proveedor = ProveedorLocal(modelo)
+            else:
+                proveedor = ProveedorOpenAI(modelo)
+            _proveedores[clave] = proveedor
+    return proveedor
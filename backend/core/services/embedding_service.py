@@ -1,10 +1,14 @@
 """
-Servicio para generación de embeddings usando OpenAI
+Servicio para generación de embeddings (OpenAI o modelo local)
 """
-import openai
+from typing import List, Optional
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from core.config import settings
-from core.models import Fallo, Embedding
+from core.instrumentacion import instrumentar
+from core.services.cache_busqueda_service import marcar_cambio_busqueda
+from core.services.embedding_providers import obtener_proveedor
+from core.services.embedding_set_service import set_activo, sets_escritura
 
 
 class EmbeddingService:
@@ -12,79 +16,87 @@ class EmbeddingService:
     
     def __init__(self, db: Session):
         self.db = db
-        openai.api_key = settings.OPENAI_API_KEY
     
-    async def generar_embedding(self, texto: str) -> list:
+    async def generar_embedding(self, texto: str, modelo: Optional[str] = None) -> list:
         """
         Genera un embedding vectorial para un texto
+        Por defecto con el modelo del set activo (el que sirve las búsquedas)
+        
+        Los pedidos concurrentes se agrupan en una sola llamada al
+        proveedor (ver embedding_batcher)
         """
-        from openai import OpenAI
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        if not settings.EMBEDDING_BATCH:
+            return (await self.generar_embeddings([texto], modelo))[0]
         
-        response = client.embeddings.create(
-            model=settings.OPENAI_EMBEDDING_MODEL,
-            input=texto
-        )
+        from core.services.embedding_batcher import obtener_batcher
+        return await obtener_batcher(modelo or set_activo(self.db)[0]).embeber(texto)
+    
+    @instrumentar("embedding", "generar_embeddings")
+    async def generar_embeddings(self, textos: List[str], modelo: Optional[str] = None) -> List[list]:
+        """
+        Genera embeddings para varios textos en una sola llamada
+        al proveedor del modelo (OpenAI, local o stub)
+        """
+        modelo = modelo or set_activo(self.db)[0]
+        return await obtener_proveedor(modelo).embeber(textos)
+    
+    def guardar_vector(self, fallo_id: int, modelo: str, vector: list, hash_documento: str):
+        """Inserta o reemplaza el vector de un fallo en el set de un modelo (sin commit)"""
+        marcar_cambio_busqueda(self.db)
+        # pgvector espera el formato: '[0.1,0.2,0.3,...]'
+        embedding_str = "[" + ",".join(map(str, vector)) + "]"
         
-        return response.data[0].embedding
+        self.db.execute(
+            text("""
+                INSERT INTO embeddings (fallo_id, modelo, embedding, hash_documento)
+                VALUES (:fallo_id, :modelo, CAST(:embedding AS vector), :hash_documento)
+                ON CONFLICT (fallo_id, modelo) DO UPDATE SET
+                    embedding = EXCLUDED.embedding,
+                    hash_documento = EXCLUDED.hash_documento
+            """),
+            {
+                "fallo_id": fallo_id,
+                "modelo": modelo,
+                "embedding": embedding_str,
+                "hash_documento": hash_documento
+            }
+        )
     
     async def generar_embedding_fallo(self, fallo_id: int) -> bool:
         """
         Genera y almacena el embedding para un fallo
         El documento de búsqueda se compone de:
         Carátula + Resumen IA + Etiquetas + Normativa Clave
-        """
-        fallo = self.db.query(Fallo).filter(Fallo.id == fallo_id).first()
-        if not fallo:
-            raise ValueError(f"Fallo {fallo_id} no encontrado")
+        y se lee materializado de search_documents.
         
-        # Construir documento de búsqueda
-        documento_busqueda = f"{fallo.caratula}\n\n"
+        Durante una migración de modelo se escribe en el set activo
+        y en el set en construcción.
         
-        if fallo.resumen_ia:
-            documento_busqueda += f"{fallo.resumen_ia}\n\n"
-        
-        # Agregar etiquetas si existen
-        if fallo.etiquetas:
-            etiquetas_texto = ", ".join([fe.etiqueta.nombre for fe in fallo.etiquetas])
-            documento_busqueda += f"Etiquetas: {etiquetas_texto}\n\n"
-        
-        # Generar embedding
-        embedding_vector = await self.generar_embedding(documento_busqueda)
-        
-        # Convertir a formato pgvector (usando text() para convertir a string de vector)
-        # pgvector espera el formato: '[0.1,0.2,0.3,...]'
-        embedding_str = "[" + ",".join(map(str, embedding_vector)) + "]"
-        
-        # Guardar o actualizar embedding usando SQL directo para pgvector
-        from sqlalchemy import text
+        Returns:
+            True si se generó algún vector, False si el documento no cambió
+        """
+        from core.services.documento_service import DocumentoService
         
-        # Verificar si ya existe
-        existing = self.db.execute(
-            text("SELECT fallo_id FROM embeddings WHERE fallo_id = :fallo_id"),
-            {"fallo_id": fallo_id}
-        ).first()
+        documento = DocumentoService(self.db).obtener(fallo_id)
+        if not documento:
+            raise ValueError(f"Fallo {fallo_id} no encontrado")
         
-        if existing:
-            # Actualizar
-            self.db.execute(
-                text("UPDATE embeddings SET embedding = :embedding::vector, modelo = :modelo WHERE fallo_id = :fallo_id"),
-                {
-                    "embedding": embedding_str,
-                    "modelo": settings.OPENAI_EMBEDDING_MODEL,
-                    "fallo_id": fallo_id
-                }
-            )
-        else:
-            # Insertar nuevo
-            self.db.execute(
-                text("INSERT INTO embeddings (fallo_id, embedding, modelo) VALUES (:fallo_id, :embedding::vector, :modelo)"),
-                {
-                    "fallo_id": fallo_id,
-                    "embedding": embedding_str,
-                    "modelo": settings.OPENAI_EMBEDDING_MODEL
-                }
+        # Solo se re-embebe si cambió el hash del documento
+        vigentes = {
+            fila.modelo
+            for fila in self.db.execute(
+                text("SELECT modelo FROM embeddings WHERE fallo_id = :fallo_id AND hash_documento = :hash"),
+                {"fallo_id": fallo_id, "hash": documento.hash}
             )
+        }
+        
+        generado = False
+        for modelo, _ in sets_escritura(self.db):
+            if modelo in vigentes:
+                continue
+            vector = await self.generar_embedding(documento.texto, modelo)
+            self.guardar_vector(fallo_id, modelo, vector, documento.hash)
+            generado = True
         
         self.db.commit()
-        return True
+        return generado
@@ -0,0 +1,231 @@
+"""
+Servicio de conjuntos de embeddings versionados por modelo
+
+Permite cambiar de modelo de embeddings sin mezclar vectores
+incompatibles ni cortar el servicio:
+1. crear_set(): registra el modelo nuevo y crea su índice HNSW parcial.
+2. Mientras se construye, cada fallo nuevo se embebe con ambos modelos.
+3. backfill(): completa el set nuevo en lotes y con pausas (throttling).
+4. activar(): corte atómico; las búsquedas pasan al set nuevo.
+"""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Optional, List, Tuple, Dict
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import engine
+from core.models import EmbeddingSet
+from core.services.cache_busqueda_service import marcar_cambio_busqueda
+from core.services.embedding_providers import modelo_por_defecto
+
+CONSTRUYENDO = "construyendo"
+ACTIVO = "activo"
+RETIRADO = "retirado"
+
+_cache_lock = threading.Lock()
+_cache: Dict[str, object] = {"expira": 0.0, "activo": None, "escritura": None}
+
+
+def nombre_indice(modelo: str, tabla: str = "embeddings") -> str:
+    """Nombre del índice HNSW parcial de un modelo"""
+    slug = re.sub(r"\W+", "_", modelo).strip("_").lower()[:32]
+    return f"ix_{tabla}_hnsw_{slug}_{hashlib.sha1(modelo.encode()).hexdigest()[:8]}"
+
+
+def invalidar_cache():
+    with _cache_lock:
+        _cache["expira"] = 0.0
+
+
+def _cargar_cache(db: Session):
+    with _cache_lock:
+        if time.monotonic() < _cache["expira"]:
+            return
+    sets = db.query(EmbeddingSet).filter(EmbeddingSet.estado.in_([ACTIVO, CONSTRUYENDO])).all()
+    activo = next(((s.modelo, s.dimensiones) for s in sets if s.estado == ACTIVO), None)
+    with _cache_lock:
+        _cache["activo"] = activo or (modelo_por_defecto(), None)
+        _cache["escritura"] = [(s.modelo, s.dimensiones) for s in sets] or [_cache["activo"]]
+        _cache["expira"] = time.monotonic() + settings.EMBEDDING_SET_CACHE_SECONDS
+
+
+def set_activo(db: Session) -> Tuple[str, Optional[int]]:
+    """
+    (modelo, dimensiones) del set que sirve las búsquedas. Sin sets
+    registrados se usa el modelo por defecto del proveedor (dimensiones desconocidas).
+    """
+    _cargar_cache(db)
+    return _cache["activo"]
+
+
+def sets_escritura(db: Session) -> List[Tuple[str, Optional[int]]]:
+    """Sets que deben recibir los embeddings nuevos (activo + en construcción)"""
+    _cargar_cache(db)
+    return list(_cache["escritura"])
+
+
+class EmbeddingSetService:
+    """Administración de sets de embeddings"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def listar(self) -> List[dict]:
+        """Sets con su progreso de construcción"""
+        total = self.db.execute(text("SELECT count(*) FROM search_documents WHERE canonico_id IS NULL")).scalar()
+        conteos = dict(self.db.execute(text("SELECT modelo, count(*) FROM embeddings GROUP BY modelo")).all())
+        return [
+            {
+                "modelo": s.modelo,
+                "dimensiones": s.dimensiones,
+                "estado": s.estado,
+                "embebidos": conteos.get(s.modelo, 0),
+                "total": total,
+                "activado_en": s.activado_en,
+            }
+            for s in self.db.query(EmbeddingSet).order_by(EmbeddingSet.creado_en)
+        ]
+
+    def crear_set(self, modelo: str, dimensiones: int, activar: bool = False) -> EmbeddingSet:
+        """
+        Registra un set nuevo y crea sus índices HNSW parciales (documentos
+        y pasajes; CREATE INDEX CONCURRENTLY: no bloquea las búsquedas en curso).
+        """
+        from core.services.chunk_service import ChunkService
+        
+        embedding_set = self.db.get(EmbeddingSet, modelo)
+        if embedding_set is None:
+            embedding_set = EmbeddingSet(modelo=modelo, dimensiones=dimensiones, estado=CONSTRUYENDO)
+            self.db.add(embedding_set)
+            self.db.commit()
+        elif embedding_set.estado == RETIRADO:
+            # Un set retirado que se vuelve a abrir recibe los fallos nuevos y se completa
+            embedding_set.estado = CONSTRUYENDO
+            self.db.commit()
+
+        self.crear_indice(modelo, dimensiones)
+        ChunkService(self.db).crear_indice(modelo, dimensiones)
+        invalidar_cache()
+
+        if activar:
+            self.activar(modelo, forzar=True)
+        return embedding_set
+
+    def crear_indice(self, modelo: str, dimensiones: int):
+        literal = modelo.replace("'", "''")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre_indice(modelo)} "
+                f"ON embeddings USING hnsw ((embedding::vector({dimensiones})) vector_cosine_ops) "
+                f"WHERE modelo = '{literal}'"
+            ))
+
+    def pendientes(self, modelo: str, limite: int) -> List[Tuple[int, str, str]]:
+        """Documentos sin vector vigente en el set: (fallo_id, texto, hash). Las copias no se embeben."""
+        return self.db.execute(text("""
+            SELECT d.fallo_id, d.texto, d.hash
+            FROM search_documents d
+            LEFT JOIN embeddings e ON e.fallo_id = d.fallo_id AND e.modelo = :modelo
+            WHERE d.canonico_id IS NULL
+              AND (e.fallo_id IS NULL OR e.hash_documento IS DISTINCT FROM d.hash)
+            ORDER BY d.fallo_id
+            LIMIT :limite
+        """), {"modelo": modelo, "limite": limite}).all()
+
+    def backfill(
+        self,
+        modelo: str,
+        lote: Optional[int] = None,
+        pausa: Optional[float] = None,
+        max_lotes: Optional[int] = None
+    ) -> int:
+        """
+        Completa el set en lotes con una pausa entre lotes para no saturar
+        el proveedor ni la base: primero los documentos y luego los pasajes.
+        Pensado para correr en segundo plano.
+
+        Returns:
+            Cantidad de vectores escritos
+        """
+        from core.services.chunk_service import ChunkService
+        from core.services.pipeline_service import crear_embedding_service
+
+        lote = lote or settings.EMBEDDING_BACKFILL_LOTE
+        pausa = settings.EMBEDDING_BACKFILL_PAUSA_SECONDS if pausa is None else pausa
+        embedding_service = crear_embedding_service(self.db)
+        escritos, lotes = 0, 0
+
+        while max_lotes is None or lotes < max_lotes:
+            filas = self.pendientes(modelo, lote)
+            if not filas:
+                break
+
+            vectores = asyncio.run(embedding_service.generar_embeddings([f.texto for f in filas], modelo))
+            for fila, vector in zip(filas, vectores):
+                embedding_service.guardar_vector(fila.fallo_id, modelo, vector, fila.hash)
+            self.db.commit()
+
+            escritos += len(filas)
+            lotes += 1
+            time.sleep(pausa)
+
+        # Después los pasajes de texto_completo, un fallo por vez
+        chunk_service = ChunkService(self.db)
+        while max_lotes is None or lotes < max_lotes:
+            fallo_ids = chunk_service.pendientes(modelo, lote)
+            if not fallo_ids:
+                break
+
+            for fallo_id in fallo_ids:
+                escritos += asyncio.run(chunk_service.indexar_fallo(fallo_id, [modelo]))
+            lotes += 1
+            time.sleep(pausa)
+
+        return escritos
+
+    def activar(self, modelo: str, forzar: bool = False) -> EmbeddingSet:
+        """
+        Corte atómico: en una transacción el set activo pasa a 'retirado'
+        y el nuevo a 'activo'. Sin forzar, exige que el set esté completo.
+        """
+        embedding_set = self.db.get(EmbeddingSet, modelo)
+        if embedding_set is None:
+            raise ValueError(f"Set de embeddings {modelo} no encontrado")
+
+        if not forzar and self.pendientes(modelo, 1):
+            raise ValueError(f"El set {modelo} todavía tiene fallos sin embeber")
+
+        marcar_cambio_busqueda(self.db)
+        self.db.execute(
+            text("UPDATE embedding_sets SET estado = :retirado WHERE estado = :activo AND modelo <> :modelo"),
+            {"retirado": RETIRADO, "activo": ACTIVO, "modelo": modelo}
+        )
+        self.db.execute(
+            text("UPDATE embedding_sets SET estado = :activo, activado_en = now() WHERE modelo = :modelo"),
+            {"activo": ACTIVO, "modelo": modelo}
+        )
+        self.db.commit()
+        invalidar_cache()
+        self.db.refresh(embedding_set)
+        return embedding_set
+
+    def eliminar(self, modelo: str):
+        """Borra los vectores e índice de un set retirado"""
+        embedding_set = self.db.get(EmbeddingSet, modelo)
+        if embedding_set is None or embedding_set.estado == ACTIVO:
+            raise ValueError("Solo se pueden eliminar sets retirados o en construcción")
+
+        self.db.execute(text("DELETE FROM embeddings WHERE modelo = :modelo"), {"modelo": modelo})
+        self.db.execute(text("DELETE FROM fallo_chunks WHERE modelo = :modelo"), {"modelo": modelo})
+        self.db.delete(embedding_set)
+        self.db.commit()
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre_indice(modelo)}"))
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre_indice(modelo, 'fallo_chunks')}"))
+        invalidar_cache()
@@ -0,0 +1,175 @@
+"""
+Servicio de persistencia de etiquetas del tesauro
+"""
+import threading
+from typing import Dict, List, Tuple, Iterable
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.models import Etiqueta, FalloEtiqueta
+from core.services.documento_service import DocumentoService
+from core.services.facetas_service import indice_facetas
+# Registra la invalidación del catálogo cacheado al confirmar etiquetas nuevas
+import core.services.catalogo_service  # noqa: F401
+
+# Confianza según la relevancia que informa la IA
+CONFIANZA_RELEVANCIA = {"alta": 0.9, "media": 0.6, "baja": 0.3}
+CONFIANZA_SUBTEMA = 0.8
+CONFIANZA_PALABRA_CLAVE = 0.5
+
+
+def normalizar_nombre(nombre) -> str:
+    """Formato del tesauro: MAYÚSCULAS, espacios simples, máx 100 caracteres"""
+    return " ".join(str(nombre).split()).upper()[:100]
+
+
+def etiquetas_de_analisis(analisis: dict) -> List[Tuple[str, float]]:
+    """
+    Extrae (nombre, confianza) de un análisis de IA. Soporta el formato
+    de backend (subtemas / palabras_clave) y el de backend_2
+    (etiquetas: [{"nombre", "tipo", "relevancia"}]).
+    """
+    etiquetas: Dict[str, float] = {}
+
+    def agregar(nombre, confianza: float):
+        if not nombre or not str(nombre).strip():
+            return
+        nombre = normalizar_nombre(nombre)
+        etiquetas[nombre] = max(confianza, etiquetas.get(nombre, 0.0))
+
+    for item in analisis.get("etiquetas") or []:
+        if isinstance(item, dict):
+            relevancia = str(item.get("relevancia", "")).lower()
+            agregar(item.get("nombre"), CONFIANZA_RELEVANCIA.get(relevancia, CONFIANZA_RELEVANCIA["media"]))
+        else:
+            agregar(item, CONFIANZA_RELEVANCIA["media"])
+
+    for nombre in analisis.get("subtemas") or []:
+        agregar(nombre, CONFIANZA_SUBTEMA)
+
+    for nombre in analisis.get("palabras_clave") or []:
+        agregar(nombre, CONFIANZA_PALABRA_CLAVE)
+
+    return list(etiquetas.items())
+
+
+class EtiquetaService:
+    """
+    Persiste etiquetas y vínculos fallo-etiqueta en lote.
+    Mantiene en memoria el mapa nombre → id de la tabla etiquetas
+    (compartido por todo el proceso) para evitar una consulta por etiqueta.
+    """
+
+    _ids_por_nombre: Dict[str, int] = {}
+    _cargado = False
+    _lock = threading.Lock()
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _cargar_catalogo(self):
+        with self._lock:
+            if EtiquetaService._cargado:
+                return
+            EtiquetaService._ids_por_nombre = dict(self.db.query(Etiqueta.nombre, Etiqueta.id))
+            EtiquetaService._cargado = True
+
+    @classmethod
+    def invalidar_cache(cls):
+        """Fuerza a recargar el mapa nombre → id en el próximo uso"""
+        with cls._lock:
+            cls._ids_por_nombre = {}
+            cls._cargado = False
+
+    def obtener_ids(self, nombres: Iterable[str]) -> Dict[str, int]:
+        """
+        Devuelve nombre → id, creando en un solo INSERT las etiquetas que
+        no existen (como generadas, es_generada='S'). No hace commit.
+        """
+        self._cargar_catalogo()
+        nombres = {normalizar_nombre(n) for n in nombres if n and str(n).strip()}
+        ids = {n: self._ids_por_nombre[n] for n in nombres if n in self._ids_por_nombre}
+        faltantes = sorted(nombres - ids.keys())
+
+        if faltantes:
+            stmt = (
+                insert(Etiqueta)
+                .values([{"nombre": n, "es_generada": 'S'} for n in faltantes])
+                .on_conflict_do_nothing(index_elements=[Etiqueta.nombre])
+                .returning(Etiqueta.nombre, Etiqueta.id)
+            )
+            creadas = dict(self.db.execute(stmt).all())
+            if creadas:
+                self.db.info["invalidar_catalogo"] = True
+            ids.update(creadas)
+
+            # Las que creó otro proceso entre la carga y el INSERT
+            sin_id = [n for n in faltantes if n not in ids]
+            if sin_id:
+                ids.update(dict(
+                    self.db.query(Etiqueta.nombre, Etiqueta.id).filter(Etiqueta.nombre.in_(sin_id))
+                ))
+
+        return ids
+
+    def guardar_etiquetas_lote(
+        self,
+        etiquetas_por_fallo: Dict[int, List[Tuple[str, float]]],
+        sobrescribir: bool = True
+    ) -> int:
+        """
+        Vincula etiquetas a un lote de fallos con un INSERT multi-fila.
+        Si el vínculo ya existe se actualiza la confianza (salvo sobrescribir=False).
+
+        Args:
+            etiquetas_por_fallo: fallo_id → [(nombre, confianza), ...]
+            sobrescribir: False conserva la confianza de los vínculos existentes
+
+        Returns:
+            Cantidad de vínculos escritos
+        """
+        nombres = {nombre for etiquetas in etiquetas_por_fallo.values() for nombre, _ in etiquetas}
+        ids = self.obtener_ids(nombres)
+
+        filas = {}
+        for fallo_id, etiquetas in etiquetas_por_fallo.items():
+            for nombre, confianza in etiquetas:
+                etiqueta_id = ids.get(normalizar_nombre(nombre))
+                if etiqueta_id is not None:
+                    filas[(fallo_id, etiqueta_id)] = confianza
+
+        if filas:
+            stmt = insert(FalloEtiqueta).values([
+                {"fallo_id": fallo_id, "etiqueta_id": etiqueta_id, "confianza": confianza}
+                for (fallo_id, etiqueta_id), confianza in filas.items()
+            ])
+            if sobrescribir:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[FalloEtiqueta.fallo_id, FalloEtiqueta.etiqueta_id],
+                    set_={"confianza": stmt.excluded.confianza}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(
+                    index_elements=[FalloEtiqueta.fallo_id, FalloEtiqueta.etiqueta_id]
+                )
+            self.db.execute(stmt)
+
+        # Las etiquetas forman parte del documento de búsqueda
+        DocumentoService(self.db).refrescar(etiquetas_por_fallo.keys(), commit=False)
+
+        self.db.commit()
+        indice_facetas.marcar_sucios(etiquetas_por_fallo.keys())
+
+        # Recién después del commit los ids nuevos son válidos para otros
+        with self._lock:
+            self._ids_por_nombre.update(ids)
+
+        return len(filas)
+
+    def guardar_analisis_lote(self, analisis_por_fallo: Dict[int, dict]) -> int:
+        """Persiste las etiquetas de un lote de fallos analizados por la IA"""
+        return self.guardar_etiquetas_lote({
+            fallo_id: etiquetas_de_analisis(analisis)
+            for fallo_id, analisis in analisis_por_fallo.items()
+        })
@@ -0,0 +1,145 @@
+"""
+Etiquetado local con un autómata Aho-Corasick
+
+Compila las etiquetas de ETIQUETAS_SAIJ_BASE, las oficiales de la tabla
+etiquetas (no las que generó la IA: suelen ser palabras genéricas) y los
+sinónimos de SINONIMOS_SAIJ en un único autómata (sin tildes ni
+mayúsculas) y recorre el texto del fallo una sola vez. Cada etiqueta
+encontrada es una candidata con confianza según su frecuencia.
+
+Sirve para pre-etiquetar el corpus sin IA y para enviarle al modelo una
+lista corta de candidatas en lugar del tesauro completo.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from jurisar_comun.taxonomia import ETIQUETAS_SAIJ_BASE, SINONIMOS_SAIJ, AutomataEtiquetas, ahocorasick, plegar  # noqa: F401
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from core.instrumentacion import instrumentar
+from core.models import Etiqueta
+from core.services.catalogo_service import catalogo_etiquetas
+from core.services.etiqueta_service import EtiquetaService, normalizar_nombre
+
+# Confianza por frecuencia: 1 aparición 0.5, 2 → 0.75, 3 o más → tope.
+# El tope queda debajo de la relevancia "alta" de la IA
+CONFIANZA_MAXIMA = 0.85
+CONFIANZA_MINIMA_PRE_ETIQUETADO = 0.75
+MAX_CANDIDATAS = 15
+
+
+def confianza_por_frecuencia(veces: int) -> float:
+    return round(min(CONFIANZA_MAXIMA, 1 - 0.5 ** veces), 3)
+
+
+class EtiquetadorService:
+    """
+    Candidatas de etiquetas por fallo. El autómata se comparte en el
+    proceso; cuando cambia el catálogo se releen las etiquetas oficiales y
+    solo se recompila si cambiaron (las que crea la IA no cuentan).
+    """
+
+    _automata: Optional[AutomataEtiquetas] = None
+    _version: Optional[int] = None
+    _oficiales: Optional[Tuple[str, ...]] = None
+    _lock = threading.Lock()
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _etiquetas_oficiales(self) -> Tuple[str, ...]:
+        filas = self.db.query(Etiqueta.nombre).filter(func.coalesce(Etiqueta.es_generada, "N") == "N")
+        return tuple(sorted(nombre for (nombre,) in filas))
+
+    @staticmethod
+    def _terminos(oficiales: Tuple[str, ...]) -> Dict[str, str]:
+        terminos = {nombre: normalizar_nombre(nombre) for nombre in (*ETIQUETAS_SAIJ_BASE, *oficiales)}
+        for etiqueta, sinonimos in SINONIMOS_SAIJ.items():
+            for sinonimo in sinonimos:
+                terminos.setdefault(sinonimo, normalizar_nombre(etiqueta))
+        return terminos
+
+    def automata(self) -> AutomataEtiquetas:
+        version = catalogo_etiquetas.version
+        if EtiquetadorService._automata is not None and EtiquetadorService._version == version:
+            return EtiquetadorService._automata
+        with self._lock:
+            if EtiquetadorService._automata is None or EtiquetadorService._version != version:
+                oficiales = self._etiquetas_oficiales()
+                if EtiquetadorService._automata is None or EtiquetadorService._oficiales != oficiales:
+                    EtiquetadorService._automata = AutomataEtiquetas(self._terminos(oficiales))
+                    EtiquetadorService._oficiales = oficiales
+                EtiquetadorService._version = version
+        return EtiquetadorService._automata
+
+    def candidatas(self, texto: str, limite: int = MAX_CANDIDATAS) -> List[Tuple[str, float]]:
+        """(etiqueta, confianza) por frecuencia, de mayor a menor"""
+        if not texto:
+            return []
+        return [
+            (etiqueta, confianza_por_frecuencia(veces))
+            for etiqueta, veces in self.automata().buscar(texto).most_common(limite)
+        ]
+
+    @instrumentar("etiquetador", "pre_etiquetar")
+    def pre_etiquetar(
+        self,
+        fallo_ids: Optional[List[int]] = None,
+        lote: int = 500,
+        confianza_minima: float = CONFIANZA_MINIMA_PRE_ETIQUETADO,
+        guardar: bool = True
+    ) -> dict:
+        """
+        Etiqueta localmente todos los fallos con texto (o los indicados).
+        No pisa la confianza de vínculos existentes (los de la IA).
+
+        Returns:
+            Fallos recorridos, vínculos escritos y ritmo del escaneo
+        """
+        automata = self.automata()
+        ultimo_id, fallos, vinculos, caracteres = 0, 0, 0, 0
+        segundos_escaneo = 0.0
+        inicio = time.perf_counter()
+
+        while True:
+            filas = self.db.execute(text("""
+                SELECT id, texto_completo
+                FROM fallos
+                WHERE id > :ultimo_id
+                  AND btrim(COALESCE(texto_completo, '')) <> ''
+                  AND (CAST(:ids AS integer[]) IS NULL OR id = ANY(:ids))
+                ORDER BY id
+                LIMIT :lote
+            """), {"ultimo_id": ultimo_id, "ids": fallo_ids, "lote": lote}).all()
+            if not filas:
+                break
+            ultimo_id = filas[-1].id
+
+            inicio_lote = time.perf_counter()
+            etiquetas_por_fallo = {}
+            for fila in filas:
+                etiquetas = [
+                    (etiqueta, confianza_por_frecuencia(veces))
+                    for etiqueta, veces in automata.buscar(fila.texto_completo).most_common(MAX_CANDIDATAS)
+                ]
+                etiquetas = [(e, c) for e, c in etiquetas if c >= confianza_minima]
+                if etiquetas:
+                    etiquetas_por_fallo[fila.id] = etiquetas
+                caracteres += len(fila.texto_completo)
+            segundos_escaneo += time.perf_counter() - inicio_lote
+            fallos += len(filas)
+
+            if guardar and etiquetas_por_fallo:
+                vinculos += EtiquetaService(self.db).guardar_etiquetas_lote(etiquetas_por_fallo, sobrescribir=False)
+
+        total = time.perf_counter() - inicio
+        return {
+            "fallos": fallos,
+            "vinculos": vinculos,
+            "motor": "pyahocorasick" if ahocorasick is not None else "python",
+            "fallos_por_segundo_escaneo": round(fallos / segundos_escaneo, 1) if segundos_escaneo else None,
+            "mb_por_segundo_escaneo": round(caracteres / segundos_escaneo / 1e6, 2) if segundos_escaneo else None,
+            "segundos": round(total, 2),
+        }
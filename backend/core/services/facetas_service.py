@@ -0,0 +1,264 @@
+"""
+Índice de facetas (materia, tribunal, tipo_proceso, etiquetas, año)
+
+Mantiene en memoria una posting list por valor de cada faceta, guardada
+como bitmap (un int de Python donde el bit N corresponde a la posición N).
+Cada fallo recibe una posición densa la primera vez que se indexa, así el
+tamaño de los bitmaps depende de la cantidad de fallos y no del id máximo.
+Filtrar es un AND/OR de bitmaps y contar es un popcount por valor, así
+que las facetas de cualquier conjunto de candidatos cuestan milisegundos
+sin consultas GROUP BY.
+
+El índice se refresca de forma incremental con los fallos modificados
+desde la última lectura, releyendo una ventana de FACETAS_SOLAPE_SEGUNDOS
+hacia atrás (updated_at es la hora de inicio de la transacción: una que
+confirma tarde queda con una marca anterior a la ya leída). Cada
+FACETAS_RECONSTRUIR_SEGUNDOS se reconstruye completo, lo que recoge
+borrados y cambios de etiquetas hechos por otros procesos.
+
+Las copias de otro fallo (canonico_id) no cuentan: las búsquedas las
+muestran agrupadas bajo su canónico.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Iterable, Set
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models import Fallo, FalloEtiqueta, Etiqueta
+
+FACETAS = ("materia", "tribunal", "tipo_proceso", "etiquetas", "anio")
+
+
+def _bits(bitmap: int) -> Iterable[int]:
+    """Recorre las posiciones (bits en 1) de un bitmap"""
+    while bitmap:
+        bajo = bitmap & -bitmap
+        yield bajo.bit_length() - 1
+        bitmap ^= bajo
+
+
+def _a_fecha(valor) -> Optional[date]:
+    """date desde un valor ISO (ValueError si no es una fecha válida)"""
+    if valor is None or isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor))
+
+
+class IndiceFacetas:
+    """Posting lists en memoria con refresco incremental y reconstrucción periódica"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vaciar()
+        self.sucios: Set[int] = set()
+        self.ultimo_refresco = 0.0
+        self.ultima_reconstruccion = 0.0
+
+    def _vaciar(self):
+        self.postings: Dict[str, Dict[str, int]] = {faceta: {} for faceta in FACETAS}
+        self.posiciones: Dict[int, int] = {}  # fallo_id → posición del bit
+        self.valores: Dict[int, Dict[str, tuple]] = {}  # por posición
+        self.fechas: Dict[int, date] = {}  # por posición
+        self.universo = 0
+        self.marca: Optional[datetime] = None
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+
+    def marcar_sucios(self, fallo_ids: Iterable[int]):
+        """Fuerza a releer estos fallos (ej: cambiaron sus etiquetas)"""
+        with self._lock:
+            self.sucios.update(fallo_ids)
+
+    def _posicion(self, fallo_id: int) -> int:
+        posicion = self.posiciones.get(fallo_id)
+        if posicion is None:
+            posicion = self.posiciones[fallo_id] = len(self.posiciones)
+        return posicion
+
+    def _quitar(self, posicion: int):
+        bit = 1 << posicion
+        for faceta, valores in self.valores.pop(posicion, {}).items():
+            for valor in valores:
+                posting = self.postings[faceta].get(valor, 0) & ~bit
+                if posting:
+                    self.postings[faceta][valor] = posting
+                else:
+                    self.postings[faceta].pop(valor, None)
+        self.fechas.pop(posicion, None)
+        self.universo &= ~bit
+
+    def _agregar(self, posicion: int, valores: Dict[str, tuple], fecha: Optional[date]):
+        bit = 1 << posicion
+        for faceta, lista in valores.items():
+            for valor in lista:
+                self.postings[faceta][valor] = self.postings[faceta].get(valor, 0) | bit
+        self.valores[posicion] = valores
+        if fecha:
+            self.fechas[posicion] = fecha
+        self.universo |= bit
+
+    def refrescar(self, db: Session, forzar: bool = False):
+        """
+        Relee los fallos modificados desde la última marca (menos la ventana
+        de solape), o todos si toca reconstruir. Se hace como máximo cada
+        FACETAS_REFRESCO_SEGUNDOS salvo que haya fallos marcados como sucios.
+        """
+        ahora = time.monotonic()
+        completo = self.marca is None or \
+            ahora - self.ultima_reconstruccion >= settings.FACETAS_RECONSTRUIR_SEGUNDOS
+        if not forzar and not completo and not self.sucios and \
+                ahora - self.ultimo_refresco < settings.FACETAS_REFRESCO_SEGUNDOS:
+            return
+
+        with self._lock:
+            sucios, self.sucios = self.sucios, set()
+            marca = None if completo else self.marca
+
+        query = db.query(
+            Fallo.id, Fallo.materia, Fallo.tribunal, Fallo.tipo_proceso,
+            Fallo.fecha_fallo, Fallo.updated_at, Fallo.canonico_id
+        )
+        if marca is not None:
+            filtros = [Fallo.updated_at >= marca - timedelta(seconds=settings.FACETAS_SOLAPE_SEGUNDOS)]
+            if sucios:
+                filtros.append(Fallo.id.in_(sucios))
+            query = query.filter(or_(*filtros))
+        filas = query.all()
+
+        ids = [fila.id for fila in filas]
+        etiquetas: Dict[int, List[str]] = {}
+        if ids:
+            consulta = db.query(FalloEtiqueta.fallo_id, Etiqueta.nombre).join(
+                Etiqueta, FalloEtiqueta.etiqueta_id == Etiqueta.id
+            )
+            if marca is not None:
+                consulta = consulta.filter(FalloEtiqueta.fallo_id.in_(ids))
+            for fallo_id, nombre in consulta:
+                etiquetas.setdefault(fallo_id, []).append(nombre)
+
+        if completo:
+            # Se arma un índice nuevo y se reemplaza de una vez: los borrados
+            # desaparecen y las posiciones se compactan
+            nuevo = IndiceFacetas()
+            nuevo._indexar(filas, etiquetas)
+            with self._lock:
+                self.postings, self.posiciones = nuevo.postings, nuevo.posiciones
+                self.valores, self.fechas = nuevo.valores, nuevo.fechas
+                self.universo, self.marca = nuevo.universo, nuevo.marca
+                self.ultima_reconstruccion = self.ultimo_refresco = ahora
+        else:
+            with self._lock:
+                self._indexar(filas, etiquetas)
+                self.ultimo_refresco = ahora
+
+    def _indexar(self, filas, etiquetas: Dict[int, List[str]]):
+        for fila in filas:
+            if fila.updated_at and (self.marca is None or fila.updated_at > self.marca):
+                self.marca = fila.updated_at
+            if fila.canonico_id is not None:
+                # Copia: se trata como borrada
+                if fila.id in self.posiciones:
+                    self._quitar(self.posiciones[fila.id])
+                continue
+            fecha = _a_fecha(fila.fecha_fallo)
+            valores = {
+                "materia": (fila.materia,) if fila.materia else (),
+                "tribunal": (fila.tribunal,) if fila.tribunal else (),
+                "tipo_proceso": (fila.tipo_proceso,) if fila.tipo_proceso else (),
+                "etiquetas": tuple(etiquetas.get(fila.id, ())),
+                "anio": (str(fecha.year),) if fecha else (),
+            }
+            posicion = self._posicion(fila.id)
+            self._quitar(posicion)
+            self._agregar(posicion, valores, fecha)
+
+    def reconstruir(self, db: Session):
+        """Reconstrucción completa inmediata (ej: tras borrar fallos)"""
+        with self._lock:
+            self.marca = None
+        self.refrescar(db, forzar=True)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def _rango_fechas(self, desde: Optional[date], hasta: Optional[date]) -> int:
+        """Bitmap de fallos con fecha en [desde, hasta], usando los años completos"""
+        resultado = 0
+        for anio, posting in self.postings["anio"].items():
+            anio = int(anio)
+            if (desde and anio < desde.year) or (hasta and anio > hasta.year):
+                continue
+            if (not desde or anio > desde.year) and (not hasta or anio < hasta.year):
+                resultado |= posting
+                continue
+            for posicion in _bits(posting):
+                fecha = self.fechas[posicion]
+                if (not desde or fecha >= desde) and (not hasta or fecha <= hasta):
+                    resultado |= 1 << posicion
+        return resultado
+
+    def candidatos(
+        self,
+        materia: Optional[str] = None,
+        tipo_proceso: Optional[str] = None,
+        tribunal: Optional[str] = None,
+        etiquetas: Optional[List[str]] = None,
+        fecha_desde: Optional[str] = None,
+        fecha_hasta: Optional[str] = None,
+        fallo_ids: Optional[Iterable[int]] = None
+    ) -> int:
+        """
+        Bitmap de fallos que cumplen los filtros (mismas reglas que SearchService).
+        fallo_ids restringe a esos fallos (ej: los que citan una norma, de fallo_normas).
+        """
+        resultado = self.universo
+        for faceta, valor in (("materia", materia), ("tipo_proceso", tipo_proceso), ("tribunal", tribunal)):
+            if valor:
+                resultado &= self.postings[faceta].get(valor, 0)
+
+        if etiquetas:
+            alguna = 0
+            for nombre in etiquetas:
+                alguna |= self.postings["etiquetas"].get(nombre, 0)
+            resultado &= alguna
+
+        if fecha_desde or fecha_hasta:
+            resultado &= self._rango_fechas(_a_fecha(fecha_desde), _a_fecha(fecha_hasta))
+
+        if fallo_ids is not None:
+            permitidos = 0
+            for fallo_id in fallo_ids:
+                posicion = self.posiciones.get(fallo_id)
+                if posicion is not None:
+                    permitidos |= 1 << posicion
+            resultado &= permitidos
+
+        return resultado
+
+    def contar(self, candidatos: int, top: Optional[int] = None) -> dict:
+        """Conteo por valor de cada faceta dentro del conjunto de candidatos"""
+        top = top or settings.FACETAS_TOP
+        facetas = {"total": candidatos.bit_count()}
+        for faceta in FACETAS:
+            conteos = [
+                (valor, (posting & candidatos).bit_count())
+                for valor, posting in self.postings[faceta].items()
+            ]
+            conteos = sorted((c for c in conteos if c[1]), key=lambda c: (-c[1], c[0]))[:top]
+            facetas[faceta] = [{"valor": valor, "total": total} for valor, total in conteos]
+        return facetas
+
+    def facetas(self, **filtros) -> dict:
+        """Conteos de los fallos que cumplen los filtros (candidatos + contar sin un reemplazo en el medio)"""
+        with self._lock:
+            return self.contar(self.candidatos(**filtros))
+
+
+indice_facetas = IndiceFacetas()
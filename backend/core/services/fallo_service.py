@@ -0,0 +1,159 @@
+"""
+Servicio de escritura de fallos (ingesta masiva)
+"""
+from typing import List, Dict, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.models import Fallo, IngestaEstado
+from core.schemas import FalloCreate
+from core.services.crawl_service import hash_contenido
+
+CREADO = "creado"
+DUPLICADO = "duplicado"
+INVALIDO = "invalido"
+
+
+def clave_dedup(fallo: FalloCreate) -> Optional[Tuple[str, str]]:
+    """Clave de deduplicación: url_original y, si no hay, expediente"""
+    if fallo.url_original:
+        return ("url", fallo.url_original)
+    if fallo.expediente:
+        return ("expediente", fallo.expediente)
+    return None
+
+
+class FalloService:
+    """Servicio para alta masiva de fallos"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _existentes(self, fallos: List[FalloCreate]) -> Dict[Tuple[str, str], int]:
+        """Fallos ya guardados que coinciden por url_original o expediente"""
+        urls = {f.url_original for f in fallos if f.url_original}
+        expedientes = {f.expediente for f in fallos if f.expediente}
+        if not urls and not expedientes:
+            return {}
+
+        filtros = []
+        if urls:
+            filtros.append(Fallo.url_original.in_(urls))
+        if expedientes:
+            filtros.append(Fallo.expediente.in_(expedientes))
+
+        existentes = {}
+        for fallo_id, url, expediente in self.db.query(
+            Fallo.id, Fallo.url_original, Fallo.expediente
+        ).filter(or_(*filtros)):
+            if url:
+                existentes[("url", url)] = fallo_id
+            if expediente:
+                existentes[("expediente", expediente)] = fallo_id
+        return existentes
+
+    def _insertar_lote(self, lote: List[Tuple[int, FalloCreate]]) -> Dict[int, Optional[int]]:
+        """
+        Inserta un lote con un INSERT multi-fila.
+        Devuelve indice → id (None si otro proceso lo insertó primero).
+        """
+        def fila(fallo: FalloCreate) -> dict:
+            datos = fallo.dict()
+            datos["hash_contenido"] = hash_contenido(fallo.texto_completo or fallo.caratula)
+            return datos
+
+        ids = {}
+        con_url = [(i, f) for i, f in lote if f.url_original]
+        sin_url = [(i, f) for i, f in lote if not f.url_original]
+
+        if con_url:
+            stmt = (
+                insert(Fallo)
+                .values([fila(f) for _, f in con_url])
+                .on_conflict_do_nothing(index_elements=[Fallo.url_original])
+                .returning(Fallo.id, Fallo.url_original)
+            )
+            por_url = {url: fallo_id for fallo_id, url in self.db.execute(stmt)}
+            for i, f in con_url:
+                ids[i] = por_url.get(f.url_original)
+
+        if sin_url:
+            stmt = insert(Fallo).returning(Fallo.id, sort_by_parameter_order=True)
+            resultado = self.db.execute(stmt, [fila(f) for _, f in sin_url])
+            for (i, _), (fallo_id,) in zip(sin_url, resultado):
+                ids[i] = fallo_id
+
+        return ids
+
+    def crear_fallos_bulk(self, fallos: List[Optional[FalloCreate]]) -> List[Dict]:
+        """
+        Alta masiva deduplicando por url_original/expediente, tanto dentro
+        del lote como contra la base. Los elementos None son filas inválidas.
+
+        Returns:
+            Un resultado por fila: {"indice", "id", "estado"}
+        """
+        validos = [f for f in fallos if f is not None]
+        existentes = self._existentes(validos)
+
+        resultados: List[Dict] = []
+        vistos: Dict[Tuple[str, str], int] = {}
+        a_insertar: List[Tuple[int, FalloCreate]] = []
+
+        for indice, fallo in enumerate(fallos):
+            if fallo is None:
+                resultados.append({"indice": indice, "id": None, "estado": INVALIDO})
+                continue
+
+            claves = [c for c in (clave_dedup(fallo), ("expediente", fallo.expediente)) if c and c[1]]
+            previo = next((existentes[c] for c in claves if c in existentes), None)
+            repetido = next((vistos[c] for c in claves if c in vistos), None)
+
+            if previo is not None:
+                resultados.append({"indice": indice, "id": previo, "estado": DUPLICADO})
+            elif repetido is not None:
+                # Se resuelve con el id de la primera aparición, al final
+                resultados.append({"indice": indice, "id": None, "estado": DUPLICADO, "_de": repetido})
+            else:
+                for clave in claves:
+                    vistos[clave] = indice
+                a_insertar.append((indice, fallo))
+                resultados.append({"indice": indice, "id": None, "estado": CREADO})
+
+        ids: Dict[int, Optional[int]] = {}
+        for inicio in range(0, len(a_insertar), settings.BULK_LOTE_FILAS):
+            ids.update(self._insertar_lote(a_insertar[inicio:inicio + settings.BULK_LOTE_FILAS]))
+
+        # Conflictos por carreras con otra ingesta concurrente
+        perdidos = [fallos[i].url_original for i, fallo_id in ids.items() if fallo_id is None]
+        if perdidos:
+            por_url = dict(
+                self.db.query(Fallo.url_original, Fallo.id).filter(Fallo.url_original.in_(perdidos))
+            )
+            for i, fallo_id in list(ids.items()):
+                if fallo_id is None:
+                    ids[i] = por_url.get(fallos[i].url_original)
+                    resultados[i]["estado"] = DUPLICADO
+
+        creados = [fallo_id for i, fallo_id in ids.items() if resultados[i]["estado"] == CREADO]
+        if creados:
+            # Quedan listos para el pipeline de ingesta (etapa 'scraped')
+            self.db.execute(
+                insert(IngestaEstado)
+                .values([{"fallo_id": fallo_id, "etapa": "scraped", "intentos": 0} for fallo_id in creados])
+                .on_conflict_do_nothing()
+            )
+
+        self.db.commit()
+
+        for resultado in resultados:
+            origen = resultado.pop("_de", None)
+            if origen is not None:
+                resultado["id"] = ids.get(origen)
+            elif resultado["indice"] in ids:
+                resultado["id"] = ids[resultado["indice"]]
+
+        return resultados
@@ -1,10 +1,21 @@
 """
 Servicio para procesamiento con Claude API
+
+El análisis usa tool use: Claude completa la herramienta registrar_analisis,
+cuyo esquema sale de AnalisisFallo, en lugar de escribir JSON libre. Si la
+salida igual no valida (truncada o con tipos incorrectos) se hace una
+reparación dirigida: una llamada corta con la salida y los errores, sin
+volver a enviar el fallo.
 """
 import json
+from typing import List, Optional
 import anthropic
+from pydantic import ValidationError
 from core.config import settings
+from core.instrumentacion import instrumentar, registrar_salida, registrar_tokens
+from core.schemas import AnalisisFallo
 
+HERRAMIENTA_ANALISIS = "registrar_analisis"
 
 PROMPT_ETIQUETADO = """
 Analiza el siguiente fallo judicial de la Provincia de Jujuy y extrae:
@@ -18,55 +29,112 @@ Analiza el siguiente fallo judicial de la Provincia de Jujuy y extrae:
 5. **Partes**: Actor/Demandante y Demandado
 6. **Normas citadas**: Leyes, artículos o códigos mencionados
 
-Responde ÚNICAMENTE en formato JSON siguiendo esta estructura:
-{{
-    "resumen": "...",
-    "palabras_clave": ["...", "..."],
-    "materia": "...",
-    "tipo_proceso": "...",
-    "subtemas": ["...", "..."],
-    "resultado": "...",
-    "actor": "...",
-    "demandado": "...",
-    "normas_citadas": ["...", "..."]
-}}
-
+Registra el análisis con la herramienta registrar_analisis.
+{candidatas}
 FALLO:
 {texto_fallo}
 """
 
+SECCION_CANDIDATAS = """
+Etiquetas del tesauro detectadas en el texto (úsalas como subtemas o
+palabras clave si corresponden, con ese mismo nombre):
+{etiquetas}
+"""
+
+PROMPT_REPARACION = """
+El siguiente análisis de un fallo judicial no cumple el esquema de la
+herramienta registrar_analisis. Corrige SOLO los campos con errores, sin
+inventar datos (si un valor falta usa null o una lista vacía), y registra
+el análisis corregido con la herramienta.
+
+ERRORES:
+{errores}
+
+ANÁLISIS:
+{analisis}
+"""
+
+
+def describir_errores(error: Exception) -> str:
+    """Errores de validación en una línea por campo (para el prompt de reparación)"""
+    if isinstance(error, ValidationError):
+        return "\n".join(
+            f"- {'.'.join(str(p) for p in e['loc']) or 'raíz'}: {e['msg']}" for e in error.errors()
+        )
+    return f"- {error}"
+
 
 class IAService:
     """Servicio para procesamiento con IA"""
-    
+
     def __init__(self):
         self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-    
-    async def etiquetar_fallo(self, texto_fallo: str) -> dict:
-        """
-        Analiza un fallo y extrae información estructurada usando Claude
-        """
+        self.herramienta = {
+            "name": HERRAMIENTA_ANALISIS,
+            "description": "Registra el análisis estructurado de un fallo judicial",
+            "input_schema": AnalisisFallo.model_json_schema(),
+        }
+
+    def _llamar(self, contenido: str):
+        """Mensaje con la herramienta de análisis forzada"""
         message = self.client.messages.create(
             model=settings.CLAUDE_MODEL,
             max_tokens=2000,
-            messages=[{
-                "role": "user",
-                "content": PROMPT_ETIQUETADO.format(texto_fallo=texto_fallo)
-            }]
+            tools=[self.herramienta],
+            tool_choice={"type": "tool", "name": HERRAMIENTA_ANALISIS},
+            messages=[{"role": "user", "content": contenido}]
         )
-        
-        # Extraer JSON de la respuesta
-        respuesta = message.content[0].text
-        
-        # Limpiar posibles markdown
-        respuesta = respuesta.replace("```json", "").replace("```", "").strip()
-        
+        registrar_tokens(
+            "anthropic", settings.CLAUDE_MODEL,
+            entrada=message.usage.input_tokens, salida=message.usage.output_tokens
+        )
+        return message
+
+    @staticmethod
+    def _salida(message):
+        """Argumentos de la herramienta (o el texto, si Claude no la usó)"""
+        for bloque in message.content:
+            if bloque.type == "tool_use" and bloque.name == HERRAMIENTA_ANALISIS:
+                return bloque.input
+        return "".join(bloque.text for bloque in message.content if bloque.type == "text")
+
+    @staticmethod
+    def _validar(salida) -> AnalisisFallo:
+        if isinstance(salida, str):
+            salida = json.loads(salida)
+        return AnalisisFallo.model_validate(salida)
+
+    @instrumentar("ia", "etiquetar_fallo")
+    async def etiquetar_fallo(self, texto_fallo: str, candidatas: Optional[List[str]] = None) -> dict:
+        """
+        Analiza un fallo y extrae información estructurada usando Claude.
+        `candidatas`: etiquetas detectadas localmente, para normalizar los subtemas.
+        """
+        seccion = SECCION_CANDIDATAS.format(etiquetas=", ".join(candidatas)) if candidatas else ""
+        message = self._llamar(PROMPT_ETIQUETADO.format(texto_fallo=texto_fallo, candidatas=seccion))
+        salida = self._salida(message)
         try:
-            return json.loads(respuesta)
-        except json.JSONDecodeError:
-            # Si falla, intentar extraer JSON del texto
-            inicio = respuesta.find("{")
-            fin = respuesta.rfind("}") + 1
-            if inicio >= 0 and fin > inicio:
-                return json.loads(respuesta[inicio:fin])
-            raise ValueError("No se pudo parsear la respuesta de Claude como JSON")
+            analisis = self._validar(salida)
+            registrar_salida("anthropic", "valida")
+            return analisis.model_dump()
+        except (ValidationError, ValueError) as e:
+            error = e
+
+        # Reparación dirigida: solo la salida y sus errores, no el fallo completo
+        reparacion = self._llamar(PROMPT_REPARACION.format(
+            errores=describir_errores(error),
+            analisis=json.dumps(salida, ensure_ascii=False) if not isinstance(salida, str) else salida
+        ))
+        tokens_reparacion = reparacion.usage.input_tokens + reparacion.usage.output_tokens
+        try:
+            analisis = self._validar(self._salida(reparacion))
+        except (ValidationError, ValueError) as e:
+            registrar_salida(
+                "anthropic", "invalida",
+                reparacion=tokens_reparacion,
+                descartados=message.usage.input_tokens + message.usage.output_tokens
+            )
+            raise ValueError(f"La respuesta de Claude no cumple el esquema tras la reparación: {e}")
+
+        registrar_salida("anthropic", "reparada", reparacion=tokens_reparacion)
+        return analisis.model_dump()
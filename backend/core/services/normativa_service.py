@@ -0,0 +1,166 @@
+"""
+Índice de normas citadas por cada fallo (tabla fallo_normas)
+
+Las citas de leyes, códigos y artículos de texto_completo salen del
+extractor compartido (jurisar_comun.citas): "art. 245 de la LCT", "arts.
+232, 233 y 245 LCT" y "Ley 20.744, art. 245" quedan todas como
+("LEY 20744", "245"). Cada norma citada tiene además una fila con
+articulo '' (cita de la norma), así "fallos que citan la ley 20.744" y
+"fallos que citan el art. 245 LCT" son búsquedas exactas por índice.
+"""
+import time
+from typing import Dict, List, Optional
+
+from jurisar_comun.citas import extraer_citas, formatear_cita, interpretar_consulta  # noqa: F401
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.instrumentacion import instrumentar
+
+MAX_NORMA = 60
+
+
+class NormativaService:
+    """Mantiene fallo_normas y resuelve búsquedas exactas por norma"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def indexar_textos(self, textos: Dict[int, str], commit: bool = True) -> int:
+        """
+        Reemplaza las citas de los fallos dados (fallo_id → texto_completo)
+
+        Returns:
+            Filas escritas
+        """
+        if not textos:
+            return 0
+        filas = [
+            {"fallo_id": fallo_id, "norma": norma[:MAX_NORMA], "articulo": articulo, "menciones": menciones}
+            for fallo_id, texto in textos.items()
+            for (norma, articulo), menciones in extraer_citas(texto).items()
+        ]
+        self.db.execute(
+            text("DELETE FROM fallo_normas WHERE fallo_id = ANY(:ids)"), {"ids": list(textos)}
+        )
+        if filas:
+            self.db.execute(text("""
+                INSERT INTO fallo_normas (fallo_id, norma, articulo, menciones)
+                VALUES (:fallo_id, :norma, :articulo, :menciones)
+            """), filas)
+        if commit:
+            self.db.commit()
+        return len(filas)
+
+    @instrumentar("normativa", "indexar_corpus")
+    def indexar_corpus(self, fallo_ids: Optional[List[int]] = None, lote: int = 500) -> dict:
+        """Extrae las citas de todos los fallos con texto (o de los indicados)"""
+        ultimo_id, fallos, filas = 0, 0, 0
+        inicio = time.perf_counter()
+        while True:
+            lote_filas = self.db.execute(text("""
+                SELECT id, texto_completo
+                FROM fallos
+                WHERE id > :ultimo_id
+                  AND btrim(COALESCE(texto_completo, '')) <> ''
+                  AND (CAST(:ids AS integer[]) IS NULL OR id = ANY(:ids))
+                ORDER BY id
+                LIMIT :lote
+            """), {"ultimo_id": ultimo_id, "ids": fallo_ids, "lote": lote}).all()
+            if not lote_filas:
+                break
+            ultimo_id = lote_filas[-1].id
+            filas += self.indexar_textos({f.id: f.texto_completo for f in lote_filas})
+            fallos += len(lote_filas)
+
+        segundos = time.perf_counter() - inicio
+        return {
+            "fallos": fallos,
+            "citas": filas,
+            "fallos_por_segundo": round(fallos / segundos, 1) if segundos else None,
+            "segundos": round(segundos, 2),
+        }
+
+    def normas_de_fallo(self, fallo_id: int) -> List[dict]:
+        """Normas y artículos que cita un fallo, de la más mencionada a la menos"""
+        filas = self.db.execute(text("""
+            SELECT norma, articulo, menciones
+            FROM fallo_normas
+            WHERE fallo_id = :fallo_id
+            ORDER BY articulo = '' DESC, menciones DESC, norma, articulo
+        """), {"fallo_id": fallo_id}).all()
+        return [
+            {"cita": formatear_cita(f.norma, f.articulo), "norma": f.norma, "articulo": f.articulo or None,
+             "menciones": f.menciones}
+            for f in filas
+        ]
+
+    def fallos_que_citan(self, consulta: str) -> List[int]:
+        """Ids de los fallos que citan la norma o artículo (filtro de facetas)"""
+        norma, articulo = interpretar_consulta(consulta)
+        return self.db.execute(text("""
+            SELECT fallo_id FROM fallo_normas WHERE norma = :norma AND articulo = :articulo
+        """), {"norma": norma, "articulo": articulo}).scalars().all()
+
+    @instrumentar("normativa", "buscar")
+    def buscar(self, consulta: str, limit: int = 20, offset: int = 0) -> dict:
+        """
+        Fallos que citan una norma o artículo (búsqueda exacta por índice).
+        Las copias se agrupan bajo su canónico, como en las demás búsquedas:
+        total cuenta fallos canónicos y 'duplicados' lista las copias que citan.
+        """
+        norma, articulo = interpretar_consulta(consulta)
+        params = {"norma": norma, "articulo": articulo, "limit": limit, "offset": offset}
+        grupo = "COALESCE(d.canonico_id, d.fallo_id)" if settings.DEDUP_COLAPSAR else "d.fallo_id"
+        citantes = f"""
+            WITH citantes AS (
+                SELECT
+                    {grupo} AS id,
+                    max(n.menciones) AS menciones,
+                    COALESCE(
+                        array_agg(d.fallo_id ORDER BY d.fallo_id) FILTER (WHERE d.fallo_id <> {grupo}),
+                        CAST('{{}}' AS integer[])
+                    ) AS duplicados
+                FROM fallo_normas n
+                JOIN search_documents d ON d.fallo_id = n.fallo_id
+                WHERE n.norma = :norma AND n.articulo = :articulo
+                GROUP BY 1
+            )
+        """
+        total = self.db.execute(text(citantes + """
+            SELECT count(*) FROM citantes c JOIN search_documents d ON d.fallo_id = c.id
+        """), params).scalar()
+        filas = self.db.execute(text(citantes + """
+            SELECT
+                d.fallo_id AS id,
+                d.caratula,
+                d.resumen_ia,
+                d.fecha_fallo,
+                d.tribunal,
+                d.materia,
+                c.menciones,
+                c.duplicados
+            FROM citantes c
+            JOIN search_documents d ON d.fallo_id = c.id
+            ORDER BY c.menciones DESC, d.fecha_fallo DESC NULLS LAST, d.fallo_id
+            LIMIT :limit OFFSET :offset
+        """), params).fetchall()
+        return {
+            "cita": formatear_cita(norma, articulo),
+            "norma": norma,
+            "articulo": articulo or None,
+            "total": total,
+            "resultados": [dict(f._mapping) for f in filas],
+        }
+
+
+def filtro_norma_sql(consulta: Optional[str], params: dict, alias: str = "d") -> str:
+    """Condición SQL del filtro por norma para las búsquedas (agrega sus parámetros)"""
+    if not consulta:
+        return ""
+    params["norma"], params["articulo"] = interpretar_consulta(consulta)
+    return (
+        f" AND EXISTS (SELECT 1 FROM fallo_normas n WHERE n.fallo_id = {alias}.fallo_id"
+        " AND n.norma = :norma AND n.articulo = :articulo)"
+    )
@@ -0,0 +1,418 @@
+"""
+Pipeline de ingesta: scrape → extract → tag → embed
+
+Cada etapa tiene su cola acotada y su propio número de workers. El estado
+de cada fallo (ingesta_estado) se persiste al completar cada etapa, por lo
+que la base funciona como buffer de desborde: si una cola está llena el
+fallo queda registrado en su etapa y se vuelve a encolar cuando hay lugar.
+Así un LLM lento nunca frena al scraper, y tras una caída cada fallo se
+retoma desde la última etapa completada.
+"""
+import asyncio
+from typing import Optional, Dict, List, Set
+
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+from core.models import Fallo, IngestaEstado
+from core.services.crawl_service import CrawlService
+from core.services.duplicado_service import DuplicadoService
+from core.services.etiqueta_service import EtiquetaService
+from core.services.etiquetador_service import EtiquetadorService
+from core.services.normativa_service import NormativaService
+
+SCRAPED = "scraped"
+EXTRACTED = "extracted"
+TAGGED = "tagged"
+EMBEDDED = "embedded"
+ERROR = "error"
+DUPLICADOS = "duplicados"  # copias etiquetadas desde su canónico, sin IA
+
+# Etapa de origen → etapa que produce el worker
+SIGUIENTE_ETAPA = {
+    SCRAPED: EXTRACTED,
+    EXTRACTED: TAGGED,
+    TAGGED: EMBEDDED,
+}
+ETAPA_ANTERIOR = {destino: origen for origen, destino in SIGUIENTE_ETAPA.items()}
+
+
+def crear_ia_service():
+    """IAService según settings.IA_PROVIDER"""
+    if settings.IA_PROVIDER == "stub":
+        from core.services.stubs import StubIAService
+        return StubIAService()
+    from core.services.ia_service import IAService
+    return IAService()
+
+
+def crear_embedding_service(db: Session):
+    """EmbeddingService (el proveedor se elige por settings.EMBEDDING_PROVIDER)"""
+    from core.services.embedding_service import EmbeddingService
+    return EmbeddingService(db)
+
+
+def limpiar_texto(texto: str) -> str:
+    """Limpieza inicial: espacios, líneas vacías y encabezados repetidos"""
+    lineas = [" ".join(linea.split()) for linea in texto.splitlines()]
+    vistas = {}
+    for linea in lineas:
+        if linea:
+            vistas[linea] = vistas.get(linea, 0) + 1
+
+    # Líneas cortas que se repiten muchas veces son encabezados o pies de página
+    ruido = {linea for linea, n in vistas.items() if n >= 3 and len(linea) < 80}
+    return "\n".join(linea for linea in lineas if linea and linea not in ruido)
+
+
+class PipelineIngesta:
+    """Orquestador del pipeline de ingesta por etapas"""
+
+    def __init__(
+        self,
+        ia_service=None,
+        concurrencia: Optional[Dict[str, int]] = None,
+        cola_max: Optional[int] = None
+    ):
+        self.ia_service = ia_service or crear_ia_service()
+        self.concurrencia = {
+            EXTRACTED: settings.PIPELINE_CONCURRENCIA_EXTRACT,
+            TAGGED: settings.PIPELINE_CONCURRENCIA_TAG,
+            EMBEDDED: settings.PIPELINE_CONCURRENCIA_EMBED,
+            **(concurrencia or {}),
+        }
+        self.cola_max = cola_max or settings.PIPELINE_COLA_MAX
+        self.colas: Dict[str, asyncio.Queue] = {}
+        self.en_vuelo: Set[int] = set()
+        self.desbordadas: Set[str] = set()
+        self.estadisticas = {etapa: 0 for etapa in (SCRAPED, EXTRACTED, TAGGED, EMBEDDED, ERROR, DUPLICADOS)}
+        # Análisis de la IA que esperan persistirse en lote (siguen en vuelo)
+        self.lote_analisis: Dict[int, dict] = {}
+
+    # ------------------------------------------------------------------
+    # Estado durable
+    # ------------------------------------------------------------------
+
+    def _marcar(
+        self,
+        db: Session,
+        fallo_ids: List[int],
+        etapa: str,
+        error: Optional[str] = None,
+        commit: bool = True
+    ):
+        """Registra la etapa completada por cada fallo (confirma la transacción en curso)"""
+        for fallo_id in fallo_ids:
+            estado = db.get(IngestaEstado, fallo_id)
+            if estado is None:
+                estado = IngestaEstado(fallo_id=fallo_id, intentos=0)
+                db.add(estado)
+            if error is None:
+                estado.etapa = etapa
+                estado.intentos = 0
+                estado.error = None
+            else:
+                estado.intentos = (estado.intentos or 0) + 1
+                estado.error = error[:2000]
+                if estado.intentos >= settings.PIPELINE_MAX_INTENTOS:
+                    estado.etapa = ERROR
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+    def _pendientes(self, etapa: str, limite: int, en_vuelo: Set[int]) -> List[int]:
+        """
+        Fallos que completaron `etapa` y no están en vuelo. Corre en un hilo:
+        recibe una copia de en_vuelo, que el event loop sigue modificando.
+        """
+        db = SessionLocal()
+        try:
+            query = db.query(IngestaEstado.fallo_id).filter(IngestaEstado.etapa == etapa)
+            if en_vuelo:
+                query = query.filter(IngestaEstado.fallo_id.notin_(en_vuelo))
+            return [fila[0] for fila in query.order_by(IngestaEstado.fallo_id).limit(limite)]
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Colas
+    # ------------------------------------------------------------------
+
+    def _encolar(self, etapa: str, fallo_id: int):
+        """Encola sin bloquear; si la cola está llena el fallo queda en la base"""
+        if fallo_id in self.en_vuelo:
+            return
+        try:
+            self.colas[etapa].put_nowait(fallo_id)
+            self.en_vuelo.add(fallo_id)
+        except asyncio.QueueFull:
+            self.desbordadas.add(etapa)
+
+    async def _rellenar(self, etapa: str) -> int:
+        """Completa la cola de `etapa` con fallos pendientes en la base"""
+        cola = self.colas[etapa]
+        lugar = cola.maxsize - cola.qsize()
+        if lugar <= 0:
+            return 0
+
+        self.desbordadas.discard(etapa)
+        ids = await asyncio.to_thread(self._pendientes, etapa, lugar, set(self.en_vuelo))
+        for fallo_id in ids:
+            self._encolar(etapa, fallo_id)
+        return len(ids)
+
+    async def _rellenador(self):
+        """Reencola lo que quedó en la base por desborde o por una ejecución anterior"""
+        while True:
+            for etapa in list(self.desbordadas):
+                await self._rellenar(etapa)
+            await asyncio.sleep(0.5)
+
+    # ------------------------------------------------------------------
+    # Etapas
+    # ------------------------------------------------------------------
+
+    async def _scrape(self, max_pages: Optional[int], engine: Optional[str], incremental: Optional[bool]):
+        """Etapa 1: scrapea y persiste página por página"""
+        db = SessionLocal()
+        try:
+            crawl = CrawlService(db)
+            incremental = settings.SCRAPER_INCREMENTAL if incremental is None else incremental
+            marca = crawl.obtener_marca()
+            es_conocido = crawl.predicado_conocido(marca) if incremental else None
+            vistos = []
+
+            async for pagina in self._paginas(max_pages, engine, es_conocido):
+                ids = await asyncio.to_thread(self._guardar_pagina, db, crawl, pagina)
+                self.estadisticas[SCRAPED] += len(ids)
+                for fallo_id in ids:
+                    self._encolar(SCRAPED, fallo_id)
+                vistos.extend(pagina)
+
+            await asyncio.to_thread(crawl.actualizar_marca, vistos, marca)
+        finally:
+            db.close()
+
+    def _guardar_pagina(self, db: Session, crawl: CrawlService, pagina: List[dict]) -> List[int]:
+        """
+        Guarda los fallos de una página y los marca como scrapeados en la
+        misma transacción: una caída no deja fallos guardados sin etapa
+        """
+        resultado = crawl.guardar(pagina, commit=False)
+        ids = resultado["nuevos"] + resultado["modificados"]
+        self._marcar(db, ids, SCRAPED)
+        return ids
+
+    async def _paginas(self, max_pages, engine, es_conocido):
+        engine = engine or settings.SCRAPER_ENGINE
+        if engine == "http":
+            from scrapers.jujuy_http_scraper import JujuyHttpScraper
+            async for pagina in JujuyHttpScraper().iterar_paginas(max_pages, es_conocido):
+                yield pagina
+        else:
+            from scrapers.jujuy_scraper import scrape_fallos_jujuy_async
+            yield await scrape_fallos_jujuy_async(max_pages, engine, es_conocido=es_conocido)
+
+    def _extraer(self, db: Session, fallo: Fallo):
+        """Etapa 2: obtiene y limpia el texto completo"""
+        texto = fallo.texto_completo
+        if not texto and fallo.url_original:
+            import httpx
+            from scrapers.jujuy_http_scraper import parsear_detalle
+
+            response = httpx.get(fallo.url_original, timeout=settings.SCRAPER_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            texto = parsear_detalle(response.text)
+
+        if not texto:
+            raise ValueError(f"Fallo {fallo.id} sin texto completo")
+
+        fallo.texto_completo = limpiar_texto(texto)
+        # Las citas de normas se extraen del texto limpio, en la misma transacción
+        NormativaService(db).indexar_textos({fallo.id: fallo.texto_completo}, commit=False)
+        if settings.DEDUP_HABILITADO:
+            DuplicadoService(db).registrar(fallo.id, fallo.texto_completo, commit=False)
+        db.commit()
+
+    def _etiquetar(self, db: Session, fallo: Fallo) -> Optional[dict]:
+        """
+        Etapa 3: análisis con IA. Devuelve el análisis, que se persiste en
+        lote (_persistir_analisis); None si el fallo ya quedó etiquetado.
+        """
+        # Una copia de un fallo ya analizado hereda su análisis sin llamar a la IA
+        if fallo.canonico_id and DuplicadoService(db).copiar_analisis(fallo):
+            self.estadisticas[DUPLICADOS] += 1
+            return None
+
+        # Candidatas del etiquetador local: la IA normaliza contra una lista corta
+        candidatas = [nombre for nombre, _ in EtiquetadorService(db).candidatas(fallo.texto_completo)]
+        return asyncio.run(self.ia_service.etiquetar_fallo(fallo.texto_completo, candidatas))
+
+    def _persistir_analisis(self, lote: Dict[int, dict]) -> bool:
+        """
+        Escribe los campos, las etiquetas y la etapa de un lote de fallos
+        analizados en una sola transacción. Devuelve si tuvo éxito.
+        """
+        db = SessionLocal()
+        try:
+            for fallo_id, analisis in lote.items():
+                fallo = db.get(Fallo, fallo_id)
+                if fallo is None:
+                    continue
+                fallo.resumen_ia = analisis.get("resumen") or fallo.resumen_ia
+                fallo.materia = analisis.get("materia") or fallo.materia
+                fallo.tipo_proceso = analisis.get("tipo_proceso") or fallo.tipo_proceso
+                fallo.resultado = analisis.get("resultado") or fallo.resultado
+            self._marcar(db, list(lote), TAGGED, commit=False)
+            # Hace commit de los campos y la etapa junto con las etiquetas
+            EtiquetaService(db).guardar_analisis_lote(lote)
+            return True
+        except Exception as e:
+            db.rollback()
+            print(f"Error guardando el lote de {len(lote)} análisis: {e}")
+            self._marcar(db, list(lote), TAGGED, error=str(e))
+            return False
+        finally:
+            db.close()
+
+    def _embeber(self, db: Session, fallo: Fallo):
+        """Etapa 4: embedding del documento de búsqueda y de los pasajes del texto"""
+        from core.services.chunk_service import ChunkService
+        from core.services.documento_service import DocumentoService
+
+        if fallo.canonico_id:
+            # Las copias no se embeben: la búsqueda muestra el canónico
+            DocumentoService(db).refrescar([fallo.id])
+            return
+
+        embedding_service = crear_embedding_service(db)
+        asyncio.run(embedding_service.generar_embedding_fallo(fallo.id))
+        asyncio.run(ChunkService(db).indexar_fallo(fallo.id))
+
+    def _ejecutar_etapa(self, etapa: str, fallo_id: int):
+        """
+        Ejecuta una etapa en un hilo con su propia sesión. Devuelve si tuvo
+        éxito, None si el fallo ya no está en la etapa de origen (llegó por
+        un relleno desactualizado y otro worker ya lo procesó), o el
+        análisis de la IA cuando falta persistirlo en lote.
+        """
+        funciones = {EXTRACTED: self._extraer, TAGGED: self._etiquetar, EMBEDDED: self._embeber}
+        origen = ETAPA_ANTERIOR[etapa]
+        db = SessionLocal()
+        try:
+            estado = db.get(IngestaEstado, fallo_id)
+            if estado is None or estado.etapa != origen:
+                return None
+            fallo = db.get(Fallo, fallo_id)
+            if fallo is None:
+                return False
+            analisis = funciones[etapa](db, fallo)
+            if analisis is not None:
+                return analisis
+            self._marcar(db, [fallo_id], etapa)
+            return True
+        except Exception as e:
+            db.rollback()
+            print(f"Error en etapa {etapa} del fallo {fallo_id}: {e}")
+            self._marcar(db, [fallo_id], etapa, error=str(e))
+            return False
+        finally:
+            db.close()
+
+    async def _worker(self, origen: str):
+        destino = SIGUIENTE_ETAPA[origen]
+        cola = self.colas[origen]
+        while True:
+            fallo_id = await cola.get()
+            ok = None
+            try:
+                ok = await asyncio.to_thread(self._ejecutar_etapa, destino, fallo_id)
+            finally:
+                if isinstance(ok, dict):
+                    # Sigue en vuelo hasta que se persista su lote
+                    self.lote_analisis[fallo_id] = ok
+                else:
+                    self.en_vuelo.discard(fallo_id)
+                cola.task_done()
+
+            if isinstance(ok, dict):
+                if len(self.lote_analisis) >= settings.PIPELINE_LOTE_ANALISIS:
+                    await self._vaciar_lote()
+            elif ok is not None:
+                self._completados(origen, destino, [fallo_id], ok)
+
+    def _completados(self, origen: str, destino: str, fallo_ids: List[int], ok: bool):
+        if ok:
+            self.estadisticas[destino] += len(fallo_ids)
+            if destino in SIGUIENTE_ETAPA:
+                for fallo_id in fallo_ids:
+                    self._encolar(destino, fallo_id)
+        else:
+            # Los reintentos se toman de la base; los agotados quedan en 'error'
+            self.desbordadas.add(origen)
+            self.estadisticas[ERROR] += len(fallo_ids)
+
+    async def _vaciar_lote(self):
+        """Persiste los análisis acumulados y pasa sus fallos a la etapa siguiente"""
+        if not self.lote_analisis:
+            return
+        lote, self.lote_analisis = self.lote_analisis, {}
+        try:
+            ok = await asyncio.to_thread(self._persistir_analisis, lote)
+        finally:
+            for fallo_id in lote:
+                self.en_vuelo.discard(fallo_id)
+        self._completados(EXTRACTED, TAGGED, list(lote), ok)
+
+    async def _vaciador(self):
+        """Persiste el lote de análisis aunque no se llene, cada PIPELINE_LOTE_SEGUNDOS"""
+        while True:
+            await asyncio.sleep(settings.PIPELINE_LOTE_SEGUNDOS)
+            await self._vaciar_lote()
+
+    # ------------------------------------------------------------------
+    # Ejecución
+    # ------------------------------------------------------------------
+
+    async def ejecutar(
+        self,
+        max_pages: Optional[int] = None,
+        engine: Optional[str] = None,
+        incremental: Optional[bool] = None,
+        scrapear: bool = True
+    ) -> Dict[str, int]:
+        """
+        Ejecuta el pipeline completo. Primero retoma lo que quedó a medias
+        de ejecuciones anteriores y termina cuando no quedan fallos pendientes.
+        """
+        self.colas = {origen: asyncio.Queue(maxsize=self.cola_max) for origen in SIGUIENTE_ETAPA}
+        self.desbordadas = set(SIGUIENTE_ETAPA)
+
+        tareas = [asyncio.create_task(self._rellenador()), asyncio.create_task(self._vaciador())]
+        for origen, destino in SIGUIENTE_ETAPA.items():
+            for _ in range(self.concurrencia[destino]):
+                tareas.append(asyncio.create_task(self._worker(origen)))
+
+        try:
+            if scrapear:
+                await self._scrape(max_pages, engine, incremental)
+
+            while True:
+                for cola in self.colas.values():
+                    await cola.join()
+                await self._vaciar_lote()
+                encolados = 0
+                for origen in SIGUIENTE_ETAPA:
+                    encolados += await self._rellenar(origen)
+                if not encolados and not self.en_vuelo:
+                    break
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+            await asyncio.gather(*tareas, return_exceptions=True)
+            # Lo analizado no se pierde aunque la ejecución se interrumpa
+            await self._vaciar_lote()
+
+        return self.estadisticas
@@ -0,0 +1,239 @@
+"""
+Re-ranking de resultados de búsqueda (segunda etapa)
+
+La similitud coseno ubica bien el vecindario pero ordena mal los
+primeros puestos en consultas jurídicas con matices. El re-ranker
+vuelve a puntuar los top-N candidatos de la primera etapa en una sola
+llamada por lotes:
+- cross-encoder: modelo local en CPU (sentence-transformers)
+- llm: Claude puntúa todos los candidatos en un solo mensaje, con caché
+- stub: solapamiento de términos (offline, benchmarks)
+
+Tiene un presupuesto estricto de latencia: si no responde a tiempo (o
+falla) se devuelve el orden de la primera etapa. La llamada vencida no se
+cancela: termina en segundo plano y deja sus puntajes en la caché del
+re-ranker LLM para la próxima consulta igual.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from core.instrumentacion import instrumentar, registrar_tokens
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # dependencia opcional (solo para RERANK_PROVIDER=cross-encoder)
+    CrossEncoder = None
+
+
+PROMPT_RERANK = """
+Sos un asistente jurídico. Puntuá de 0 a 10 qué tan relevante es cada fallo
+para la consulta (10 = responde exactamente la cuestión jurídica planteada).
+
+CONSULTA: {consulta}
+
+FALLOS:
+{fallos}
+
+Responde ÚNICAMENTE con un array JSON de números, uno por fallo y en el
+mismo orden. Ejemplo: [7, 2, 9]
+"""
+
+
+def texto_resultado(resultado: dict) -> str:
+    """Texto de un resultado de búsqueda que ve el re-ranker"""
+    partes = [resultado.get("caratula"), resultado.get("pasaje") or resultado.get("resumen_ia")]
+    return "\n".join(p for p in partes if p)
+
+
+class Reranker(ABC):
+    """Interfaz común de los re-rankers"""
+
+    nombre = "base"
+
+    @abstractmethod
+    async def puntuar(self, consulta: str, textos: List[str]) -> List[float]:
+        """Un puntaje por texto, en el mismo orden (mayor = más relevante)"""
+
+    def calentar(self):
+        """Carga anticipada del modelo"""
+
+
+class RerankerCrossEncoder(Reranker):
+    """Cross-encoder multilingüe en CPU: puntúa los pares (consulta, texto) en un lote"""
+
+    nombre = "cross-encoder"
+
+    def __init__(self, modelo: Optional[str] = None):
+        self.modelo = modelo or settings.RERANK_MODELO
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        if self._modelo is None:
+            if CrossEncoder is None:
+                raise RuntimeError("RERANK_PROVIDER=cross-encoder requiere sentence-transformers")
+            with self._lock:
+                if self._modelo is None:
+                    self._modelo = CrossEncoder(self.modelo, device="cpu")
+        return self._modelo
+
+    def _puntuar(self, consulta: str, textos: List[str]) -> List[float]:
+        puntajes = self._cargar().predict(
+            [(consulta, texto) for texto in textos],
+            batch_size=len(textos),
+            show_progress_bar=False
+        )
+        return [float(p) for p in puntajes]
+
+    async def puntuar(self, consulta: str, textos: List[str]) -> List[float]:
+        return await asyncio.to_thread(self._puntuar, consulta, textos)
+
+    def calentar(self):
+        self._puntuar("calentamiento", ["calentamiento del re-ranker"])
+
+
+class RerankerLLM(Reranker):
+    """Claude puntúa todos los candidatos en un mensaje; los puntajes se cachean"""
+
+    nombre = "llm"
+
+    def __init__(self):
+        import anthropic
+        self.client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _clave(consulta: str, texto: str) -> Tuple[str, str]:
+        consulta = " ".join(consulta.lower().split())
+        return consulta, hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+    async def puntuar(self, consulta: str, textos: List[str]) -> List[float]:
+        claves = [self._clave(consulta, texto) for texto in textos]
+        with self._lock:
+            puntajes: Dict[int, float] = {
+                i: self._cache[clave] for i, clave in enumerate(claves) if clave in self._cache
+            }
+        faltantes = [i for i in range(len(textos)) if i not in puntajes]
+
+        if faltantes:
+            fallos = "\n\n".join(f"[{n}] {textos[i][:1500]}" for n, i in enumerate(faltantes, 1))
+            message = await self.client.messages.create(
+                model=settings.CLAUDE_MODEL,
+                max_tokens=200,
+                messages=[{"role": "user", "content": PROMPT_RERANK.format(consulta=consulta, fallos=fallos)}]
+            )
+            registrar_tokens(
+                "anthropic", settings.CLAUDE_MODEL,
+                entrada=message.usage.input_tokens, salida=message.usage.output_tokens
+            )
+            respuesta = message.content[0].text
+            nuevos = json.loads(respuesta[respuesta.find("["):respuesta.rfind("]") + 1])
+            if len(nuevos) != len(faltantes):
+                raise ValueError("El re-ranker LLM devolvió una cantidad de puntajes distinta")
+
+            with self._lock:
+                for i, puntaje in zip(faltantes, nuevos):
+                    puntajes[i] = float(puntaje)
+                    self._cache[claves[i]] = float(puntaje)
+                while len(self._cache) > settings.RERANK_CACHE_MAX:
+                    self._cache.popitem(last=False)
+
+        return [puntajes[i] for i in range(len(textos))]
+
+
+def _terminos(texto: str) -> set:
+    texto = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return {t for t in re.findall(r"\w+", texto) if len(t) > 3}
+
+
+class RerankerStub(Reranker):
+    """Proporción de términos de la consulta presentes en el texto"""
+
+    nombre = "stub"
+
+    async def puntuar(self, consulta: str, textos: List[str]) -> List[float]:
+        terminos = _terminos(consulta) or {""}
+        return [len(terminos & _terminos(texto)) / len(terminos) for texto in textos]
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+# Puntuaciones que vencieron el presupuesto y siguen corriendo (referencia fuerte)
+_en_segundo_plano: Set[asyncio.Task] = set()
+
+
+def _terminada(tarea: asyncio.Task):
+    _en_segundo_plano.discard(tarea)
+    if not tarea.cancelled() and tarea.exception() is not None:
+        print(f"Re-ranking en segundo plano falló ({type(tarea.exception()).__name__})")
+
+
+def obtener_reranker() -> Reranker:
+    """Re-ranker (único por proceso) según settings.RERANK_PROVIDER"""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            if settings.RERANK_PROVIDER == "llm":
+                _reranker = RerankerLLM()
+            elif settings.RERANK_PROVIDER == "stub":
+                _reranker = RerankerStub()
+            else:
+                _reranker = RerankerCrossEncoder()
+    return _reranker
+
+
+class RerankService:
+    """Segunda etapa con presupuesto de latencia y fallback al orden original"""
+
+    def __init__(self, reranker: Optional[Reranker] = None):
+        self.reranker = reranker or obtener_reranker()
+
+    @instrumentar("rerank", "reordenar")
+    async def reordenar(
+        self,
+        consulta: str,
+        resultados: List[dict],
+        top_n: Optional[int] = None,
+        timeout_ms: Optional[float] = None
+    ) -> Tuple[List[dict], bool]:
+        """
+        Re-puntúa los top_n primeros resultados y los reordena.
+
+        Returns:
+            (resultados, True si se aplicó el re-ranking; False si se
+            agotó el presupuesto o falló y quedó el orden de la primera etapa)
+        """
+        top_n = top_n or settings.RERANK_TOP_N
+        timeout_ms = settings.RERANK_TIMEOUT_MS if timeout_ms is None else timeout_ms
+        candidatos, resto = resultados[:top_n], resultados[top_n:]
+        if len(candidatos) < 2:
+            return resultados, False
+
+        tarea = asyncio.ensure_future(self.reranker.puntuar(consulta, [texto_resultado(r) for r in candidatos]))
+        try:
+            # shield: al vencer el presupuesto la puntuación sigue y llena la caché
+            puntajes = await asyncio.wait_for(asyncio.shield(tarea), timeout=timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            _en_segundo_plano.add(tarea)
+            tarea.add_done_callback(_terminada)
+            print("Re-ranking omitido (TimeoutError): se usa el orden de la primera etapa")
+            return resultados, False
+        except Exception as e:
+            print(f"Re-ranking omitido ({type(e).__name__}): se usa el orden de la primera etapa")
+            return resultados, False
+
+        for resultado, puntaje in zip(candidatos, puntajes):
+            resultado["puntaje_rerank"] = puntaje
+        # sorted es estable: ante empate se respeta el orden por similitud
+        candidatos = sorted(candidatos, key=lambda r: -r["puntaje_rerank"])
+        return candidatos + resto, True
@@ -6,6 +6,135 @@ from sqlalchemy import text
 from typing import Optional, List
 from core.config import settings
 from core.services.embedding_service import EmbeddingService
+from core.services.embedding_set_service import set_activo
+from core.instrumentacion import instrumentar
+from core.metrics import medir_etapa, perfil_actual
+from core.services.duplicado_service import colapsar_duplicados, limite_con_duplicados
+from core.services.normativa_service import filtro_norma_sql
+
+
+def distancia_sql(dimensiones: Optional[int], alias: str = "e") -> str:
+    """
+    Distancia coseno contra el vector de la consulta. Con dimensiones
+    conocidas se castea igual que el índice HNSW parcial del set para
+    que el planner lo use.
+    """
+    if dimensiones:
+        return f"{alias}.embedding::vector({dimensiones}) <=> CAST(:query_embedding AS vector({dimensiones}))"
+    return f"{alias}.embedding <=> CAST(:query_embedding AS vector)"
+
+
+_busqueda_iterativa: Optional[bool] = None
+
+
+def _soporta_busqueda_iterativa(db: Session) -> bool:
+    """hnsw.iterative_scan existe desde pgvector 0.8"""
+    global _busqueda_iterativa
+    if _busqueda_iterativa is None:
+        version = db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+        partes = tuple(int(p) for p in (version or "0").split(".")[:2] if p.isdigit())
+        _busqueda_iterativa = partes >= (0, 8)
+    return _busqueda_iterativa
+
+
+def ajustar_ann(db: Session, filtros_sql: str):
+    """
+    Con filtros, el índice HNSW devuelve hnsw.ef_search candidatos (40 por
+    defecto) y los filtros se aplican después: uno selectivo deja menos
+    resultados que el LIMIT. Para la transacción en curso se activa el
+    escaneo iterativo (sigue recorriendo el grafo hasta llenar el LIMIT)
+    y se amplía ef_search. Sin filtros no cambia nada.
+    """
+    if not filtros_sql.strip():
+        return
+    if _soporta_busqueda_iterativa(db):
+        db.execute(text("SET LOCAL hnsw.iterative_scan = strict_order"))
+    db.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.HNSW_EF_SEARCH_FILTRADO)}"))
+
+
+def filtros_hibrida_sql(
+    params: dict,
+    etiquetas: Optional[List[str]] = None,
+    materia: Optional[str] = None,
+    fecha_desde: Optional[str] = None,
+    fecha_hasta: Optional[str] = None,
+    norma: Optional[str] = None
+) -> str:
+    """Condiciones sobre search_documents (alias d) de la búsqueda híbrida; agrega sus parámetros"""
+    sql = ""
+    if materia:
+        sql += " AND d.materia = :materia"
+        params["materia"] = materia
+    
+    if fecha_desde:
+        sql += " AND d.fecha_fallo >= :fecha_desde"
+        params["fecha_desde"] = fecha_desde
+    
+    if fecha_hasta:
+        sql += " AND d.fecha_fallo <= :fecha_hasta"
+        params["fecha_hasta"] = fecha_hasta
+    
+    if etiquetas:
+        sql += " AND d.etiquetas && CAST(:etiquetas AS varchar[])"
+        params["etiquetas"] = etiquetas
+    
+    return sql + filtro_norma_sql(norma, params)
+
+
+def _recorrer_plan(nodo: dict, nodos: List[dict]):
+    nodos.append(nodo)
+    for hijo in nodo.get("Plans", []):
+        _recorrer_plan(hijo, nodos)
+
+
+def explicar(db: Session, sql: str, params: dict) -> dict:
+    """
+    Plan elegido por PostgreSQL para la consulta de búsqueda. Con
+    DEBUG se ejecuta EXPLAIN (ANALYZE, BUFFERS): filas reales por nodo
+    y tiempos de planificación y ejecución.
+    """
+    analyze = settings.DEBUG
+    opciones = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    salida = db.execute(text(f"EXPLAIN ({opciones}) {sql}"), params).scalar()
+    salida = salida[0] if isinstance(salida, list) else salida
+    
+    nodos = []
+    _recorrer_plan(salida["Plan"], nodos)
+    escaneos = [
+        {
+            "nodo": nodo["Node Type"],
+            "relacion": nodo.get("Relation Name"),
+            "indice": nodo.get("Index Name"),
+            "filas_estimadas": nodo.get("Plan Rows"),
+            "filas_reales": nodo.get("Actual Rows"),
+        }
+        for nodo in nodos
+        if "Scan" in nodo["Node Type"]
+    ]
+    return {
+        "analyze": analyze,
+        "planning_ms": salida.get("Planning Time"),
+        "execution_ms": salida.get("Execution Time"),
+        "indices": sorted({e["indice"] for e in escaneos if e["indice"]}),
+        "escaneos": escaneos,
+        "plan": salida["Plan"],
+    }
+
+
+def ejecutar_busqueda(db: Session, sql: str, params: dict) -> List[dict]:
+    """Ejecuta la consulta midiendo SQL y serialización por separado"""
+    perfil = perfil_actual.get()
+    if perfil is not None and perfil.explain:
+        perfil.detalle["plan"] = explicar(db, sql, params)
+    
+    with medir_etapa("sql"):
+        filas = db.execute(text(sql), params).fetchall()
+    with medir_etapa("serializacion"):
+        resultados = [dict(row._mapping) for row in filas]
+    
+    if perfil is not None:
+        perfil.detalle["candidatos"] = len(resultados)
+    return resultados
 
 
 class SearchService:
@@ -15,109 +144,284 @@ class SearchService:
         self.db = db
         self.embedding_service = EmbeddingService(db)
     
-    async def buscar_semantica(
+    async def _buscar_semantica(
         self,
         query: str,
         limit: int = 10,
         materia: Optional[str] = None,
-        tipo_proceso: Optional[str] = None
+        tipo_proceso: Optional[str] = None,
+        norma: Optional[str] = None
     ):
         """
-        Búsqueda semántica usando embeddings
+        Búsqueda semántica usando embeddings (cálculo directo, sin cache)
         """
-        # Generar embedding de la consulta
-        query_embedding_vector = await self.embedding_service.generar_embedding(query)
+        # Generar embedding de la consulta con el modelo del set activo
+        modelo, dimensiones = set_activo(self.db)
+        distancia = distancia_sql(dimensiones)
+        with medir_etapa("embedding"):
+            query_embedding_vector = await self.embedding_service.generar_embedding(query, modelo)
         # Convertir a formato pgvector
         query_embedding_str = "[" + ",".join(map(str, query_embedding_vector)) + "]"
         
         # Construir query SQL con pgvector
+        # Los campos de la respuesta salen de search_documents (sin join a fallos)
         sql = """
         SELECT 
-            f.id,
-            f.caratula,
-            f.resumen_ia,
-            f.fecha_fallo,
-            f.tribunal,
-            f.materia,
-            1 - (e.embedding <=> :query_embedding::vector) as similitud
-        FROM fallos f
-        JOIN embeddings e ON f.id = e.fallo_id
+            d.fallo_id AS id,
+            d.caratula,
+            d.resumen_ia,
+            d.fecha_fallo,
+            d.tribunal,
+            d.materia,
+            d.canonico_id,
+            1 - ({distancia}) as similitud
+        FROM search_documents d
+        JOIN embeddings e ON d.fallo_id = e.fallo_id AND e.modelo = :modelo
         WHERE 1=1
-        """
-        params = {"query_embedding": query_embedding_str}
+        """.format(distancia=distancia)
+        params = {"query_embedding": query_embedding_str, "modelo": modelo}
         
+        filtros = ""
         if materia:
-            sql += " AND f.materia = :materia"
+            filtros += " AND d.materia = :materia"
             params["materia"] = materia
         
         if tipo_proceso:
-            sql += " AND f.tipo_proceso = :tipo_proceso"
+            filtros += " AND d.tipo_proceso = :tipo_proceso"
             params["tipo_proceso"] = tipo_proceso
         
-        sql += " ORDER BY e.embedding <=> :query_embedding::vector LIMIT :limit"
-        params["limit"] = limit
+        filtros += filtro_norma_sql(norma, params)
+        ajustar_ann(self.db, filtros)
+        
+        sql += filtros + f" ORDER BY {distancia} LIMIT :limit"
+        params["limit"] = limite_con_duplicados(limit)
         
-        result = self.db.execute(text(sql), params)
-        return [dict(row) for row in result]
+        return colapsar_duplicados(ejecutar_busqueda(self.db, sql, params), limit)
     
-    async def buscar_hibrida(
+    async def _buscar_hibrida(
         self,
         query: str,
         limit: int = 10,
         etiquetas: Optional[List[str]] = None,
         materia: Optional[str] = None,
         fecha_desde: Optional[str] = None,
-        fecha_hasta: Optional[str] = None
+        fecha_hasta: Optional[str] = None,
+        norma: Optional[str] = None
     ):
         """
-        Búsqueda híbrida: combina filtros SQL con similitud vectorial
+        Búsqueda híbrida: combina filtros SQL con similitud vectorial (sin cache)
         """
-        # Generar embedding de la consulta
-        query_embedding_vector = await self.embedding_service.generar_embedding(query)
+        # Generar embedding de la consulta con el modelo del set activo
+        modelo, dimensiones = set_activo(self.db)
+        distancia = distancia_sql(dimensiones)
+        with medir_etapa("embedding"):
+            query_embedding_vector = await self.embedding_service.generar_embedding(query, modelo)
         # Convertir a formato pgvector
         query_embedding_str = "[" + ",".join(map(str, query_embedding_vector)) + "]"
         
         # Construir query SQL con filtros y ordenamiento por similitud
+        # Filtros y campos de la respuesta salen de search_documents
         sql = """
-        SELECT DISTINCT
-            f.id,
-            f.caratula,
-            f.resumen_ia,
-            f.fecha_fallo,
-            f.tribunal,
-            f.materia,
-            1 - (e.embedding <=> :query_embedding::vector) as similitud
-        FROM fallos f
-        JOIN embeddings e ON f.id = e.fallo_id
+        SELECT
+            d.fallo_id AS id,
+            d.caratula,
+            d.resumen_ia,
+            d.fecha_fallo,
+            d.tribunal,
+            d.materia,
+            d.canonico_id,
+            1 - ({distancia}) as similitud
+        FROM search_documents d
+        JOIN embeddings e ON d.fallo_id = e.fallo_id AND e.modelo = :modelo
         WHERE 1=1
+        """.format(distancia=distancia)
+        params = {"query_embedding": query_embedding_str, "modelo": modelo}
+        
+        filtros = filtros_hibrida_sql(params, etiquetas, materia, fecha_desde, fecha_hasta, norma)
+        ajustar_ann(self.db, filtros)
+        
+        sql += filtros + f" ORDER BY {distancia} LIMIT :limit"
+        params["limit"] = limite_con_duplicados(limit)
+        
+        return colapsar_duplicados(ejecutar_busqueda(self.db, sql, params), limit)
+    
+    @instrumentar("busqueda", "buscar_semantica")
+    async def buscar_semantica(
+        self,
+        query: str,
+        limit: int = 10,
+        materia: Optional[str] = None,
+        tipo_proceso: Optional[str] = None,
+        norma: Optional[str] = None
+    ):
+        """
+        Búsqueda semántica usando embeddings (con cache de resultados)
         """
-        params = {"query_embedding": query_embedding_str}
+        filtros = {"materia": materia, "tipo_proceso": tipo_proceso, "norma": norma}
+        return await self._cacheada("_buscar_semantica", query, limit, filtros)
+    
+    @instrumentar("busqueda", "buscar_hibrida")
+    async def buscar_hibrida(
+        self,
+        query: str,
+        limit: int = 10,
+        etiquetas: Optional[List[str]] = None,
+        materia: Optional[str] = None,
+        fecha_desde: Optional[str] = None,
+        fecha_hasta: Optional[str] = None,
+        norma: Optional[str] = None
+    ):
+        """
+        Búsqueda híbrida: filtros SQL + similitud vectorial (con cache de resultados)
+        """
+        filtros = {
+            "etiquetas": etiquetas,
+            "materia": materia,
+            "fecha_desde": fecha_desde,
+            "fecha_hasta": fecha_hasta,
+            "norma": norma
+        }
+        return await self._cacheada("_buscar_hibrida", query, limit, filtros)
+    
+    async def _cacheada(self, metodo: str, query: Optional[str], limit: int, filtros: dict):
+        """
+        Resuelve la búsqueda desde la cache (query=None: búsquedas sin texto,
+        como los similares de un fallo). El recálculo en segundo plano
+        usa su propia sesión porque la del request ya puede estar cerrada.
+        """
+        argumentos = {"limit": limit, **filtros}
+        if query is not None:
+            argumentos["query"] = query
         
-        if materia:
-            sql += " AND f.materia = :materia"
-            params["materia"] = materia
+        perfil = perfil_actual.get()
+        if not settings.SEARCH_CACHE or (perfil is not None and perfil.explain):
+            # explain perfila el cálculo real, no un acierto de cache
+            if perfil is not None:
+                perfil.detalle["cache"] = "omitida"
+            return await getattr(self, metodo)(**argumentos)
         
-        if fecha_desde:
-            sql += " AND f.fecha_fallo >= :fecha_desde"
-            params["fecha_desde"] = fecha_desde
-        
-        if fecha_hasta:
-            sql += " AND f.fecha_fallo <= :fecha_hasta"
-            params["fecha_hasta"] = fecha_hasta
-        
-        if etiquetas:
-            sql += """
-            AND f.id IN (
-                SELECT fe.fallo_id 
-                FROM fallo_etiquetas fe
-                JOIN etiquetas et ON fe.etiqueta_id = et.id
-                WHERE et.nombre = ANY(:etiquetas)
-            )
-            """
-            params["etiquetas"] = etiquetas
+        from core.database import SessionLocal
+        from core.services.cache_busqueda_service import cache_busquedas, clave_busqueda
+        
+        async def calcular():
+            return await getattr(self, metodo)(**argumentos)
+        
+        async def recalcular():
+            db = SessionLocal()
+            try:
+                return await getattr(SearchService(db), metodo)(**argumentos)
+            finally:
+                db.close()
+        
+        clave = clave_busqueda(metodo, query or "", limit, **filtros)
+        resultados = await cache_busquedas.obtener(clave, calcular, recalcular)
+        # Copias: el re-ranking agrega campos y no debe tocar lo cacheado
+        return [dict(r) for r in resultados]
+    
+    @instrumentar("busqueda", "buscar_similares")
+    async def buscar_similares(
+        self,
+        fallo_id: int,
+        limit: int = 10,
+        etiquetas: Optional[List[str]] = None,
+        materia: Optional[str] = None,
+        fecha_desde: Optional[str] = None,
+        fecha_hasta: Optional[str] = None,
+        norma: Optional[str] = None
+    ):
+        """
+        Fallos parecidos a uno dado, con su vector guardado como consulta
+        (sin llamar al proveedor de embeddings) y los filtros de la híbrida
+        """
+        filtros = {
+            "fallo_id": fallo_id,
+            "etiquetas": etiquetas,
+            "materia": materia,
+            "fecha_desde": fecha_desde,
+            "fecha_hasta": fecha_hasta,
+            "norma": norma
+        }
+        return await self._cacheada("_buscar_similares", None, limit, filtros)
+    
+    async def _buscar_similares(self, fallo_id: int, limit: int = 10, **filtros):
+        from core.services.similares_service import SimilaresService
+        
+        return SimilaresService(self.db).buscar(fallo_id, limit, **filtros)
+    
+    @instrumentar("busqueda", "buscar_pasajes")
+    async def buscar_pasajes(
+        self,
+        query: str,
+        limit: int = 10,
+        agregacion: str = "max",
+        materia: Optional[str] = None,
+        tipo_proceso: Optional[str] = None,
+        norma: Optional[str] = None
+    ):
+        """
+        Búsqueda semántica sobre pasajes del texto completo,
+        agregados por fallo con el mejor pasaje como resaltado
+        """
+        from core.services.chunk_service import ChunkService
+        
+        return await ChunkService(self.db).buscar_pasajes(
+            query=query,
+            limit=limit,
+            agregacion=agregacion,
+            materia=materia,
+            tipo_proceso=tipo_proceso,
+            norma=norma
+        )
+    
+    def buscar_normativa(self, norma: str, limit: int = 20, offset: int = 0) -> dict:
+        """Fallos que citan una norma o artículo (exacta, sin embeddings)"""
+        from core.services.normativa_service import NormativaService
         
-        sql += " ORDER BY e.embedding <=> :query_embedding::vector LIMIT :limit"
-        params["limit"] = limit
+        with medir_etapa("sql"):
+            return NormativaService(self.db).buscar(norma, limit=limit, offset=offset)
+    
+    def candidatos(self, limit: int, rerank: bool) -> int:
+        """Resultados a pedir a la primera etapa (más si se re-rankea)"""
+        return max(limit, settings.RERANK_TOP_N) if rerank else limit
+    
+    async def reordenar(self, query: str, resultados: List[dict], limit: int):
+        """
+        Segunda etapa: re-ranking de los primeros resultados
         
-        result = self.db.execute(text(sql), params)
-        return [dict(row) for row in result]
+        Returns:
+            (resultados recortados a limit, si se aplicó el re-ranking)
+        """
+        from core.services.rerank_service import RerankService
+        
+        with medir_etapa("rerank"):
+            resultados, aplicado = await RerankService().reordenar(query, resultados)
+        return resultados[:limit], aplicado
+    
+    def facetas(
+        self,
+        materia: Optional[str] = None,
+        tipo_proceso: Optional[str] = None,
+        etiquetas: Optional[List[str]] = None,
+        fecha_desde: Optional[str] = None,
+        fecha_hasta: Optional[str] = None,
+        norma: Optional[str] = None
+    ) -> dict:
+        """
+        Conteos por materia, tribunal, tipo_proceso, etiquetas y año
+        para el conjunto de fallos que cumple los filtros (norma: solo
+        los que la citan, según fallo_normas)
+        """
+        from core.services.facetas_service import indice_facetas
+        from core.services.normativa_service import NormativaService
+        
+        with medir_etapa("facetas"):
+            fallo_ids = NormativaService(self.db).fallos_que_citan(norma) if norma else None
+            indice_facetas.refrescar(self.db)
+            return indice_facetas.facetas(
+                materia=materia,
+                tipo_proceso=tipo_proceso,
+                etiquetas=etiquetas,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                fallo_ids=fallo_ids
+            )
@@ -0,0 +1,181 @@
+"""
+Fallos similares ("más como este") a partir de los vectores guardados
+
+La consulta es el vector del propio fallo en embeddings (el del canónico si
+es una copia), así que no hay llamada al proveedor de embeddings. Un proceso
+offline (precalcular) guarda los SIMILARES_VECINOS más cercanos de cada
+fallo en fallo_vecinos: el endpoint los lee por clave primaria y solo cae a
+la búsqueda ANN en línea cuando los filtros dejan menos de `limit`.
+"""
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.instrumentacion import instrumentar
+from core.metrics import perfil_actual
+from core.services.duplicado_service import colapsar_duplicados, limite_con_duplicados
+from core.services.embedding_set_service import set_activo
+from core.services.search_service import ajustar_ann, distancia_sql, ejecutar_busqueda, filtros_hibrida_sql
+
+PRECALCULADOS = "precalculados"
+EN_LINEA = "en_linea"
+
+CAMPOS_RESULTADO = """
+    d.fallo_id AS id,
+    d.caratula,
+    d.resumen_ia,
+    d.fecha_fallo,
+    d.tribunal,
+    d.materia,
+    d.canonico_id,
+"""
+
+
+class SimilaresService:
+    """Vecinos más cercanos de un fallo: precalculados o por ANN en línea"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def vector_de_fallo(self, fallo_id: int, modelo: str) -> Optional[Tuple[int, str]]:
+        """(fallo del que sale el vector, vector) del fallo o de su canónico"""
+        fila = self.db.execute(text("""
+            SELECT e.fallo_id, e.embedding
+            FROM fallos f
+            JOIN embeddings e ON e.fallo_id = COALESCE(f.canonico_id, f.id) AND e.modelo = :modelo
+            WHERE f.id = :fallo_id
+        """), {"fallo_id": fallo_id, "modelo": modelo}).first()
+        return (fila.fallo_id, fila.embedding) if fila else None
+
+    def _en_linea(self, fuente_id: int, vector: str, modelo: str, dimensiones: Optional[int],
+                  limit: int, **filtros) -> List[dict]:
+        distancia = distancia_sql(dimensiones)
+        sql = f"""
+        SELECT {CAMPOS_RESULTADO}
+            1 - ({distancia}) AS similitud
+        FROM search_documents d
+        JOIN embeddings e ON d.fallo_id = e.fallo_id AND e.modelo = :modelo
+        WHERE COALESCE(d.canonico_id, d.fallo_id) <> :fuente_id
+        """
+        params = {"query_embedding": vector, "modelo": modelo, "fuente_id": fuente_id}
+        filtros_sql = filtros_hibrida_sql(params, **filtros)
+        ajustar_ann(self.db, filtros_sql)
+        sql += filtros_sql + f" ORDER BY {distancia} LIMIT :limit"
+        params["limit"] = limite_con_duplicados(limit)
+        return colapsar_duplicados(ejecutar_busqueda(self.db, sql, params), limit)
+
+    def _precalculados(self, fuente_id: int, modelo: str, limit: int, **filtros) -> List[dict]:
+        sql = f"""
+        SELECT {CAMPOS_RESULTADO}
+            v.similitud
+        FROM fallo_vecinos v
+        JOIN search_documents d ON d.fallo_id = v.vecino_id
+        WHERE v.modelo = :modelo AND v.fallo_id = :fuente_id
+          AND COALESCE(d.canonico_id, d.fallo_id) <> :fuente_id
+        """
+        params = {"modelo": modelo, "fuente_id": fuente_id}
+        sql += filtros_hibrida_sql(params, **filtros)
+        sql += " ORDER BY v.orden LIMIT :limit"
+        params["limit"] = limite_con_duplicados(limit)
+        return colapsar_duplicados(ejecutar_busqueda(self.db, sql, params), limit)
+
+    def buscar(self, fallo_id: int, limit: int = 10, **filtros) -> List[dict]:
+        """
+        Similares de un fallo, sin el fallo ni sus copias. Filtros: los de
+        la búsqueda híbrida (etiquetas, materia, fecha_desde, fecha_hasta, norma).
+        """
+        modelo, dimensiones = set_activo(self.db)
+        vector = self.vector_de_fallo(fallo_id, modelo)
+        if vector is None:
+            raise ValueError(f"El fallo {fallo_id} no tiene embedding en el set activo")
+        fuente_id, vector = vector
+
+        perfil = perfil_actual.get()
+        resultados = self._precalculados(fuente_id, modelo, limit, **filtros)
+        fuente = PRECALCULADOS
+        if len(resultados) < limit:
+            resultados = self._en_linea(fuente_id, vector, modelo, dimensiones, limit, **filtros)
+            fuente = EN_LINEA
+        if perfil is not None:
+            perfil.detalle["similares"] = fuente
+        return resultados
+
+    @instrumentar("similares", "precalcular")
+    def precalcular(self, vecinos: Optional[int] = None, lote: int = 200) -> dict:
+        """
+        Recalcula la lista de vecinos de cada fallo canónico con embedding
+        en el set activo (una consulta ANN por fallo, escritura por lote)
+        """
+        vecinos = vecinos or settings.SIMILARES_VECINOS
+        modelo, dimensiones = set_activo(self.db)
+        distancia = distancia_sql(dimensiones)
+        sql_vecinos = text(f"""
+            SELECT e.fallo_id AS vecino_id, 1 - ({distancia}) AS similitud
+            FROM embeddings e
+            JOIN search_documents d ON d.fallo_id = e.fallo_id
+            WHERE e.modelo = :modelo AND e.fallo_id <> :fallo_id AND d.canonico_id IS NULL
+            ORDER BY {distancia}
+            LIMIT :vecinos
+        """)
+
+        ultimo_id, fallos, filas_escritas = 0, 0, 0
+        inicio = time.perf_counter()
+        while True:
+            fuentes = self.db.execute(text("""
+                SELECT e.fallo_id, e.embedding
+                FROM embeddings e
+                JOIN fallos f ON f.id = e.fallo_id
+                WHERE e.modelo = :modelo AND e.fallo_id > :ultimo_id AND f.canonico_id IS NULL
+                ORDER BY e.fallo_id
+                LIMIT :lote
+            """), {"modelo": modelo, "ultimo_id": ultimo_id, "lote": lote}).all()
+            if not fuentes:
+                break
+            ultimo_id = fuentes[-1].fallo_id
+
+            filas = []
+            for fuente in fuentes:
+                cercanos = self.db.execute(sql_vecinos, {
+                    "query_embedding": fuente.embedding,
+                    "modelo": modelo,
+                    "fallo_id": fuente.fallo_id,
+                    "vecinos": vecinos,
+                }).all()
+                filas.extend(
+                    {"modelo": modelo, "fallo_id": fuente.fallo_id, "orden": orden,
+                     "vecino_id": cercano.vecino_id, "similitud": cercano.similitud}
+                    for orden, cercano in enumerate(cercanos)
+                )
+
+            self.db.execute(
+                text("DELETE FROM fallo_vecinos WHERE modelo = :modelo AND fallo_id = ANY(:ids)"),
+                {"modelo": modelo, "ids": [fuente.fallo_id for fuente in fuentes]}
+            )
+            if filas:
+                self.db.execute(text("""
+                    INSERT INTO fallo_vecinos (modelo, fallo_id, orden, vecino_id, similitud)
+                    VALUES (:modelo, :fallo_id, :orden, :vecino_id, :similitud)
+                """), filas)
+            self.db.commit()
+            fallos += len(fuentes)
+            filas_escritas += len(filas)
+
+        # Listas de otros modelos o de fallos que ya no son canónicos
+        self.db.execute(text("""
+            DELETE FROM fallo_vecinos v
+            WHERE v.modelo <> :modelo
+               OR EXISTS (SELECT 1 FROM fallos f WHERE f.id = v.fallo_id AND f.canonico_id IS NOT NULL)
+        """), {"modelo": modelo})
+        self.db.commit()
+
+        segundos = time.perf_counter() - inicio
+        return {
+            "modelo": modelo,
+            "fallos": fallos,
+            "vecinos": filas_escritas,
+            "fallos_por_segundo": round(fallos / segundos, 1) if segundos else None,
+            "segundos": round(segundos, 2),
+        }
@@ -0,0 +1,71 @@
+"""
+Servicios de IA determinísticos y sin red (ejecución offline y benchmarks)
+"""
+import hashlib
+import math
+import random
+import re
+
+from core.services.embedding_providers import ProveedorEmbeddings
+
+DIMENSIONES_EMBEDDING = 1536
+
+# Palabras que delatan la materia del fallo
+MATERIAS = {
+    "LABORAL": ["despido", "trabajador", "empleador", "indemnización", "ley 20.744", "ley 20744"],
+    "PENAL": ["imputado", "homicidio", "robo", "condena", "fiscal"],
+    "FAMILIA": ["alimentos", "divorcio", "régimen de visitas", "menor"],
+    "CONTENCIOSO": ["amparo", "estado provincial", "municipalidad", "administración pública"],
+}
+
+RESULTADOS = {
+    "Se hizo lugar": ["hacer lugar", "hace lugar", "hágase lugar"],
+    "Se rechazó": ["rechazar", "rechaza", "no hacer lugar"],
+    "Se confirmó": ["confirmar", "confirma"],
+    "Se revocó": ["revocar", "revoca"],
+}
+
+
+def vector_determinista(texto: str, dimensiones: int = DIMENSIONES_EMBEDDING) -> list:
+    """Vector unitario pseudoaleatorio derivado del hash del texto"""
+    semilla = int.from_bytes(hashlib.sha256(texto.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(semilla)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensiones)]
+    norma = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norma for v in vector]
+
+
+def _detectar(texto: str, opciones: dict, defecto: str) -> str:
+    texto = texto.lower()
+    conteos = {clave: sum(texto.count(p) for p in palabras) for clave, palabras in opciones.items()}
+    mejor = max(conteos, key=conteos.get)
+    return mejor if conteos[mejor] else defecto
+
+
+class StubIAService:
+    """Reemplazo offline de IAService: responde con el mismo formato JSON"""
+
+    async def etiquetar_fallo(self, texto_fallo: str, candidatas: list = None) -> dict:
+        palabras = texto_fallo.split()
+        normas = sorted(set(re.findall(r"[Ll]ey\s+N?°?\s*[\d.]+", texto_fallo)))
+
+        return {
+            "resumen": " ".join(palabras[:150]),
+            "palabras_clave": [],
+            "materia": _detectar(texto_fallo, MATERIAS, "CIVIL"),
+            "tipo_proceso": None,
+            "subtemas": [],
+            "resultado": _detectar(texto_fallo, RESULTADOS, None),
+            "actor": None,
+            "demandado": None,
+            "normas_citadas": normas,
+        }
+
+
+class StubProveedorEmbeddings(ProveedorEmbeddings):
+    """Proveedor de embeddings que no usa red ni modelos"""
+
+    nombre = "stub"
+
+    async def embeber(self, textos: list) -> list:
+        return [vector_determinista(texto) for texto in textos]
@@ -0,0 +1,16 @@
+-- Los modelos declaran embedding como texto (pgvector lo maneja como vector):
+-- en una base creada con create_all la columna queda varchar y hay que
+-- convertirla para que funcionen los operadores de distancia.
+DO $$
+DECLARE
+    tabla TEXT;
+BEGIN
+    FOREACH tabla IN ARRAY ARRAY['embeddings', 'fallo_chunks'] LOOP
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = tabla AND column_name = 'embedding' AND udt_name <> 'vector'
+        ) THEN
+            EXECUTE format('ALTER TABLE %I ALTER COLUMN embedding TYPE vector USING embedding::vector', tabla);
+        END IF;
+    END LOOP;
+END $$;
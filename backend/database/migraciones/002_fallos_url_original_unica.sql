@@ -0,0 +1,27 @@
+-- Ingesta incremental y carga masiva: hash del contenido y url_original única
+-- (INSERT ... ON CONFLICT (url_original) necesita la restricción en la base).
+
+ALTER TABLE fallos ADD COLUMN IF NOT EXISTS hash_contenido VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_fallos_expediente ON fallos (expediente);
+
+-- De cada grupo de fallos con la misma url_original queda el primero que se
+-- ingresó; las copias se borran junto con lo que cuelga de ellas.
+CREATE TEMP TABLE fallos_repetidos ON COMMIT DROP AS
+SELECT id
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY url_original ORDER BY id) AS orden
+    FROM fallos
+    WHERE url_original IS NOT NULL
+) numerados
+WHERE orden > 1;
+
+DELETE FROM fallo_etiquetas WHERE fallo_id IN (SELECT id FROM fallos_repetidos);
+DELETE FROM embeddings WHERE fallo_id IN (SELECT id FROM fallos_repetidos);
+DELETE FROM fallos WHERE id IN (SELECT id FROM fallos_repetidos);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'fallos_url_original_key') THEN
+        ALTER TABLE fallos ADD CONSTRAINT fallos_url_original_key UNIQUE (url_original);
+    END IF;
+END $$;
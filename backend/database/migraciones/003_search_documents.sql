@@ -0,0 +1,22 @@
+-- Documento de búsqueda materializado por fallo y hash del documento embebido.
+-- La tabla se crea vacía: database/migrar.py la completa al terminar.
+
+CREATE TABLE IF NOT EXISTS search_documents (
+    fallo_id INTEGER PRIMARY KEY REFERENCES fallos (id) ON DELETE CASCADE,
+    texto TEXT NOT NULL,
+    hash VARCHAR(64) NOT NULL,
+    caratula TEXT NOT NULL,
+    resumen_ia TEXT,
+    fecha_fallo DATE,
+    tribunal VARCHAR(255),
+    materia VARCHAR(100),
+    tipo_proceso VARCHAR(100),
+    etiquetas VARCHAR(100)[] DEFAULT '{}',
+    actualizado_en TIMESTAMP DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_search_documents_materia ON search_documents (materia);
+CREATE INDEX IF NOT EXISTS ix_search_documents_tipo_proceso ON search_documents (tipo_proceso);
+CREATE INDEX IF NOT EXISTS ix_search_documents_etiquetas ON search_documents USING gin (etiquetas);
+
+-- Embeddings previos quedan con hash NULL: se re-embeben una vez con el documento actual
+ALTER TABLE embeddings ADD COLUMN IF NOT EXISTS hash_documento VARCHAR(64);
@@ -0,0 +1,40 @@
+-- Sets de embeddings versionados: un vector por (fallo, modelo).
+-- Los índices HNSW parciales de cada modelo los crea database/migrar.py al
+-- terminar (CREATE INDEX CONCURRENTLY no puede correr dentro de esta transacción).
+
+CREATE TABLE IF NOT EXISTS embedding_sets (
+    modelo VARCHAR(50) PRIMARY KEY,
+    dimensiones INTEGER NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'construyendo',
+    creado_en TIMESTAMP DEFAULT now(),
+    activado_en TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_embedding_sets_activo ON embedding_sets (estado) WHERE estado = 'activo';
+
+-- La clave primaria pasa de fallo_id a (fallo_id, modelo)
+UPDATE embeddings SET modelo = 'text-embedding-3-small' WHERE modelo IS NULL;
+ALTER TABLE embeddings ALTER COLUMN modelo SET NOT NULL;
+DO $$
+BEGIN
+    IF (
+        SELECT array_agg(a.attname::text ORDER BY a.attname)
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+        WHERE c.conrelid = 'embeddings'::regclass AND c.contype = 'p'
+    ) IS DISTINCT FROM ARRAY['fallo_id', 'modelo'] THEN
+        ALTER TABLE embeddings DROP CONSTRAINT IF EXISTS embeddings_pkey;
+        ALTER TABLE embeddings ADD CONSTRAINT embeddings_pkey PRIMARY KEY (fallo_id, modelo);
+    END IF;
+END $$;
+
+-- Los vectores existentes pasan a ser un set; el modelo con más vectores
+-- queda activo si todavía no hay ninguno
+INSERT INTO embedding_sets (modelo, dimensiones, estado)
+SELECT modelo, max(vector_dims(embedding::vector)), 'retirado'
+FROM embeddings
+GROUP BY modelo
+ON CONFLICT (modelo) DO NOTHING;
+
+UPDATE embedding_sets SET estado = 'activo', activado_en = now()
+WHERE NOT EXISTS (SELECT 1 FROM embedding_sets WHERE estado = 'activo')
+  AND modelo = (SELECT modelo FROM embeddings GROUP BY modelo ORDER BY count(*) DESC LIMIT 1);
@@ -0,0 +1,11 @@
+-- Índice de normas citadas por fallo. Se crea vacío: se completa con
+-- `python ingesta.py --indexar-normas` (la ingesta indexa los fallos nuevos).
+
+CREATE TABLE IF NOT EXISTS fallo_normas (
+    fallo_id INTEGER NOT NULL REFERENCES fallos (id) ON DELETE CASCADE,
+    norma VARCHAR(60) NOT NULL,
+    articulo VARCHAR(20) NOT NULL DEFAULT '',
+    menciones INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (fallo_id, norma, articulo)
+);
+CREATE INDEX IF NOT EXISTS ix_fallo_normas_norma_articulo ON fallo_normas (norma, articulo, fallo_id);
@@ -0,0 +1,33 @@
+-- Detección de casi duplicados: vínculo de cada copia con su fallo canónico,
+-- firmas MinHash y bandas LSH. Los fallos existentes quedan como canónicos
+-- hasta correr `python ingesta.py --deduplicar`.
+
+ALTER TABLE fallos ADD COLUMN IF NOT EXISTS canonico_id INTEGER;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'fallos_canonico_id_fkey') THEN
+        ALTER TABLE fallos ADD CONSTRAINT fallos_canonico_id_fkey
+            FOREIGN KEY (canonico_id) REFERENCES fallos (id) ON DELETE SET NULL;
+    END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS ix_fallos_canonico_id ON fallos (canonico_id);
+
+CREATE TABLE IF NOT EXISTS fallo_firmas (
+    fallo_id INTEGER PRIMARY KEY REFERENCES fallos (id) ON DELETE CASCADE,
+    firma BIGINT[] NOT NULL,
+    actualizado_en TIMESTAMP DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS fallo_lsh (
+    banda SMALLINT NOT NULL,
+    clave BIGINT NOT NULL,
+    fallo_id INTEGER NOT NULL REFERENCES fallos (id) ON DELETE CASCADE,
+    PRIMARY KEY (banda, clave, fallo_id)
+);
+CREATE INDEX IF NOT EXISTS ix_fallo_lsh_fallo_id ON fallo_lsh (fallo_id);
+
+-- Copia de fallos.canonico_id para colapsar duplicados en las búsquedas
+ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS canonico_id INTEGER;
+UPDATE search_documents d SET canonico_id = f.canonico_id
+FROM fallos f
+WHERE f.id = d.fallo_id AND d.canonico_id IS DISTINCT FROM f.canonico_id;
@@ -0,0 +1,14 @@
+-- Fallos similares precalculados por set de embeddings. Se crea vacía: la
+-- completa `python ingesta.py --precalcular-similares` (mientras tanto el
+-- endpoint de similares busca en línea).
+
+CREATE TABLE IF NOT EXISTS fallo_vecinos (
+    modelo VARCHAR(50) NOT NULL,
+    fallo_id INTEGER NOT NULL REFERENCES fallos (id) ON DELETE CASCADE,
+    orden SMALLINT NOT NULL,
+    vecino_id INTEGER NOT NULL REFERENCES fallos (id) ON DELETE CASCADE,
+    similitud DOUBLE PRECISION NOT NULL,
+    calculado_en TIMESTAMP DEFAULT now(),
+    PRIMARY KEY (modelo, fallo_id, orden)
+);
+CREATE INDEX IF NOT EXISTS ix_fallo_vecinos_vecino_id ON fallo_vecinos (vecino_id);
@@ -0,0 +1,126 @@
+"""
+Aplica el esquema y las migraciones SQL pendientes
+
+Primero crea las tablas que todavía no existen a partir de los modelos
+(create_all no modifica tablas existentes). Después corre, en orden y una
+sola vez, los archivos de database/migraciones/: llevan una base creada con
+una versión anterior al esquema actual (columnas, restricciones, claves
+primarias e índices nuevos). Cada archivo corre en su propia transacción y
+queda registrado en schema_migraciones; en una base nueva no cambian nada.
+
+Al final crea los índices HNSW parciales de cada set de embeddings que
+falten (CONCURRENTLY, fuera de transacción) y materializa search_documents
+de los fallos que no lo tienen: las búsquedas leen solo de esa tabla, y una
+base anterior quedaría sin resultados hasta correr ingesta.py --refrescar-documentos.
+
+Uso (desde backend/):
+    python -m database.migrar
+    python -m database.migrar --listar    # solo muestra las pendientes
+"""
+import argparse
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import text
+
+CARPETA = Path(__file__).parent / "migraciones"
+LOTE_DOCUMENTOS = 5000
+
+
+def _archivos() -> List[Path]:
+    return sorted(CARPETA.glob("*.sql"))
+
+
+def pendientes(conn) -> List[Path]:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            nombre TEXT PRIMARY KEY,
+            aplicada_en TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+    aplicadas = {fila[0] for fila in conn.execute(text("SELECT nombre FROM schema_migraciones"))}
+    return [archivo for archivo in _archivos() if archivo.name not in aplicadas]
+
+
+def crear_indices_vectoriales() -> int:
+    """Índices HNSW parciales (documentos y pasajes) de cada set registrado. Devuelve cuántos sets."""
+    from core.database import SessionLocal
+    from core.models import EmbeddingSet
+    from core.services.chunk_service import ChunkService
+    from core.services.embedding_set_service import EmbeddingSetService
+
+    db = SessionLocal()
+    try:
+        sets = db.query(EmbeddingSet.modelo, EmbeddingSet.dimensiones).all()
+        for modelo, dimensiones in sets:
+            EmbeddingSetService(db).crear_indice(modelo, dimensiones)
+            ChunkService(db).crear_indice(modelo, dimensiones)
+        return len(sets)
+    finally:
+        db.close()
+
+
+def materializar_documentos() -> int:
+    """Crea el documento de búsqueda de los fallos que no lo tienen, por lotes. Devuelve cuántos."""
+    from core.database import SessionLocal
+    from core.services.documento_service import DocumentoService
+
+    db = SessionLocal()
+    try:
+        ultimo_id, total = 0, 0
+        while True:
+            ids = db.execute(text("""
+                SELECT f.id FROM fallos f
+                WHERE f.id > :ultimo_id
+                  AND NOT EXISTS (SELECT 1 FROM search_documents d WHERE d.fallo_id = f.id)
+                ORDER BY f.id
+                LIMIT :lote
+            """), {"ultimo_id": ultimo_id, "lote": LOTE_DOCUMENTOS}).scalars().all()
+            if not ids:
+                return total
+            DocumentoService(db).refrescar(ids)
+            ultimo_id, total = ids[-1], total + len(ids)
+    finally:
+        db.close()
+
+
+def migrar(listar: bool = False) -> List[str]:
+    """Crea las tablas nuevas y aplica las migraciones pendientes. Devuelve sus nombres."""
+    from core import models  # noqa: F401 (registra las tablas)
+    from core.database import Base, engine
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        por_aplicar = pendientes(conn)
+    if listar:
+        return [archivo.name for archivo in por_aplicar]
+
+    Base.metadata.create_all(engine)
+    for archivo in por_aplicar:
+        with engine.begin() as conn:
+            # Cursor del driver sin parámetros: el SQL puede tener varias sentencias y '%'
+            conn.connection.cursor().execute(archivo.read_text(encoding="utf-8"))
+            conn.execute(text("INSERT INTO schema_migraciones (nombre) VALUES (:nombre)"), {"nombre": archivo.name})
+        print(f"Migración aplicada: {archivo.name}")
+
+    crear_indices_vectoriales()
+    documentos = materializar_documentos()
+    if documentos:
+        print(f"Documentos de búsqueda materializados: {documentos}")
+    return [archivo.name for archivo in por_aplicar]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de JurisAR")
+    parser.add_argument("--listar", action="store_true", help="Solo lista las migraciones pendientes")
+    args = parser.parse_args()
+
+    nombres = migrar(listar=args.listar)
+    if not nombres:
+        print("El esquema está al día")
+    elif args.listar:
+        print("\n".join(nombres))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Ejecuta el pipeline de ingesta: scrape → extract → tag → embed
+
+Uso:
+    python ingesta.py --max-pages 5
+    python ingesta.py --solo-pendientes          # retoma lo que quedó a medias
+    python ingesta.py --refrescar-documentos     # solo rematerializa search_documents
+    python ingesta.py --indexar-pasajes          # embebe pasajes de fallos que no los tienen
+    python ingesta.py --pre-etiquetar            # etiquetado local (sin IA) de todo el corpus
+    python ingesta.py --indexar-normas           # extrae las citas de normas (tabla fallo_normas)
+    python ingesta.py --deduplicar               # firma MinHash y vincula fallos casi duplicados
+    python ingesta.py --precalcular-similares    # vecinos más cercanos de cada fallo (fallo_vecinos)
+    IA_PROVIDER=stub EMBEDDING_PROVIDER=stub python ingesta.py   # offline
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from core.services.pipeline_service import PipelineIngesta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline de ingesta de JurisAR")
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--engine", choices=["http", "playwright"], default=None)
+    parser.add_argument("--completo", action="store_true", help="Desactiva el modo incremental")
+    parser.add_argument("--solo-pendientes", action="store_true", help="No scrapea, solo retoma pendientes")
+    parser.add_argument(
+        "--refrescar-documentos",
+        action="store_true",
+        help="Solo rematerializa search_documents de los fallos modificados"
+    )
+    parser.add_argument(
+        "--indexar-pasajes",
+        action="store_true",
+        help="Solo parte y embebe los pasajes de los fallos que todavía no los tienen"
+    )
+    parser.add_argument(
+        "--pre-etiquetar",
+        action="store_true",
+        help="Solo etiqueta localmente (autómata del tesauro, sin IA) los fallos con texto"
+    )
+    parser.add_argument(
+        "--indexar-normas",
+        action="store_true",
+        help="Solo extrae las citas de leyes y artículos de los fallos con texto"
+    )
+    parser.add_argument(
+        "--deduplicar",
+        action="store_true",
+        help="Solo firma los fallos con texto y vincula las copias con su canónico"
+    )
+    parser.add_argument(
+        "--precalcular-similares",
+        action="store_true",
+        help="Solo recalcula los fallos similares de cada fallo en el set de embeddings activo"
+    )
+    args = parser.parse_args()
+
+    if args.precalcular_similares:
+        from core.database import SessionLocal
+        from core.services.similares_service import SimilaresService
+
+        db = SessionLocal()
+        try:
+            estadisticas = SimilaresService(db).precalcular()
+        finally:
+            db.close()
+        print(json.dumps(estadisticas, indent=2))
+        return
+
+    if args.deduplicar:
+        from core.database import SessionLocal
+        from core.services.duplicado_service import DuplicadoService
+
+        db = SessionLocal()
+        try:
+            estadisticas = DuplicadoService(db).deduplicar_corpus()
+        finally:
+            db.close()
+        print(json.dumps(estadisticas, indent=2))
+        return
+
+    if args.indexar_normas:
+        from core.database import SessionLocal
+        from core.services.normativa_service import NormativaService
+
+        db = SessionLocal()
+        try:
+            estadisticas = NormativaService(db).indexar_corpus()
+        finally:
+            db.close()
+        print(json.dumps(estadisticas, indent=2))
+        return
+
+    if args.pre_etiquetar:
+        from core.database import SessionLocal
+        from core.services.etiquetador_service import EtiquetadorService
+
+        db = SessionLocal()
+        try:
+            estadisticas = EtiquetadorService(db).pre_etiquetar()
+        finally:
+            db.close()
+        print(json.dumps(estadisticas, indent=2))
+        return
+
+    if args.indexar_pasajes:
+        from core.database import SessionLocal
+        from core.services.chunk_service import ChunkService
+        from core.services.embedding_set_service import set_activo
+
+        db = SessionLocal()
+        try:
+            chunk_service = ChunkService(db)
+            modelo, _ = set_activo(db)
+            pasajes = 0
+            while fallo_ids := chunk_service.pendientes(modelo, 100):
+                for fallo_id in fallo_ids:
+                    pasajes += asyncio.run(chunk_service.indexar_fallo(fallo_id, [modelo]))
+        finally:
+            db.close()
+        print(f"Pasajes embebidos: {pasajes}")
+        return
+
+    if args.refrescar_documentos:
+        from core.database import SessionLocal
+        from core.services.documento_service import DocumentoService
+
+        db = SessionLocal()
+        try:
+            cambiados = DocumentoService(db).refrescar()
+        finally:
+            db.close()
+        print(f"Documentos con cambios (requieren re-embedding): {len(cambiados)}")
+        return
+
+    pipeline = PipelineIngesta()
+    inicio = time.time()
+    estadisticas = asyncio.run(pipeline.ejecutar(
+        max_pages=args.max_pages,
+        engine=args.engine,
+        incremental=False if args.completo else None,
+        scrapear=not args.solo_pendientes
+    ))
+
+    print(json.dumps(estadisticas, indent=2))
+    print(f"Tiempo: {time.time() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
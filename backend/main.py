@@ -2,12 +2,16 @@
 JurisAR - Backend API
 Motor de Inteligencia Jurídica y Búsqueda Semántica
 """
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from api.routes import search, fallos, etiquetas, embeddings
 from core.config import settings
+from core.database import engine
+from core.instrumentacion import MiddlewareMetricas, registrar_pool
 
 app = FastAPI(
     title="JurisAR API",
@@ -24,6 +28,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas por ruta (GET /metrics) y estado del pool de conexiones
+app.add_middleware(MiddlewareMetricas)
+registrar_pool(engine)
+
 # Incluir routers
 app.include_router(search.router, prefix="/api/v1/search", tags=["Búsqueda"])
 app.include_router(fallos.router, prefix="/api/v1/fallos", tags=["Fallos"])
@@ -31,6 +39,62 @@ app.include_router(etiquetas.router, prefix="/api/v1/etiquetas", tags=["Etiqueta
 app.include_router(embeddings.router, prefix="/api/v1/embeddings", tags=["Embeddings"])
 
 
+def _calentar_embeddings():
+    from core.database import SessionLocal
+    from core.services.embedding_providers import modelo_por_defecto, obtener_proveedor
+    from core.services.embedding_set_service import set_activo
+
+    try:
+        db = SessionLocal()
+        try:
+            modelo, _ = set_activo(db)
+        finally:
+            db.close()
+    except Exception as e:
+        # Sin base se calienta el modelo por defecto; el set activo se lee en la primera búsqueda
+        print(f"Precalentamiento sin set activo ({e}); se usa el modelo por defecto")
+        modelo = modelo_por_defecto()
+
+    try:
+        obtener_proveedor(modelo).calentar()
+    except Exception as e:
+        print(f"No se pudo precalentar el modelo de embeddings {modelo}: {e}")
+
+
+@app.on_event("startup")
+def calentar_embeddings():
+    """
+    Carga el modelo de embeddings del set activo antes de recibir tráfico
+    (con el proveedor local evita que la primera búsqueda pague la carga).
+    Corre en segundo plano y no es obligatorio: la API arranca aunque la
+    base o el proveedor no respondan.
+    """
+    if not settings.EMBEDDING_WARMUP:
+        return
+    threading.Thread(target=_calentar_embeddings, name="calentar-embeddings", daemon=True).start()
+
+
+def _calentar_reranker():
+    from core.services.rerank_service import obtener_reranker
+
+    try:
+        obtener_reranker().calentar()
+    except Exception as e:
+        print(f"No se pudo precalentar el re-ranker: {e}")
+
+
+@app.on_event("startup")
+def calentar_reranker():
+    """
+    Carga el re-ranker antes de recibir tráfico: la primera búsqueda con
+    rerank no paga la carga del cross-encoder ni se pasa del presupuesto.
+    En segundo plano y sin bloquear el arranque, como los embeddings.
+    """
+    if not settings.RERANK_WARMUP:
+        return
+    threading.Thread(target=_calentar_reranker, name="calentar-reranker", daemon=True).start()
+
+
 @app.get("/")
 async def root():
     """Endpoint raíz"""
@@ -41,6 +105,14 @@ async def root():
     })
 
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas del proceso en formato texto de Prometheus"""
+    from core.metrics import registro
+
+    return PlainTextResponse(registro.exponer(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
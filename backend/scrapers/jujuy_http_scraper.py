@@ -0,0 +1,199 @@
+"""
+Scraper HTTP para jurisprudencia de Jujuy (sin navegador)
+
+Descarga el HTML del buscador con un cliente async con pool de conexiones
+y lo parsea directamente. Playwright queda solo como fallback para las
+páginas que no traen los resultados en el HTML (requieren JS).
+"""
+import asyncio
+from typing import List, Dict, Optional, Callable, AsyncIterator
+from urllib.parse import urljoin
+
+import httpx
+from bs4 import BeautifulSoup
+
+from core.config import settings
+from core.instrumentacion import SCRAPER_ITEMS, instrumentar
+
+BASE_URL = settings.SCRAPER_JUJUY_URL
+
+# Contenedor del listado: presente aunque la página no tenga resultados
+CONTENEDOR_LISTADO = "#resultados, .resultados, .sin-resultados"
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+
+def _texto(elem) -> Optional[str]:
+    """Texto visible de un elemento (equivalente a inner_text)"""
+    if elem is None:
+        return None
+    return elem.get_text("\n", strip=True)
+
+
+def parsear_listado(html: str, base_url: str = BASE_URL) -> Optional[List[Dict]]:
+    """
+    Parsea una página del listado del buscador.
+
+    Returns:
+        Lista de fallos (sin texto completo), [] si el listado está vacío
+        (página posterior a la última) o None si la página no contiene
+        el listado en el HTML (requiere JS).
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    items = soup.select(".resultado-fallo")
+    if not items:
+        return [] if soup.select_one(CONTENEDOR_LISTADO) else None
+
+    fallos = []
+    for item in items:
+        caratula_elem = item.select_one(".caratula")
+        link_elem = item.select_one("a")
+
+        if not caratula_elem or not link_elem:
+            continue
+
+        href = link_elem.get("href")
+        fallos.append({
+            'caratula': _texto(caratula_elem),
+            'fecha': _texto(item.select_one(".fecha")),
+            'tribunal': _texto(item.select_one(".tribunal")),
+            'url': urljoin(base_url, href) if href else None
+        })
+
+    return fallos
+
+
+def parsear_detalle(html: str) -> Optional[str]:
+    """Extrae el texto completo del detalle de un fallo"""
+    soup = BeautifulSoup(html, HTML_PARSER)
+    return _texto(soup.select_one(".texto-fallo"))
+
+
+class JujuyHttpScraper:
+    """Scraper del buscador de Jujuy basado en httpx"""
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        concurrencia: Optional[int] = None,
+        usar_fallback: bool = True
+    ):
+        self.base_url = base_url
+        self.concurrencia = concurrencia or settings.SCRAPER_CONCURRENCIA
+        self.usar_fallback = usar_fallback
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self.paginas_descargadas = 0
+        self.paginas_fallback = 0
+
+    def _crear_cliente(self) -> httpx.AsyncClient:
+        limites = httpx.Limits(
+            max_connections=self.concurrencia,
+            max_keepalive_connections=self.concurrencia
+        )
+        return httpx.AsyncClient(
+            limits=limites,
+            timeout=settings.SCRAPER_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            headers={"User-Agent": "JurisAR/1.0 (+scraper)"}
+        )
+
+    async def _get(self, client: httpx.AsyncClient, url: str) -> str:
+        async with self._semaforo:
+            response = await client.get(url)
+            response.raise_for_status()
+            self.paginas_descargadas += 1
+            return response.text
+
+    @instrumentar("scraper", "obtener_listado")
+    async def obtener_listado(self, client: httpx.AsyncClient, index: int) -> List[Dict]:
+        """Descarga y parsea una página del listado"""
+        url = f"{self.base_url}?index={index}"
+        fallos = parsear_listado(await self._get(client, url), self.base_url)
+
+        if fallos is None:
+            if not self.usar_fallback:
+                raise ValueError(f"Sin resultados en el HTML de {url}")
+            # La página requiere JS: se resuelve completa con Playwright
+            from scrapers.jujuy_scraper import scrape_pagina_playwright
+            self.paginas_fallback += 1
+            fallos = await asyncio.to_thread(scrape_pagina_playwright, url)
+
+        SCRAPER_ITEMS.inc(tipo="pagina")
+        SCRAPER_ITEMS.inc(len(fallos), tipo="fallo_listado")
+        return fallos
+
+    @instrumentar("scraper", "obtener_detalle")
+    async def obtener_detalle(self, client: httpx.AsyncClient, fallo: Dict) -> Dict:
+        """Completa el texto de un fallo desde su página de detalle"""
+        if not fallo.get('url') or fallo.get('texto_completo'):
+            return fallo
+
+        try:
+            texto = parsear_detalle(await self._get(client, fallo['url']))
+
+            if texto is None and self.usar_fallback:
+                from scrapers.jujuy_scraper import obtener_texto_playwright
+                self.paginas_fallback += 1
+                texto = await asyncio.to_thread(obtener_texto_playwright, fallo['url'])
+
+            if texto:
+                fallo['texto_completo'] = texto
+                SCRAPER_ITEMS.inc(tipo="fallo_detalle")
+
+        except Exception as e:
+            print(f"Error procesando fallo: {e}")
+
+        return fallo
+
+    async def iterar_paginas(
+        self,
+        max_pages: Optional[int] = None,
+        es_conocido: Optional[Callable[[Dict], bool]] = None
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Recorre el listado página por página y descarga los detalles
+        de cada página en paralelo. Entrega los fallos de cada página
+        apenas están completos (lo consume el pipeline de ingesta).
+
+        Con es_conocido (modo incremental) se omiten los fallos ya conocidos
+        y se deja de paginar al llegar a territorio conocido.
+        """
+        max_pages = max_pages or settings.SCRAPER_MAX_PAGES
+
+        async with self._crear_cliente() as client:
+            for i in range(max_pages):
+                try:
+                    items = await self.obtener_listado(client, i)
+                except Exception as e:
+                    print(f"Error en página {i}: {e}")
+                    break
+
+                if not items:
+                    break
+
+                nuevos = [item for item in items if not (es_conocido and es_conocido(item))]
+
+                yield list(await asyncio.gather(
+                    *(self.obtener_detalle(client, item) for item in nuevos)
+                ))
+
+                if len(nuevos) < len(items):
+                    break
+
+                if settings.SCRAPER_DELAY_SECONDS:
+                    await asyncio.sleep(settings.SCRAPER_DELAY_SECONDS)
+
+    async def scrape(
+        self,
+        max_pages: Optional[int] = None,
+        es_conocido: Optional[Callable[[Dict], bool]] = None
+    ) -> List[Dict]:
+        """Descarga todas las páginas y devuelve los fallos en una lista"""
+        fallos = []
+        async for pagina in self.iterar_paginas(max_pages, es_conocido):
+            fallos.extend(pagina)
+        return fallos
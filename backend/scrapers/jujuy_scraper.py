@@ -1,74 +1,185 @@
 """
 Scraper para jurisprudencia de Jujuy
 """
-from playwright.sync_api import sync_playwright
+import asyncio
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Callable, Tuple
+from urllib.parse import urljoin
+
 from core.config import settings
 
+try:
+    from playwright.sync_api import sync_playwright
+except ImportError:
+    # Solo es necesario para el motor playwright y el fallback de páginas con JS
+    sync_playwright = None
+
+BASE_URL = settings.SCRAPER_JUJUY_URL
+
 
-def scrape_fallos_jujuy(max_pages: int = None) -> List[Dict]:
+def scrape_fallos_jujuy(
+    max_pages: int = None,
+    engine: Optional[str] = None,
+    base_url: str = BASE_URL,
+    es_conocido: Optional[Callable[[Dict], bool]] = None
+) -> List[Dict]:
     """
     Scraper para jurisprudencia de Jujuy
     Extrae fallos de jurisprudencia.justiciajujuy.gov.ar
+
+    engine: 'http' (cliente HTTP async, sin navegador) o 'playwright'.
+    Por defecto se usa settings.SCRAPER_ENGINE.
+    es_conocido: predicado para el modo incremental. Los fallos conocidos
+    no se descargan y el recorrido se detiene en la primera página que
+    los contenga (el listado está ordenado del más nuevo al más viejo).
     """
     max_pages = max_pages or settings.SCRAPER_MAX_PAGES
+    engine = engine or settings.SCRAPER_ENGINE
+
+    if engine == "http":
+        from scrapers.jujuy_http_scraper import JujuyHttpScraper
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(JujuyHttpScraper(base_url=base_url).scrape(max_pages, es_conocido))
+        raise RuntimeError("scrape_fallos_jujuy se llamó dentro de un event loop: usar scrape_fallos_jujuy_async")
+
     fallos = []
-    
+
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         page = browser.new_page()
-        base_url = "https://jurisprudencia.justiciajujuy.gov.ar/public/buscador"
-        
+
         for i in range(max_pages):
             try:
-                page.goto(f"{base_url}?index={i}")
-                page.wait_for_selector(".resultado-fallo", timeout=10000)
-                
-                # Extraer información de cada fallo
-                items = page.query_selector_all(".resultado-fallo")
-                
-                for item in items:
-                    try:
-                        caratula_elem = item.query_selector('.caratula')
-                        fecha_elem = item.query_selector('.fecha')
-                        tribunal_elem = item.query_selector('.tribunal')
-                        link_elem = item.query_selector('a')
-                        
-                        if not caratula_elem or not link_elem:
-                            continue
-                        
-                        fallo = {
-                            'caratula': caratula_elem.inner_text(),
-                            'fecha': fecha_elem.inner_text() if fecha_elem else None,
-                            'tribunal': tribunal_elem.inner_text() if tribunal_elem else None,
-                            'url': link_elem.get_attribute('href')
-                        }
-                        
-                        # Ir al detalle del fallo para obtener texto completo
-                        if fallo['url']:
-                            detail_page = browser.new_page()
-                            detail_page.goto(fallo['url'])
-                            detail_page.wait_for_selector('.texto-fallo', timeout=10000)
-                            
-                            texto_elem = detail_page.query_selector('.texto-fallo')
-                            if texto_elem:
-                                fallo['texto_completo'] = texto_elem.inner_text()
-                            
-                            detail_page.close()
-                        
-                        fallos.append(fallo)
-                        
-                    except Exception as e:
-                        print(f"Error procesando fallo: {e}")
-                        continue
-                
+                nuevos, hay_conocidos = _extraer_pagina(browser, page, f"{base_url}?index={i}", es_conocido)
+                fallos.extend(nuevos)
+                if hay_conocidos or not nuevos:
+                    break
                 time.sleep(settings.SCRAPER_DELAY_SECONDS)
-                
+
             except Exception as e:
                 print(f"Error en página {i}: {e}")
                 break
-        
+
         browser.close()
-    
+
     return fallos
+
+
+async def scrape_fallos_jujuy_async(
+    max_pages: int = None,
+    engine: Optional[str] = None,
+    base_url: str = BASE_URL,
+    es_conocido: Optional[Callable[[Dict], bool]] = None
+) -> List[Dict]:
+    """scrape_fallos_jujuy para código que ya corre en un event loop"""
+    engine = engine or settings.SCRAPER_ENGINE
+    if engine == "http":
+        from scrapers.jujuy_http_scraper import JujuyHttpScraper
+
+        return await JujuyHttpScraper(base_url=base_url).scrape(max_pages, es_conocido)
+    # Playwright sync no puede correr en el hilo del event loop
+    return await asyncio.to_thread(scrape_fallos_jujuy, max_pages, engine, base_url, es_conocido)
+
+
+def scrape_pagina_playwright(url: str) -> List[Dict]:
+    """
+    Extrae una única página del listado con Playwright.
+    Usado como fallback por el scraper HTTP cuando la página requiere JS.
+    """
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            return _extraer_pagina(browser, browser.new_page(), url)[0]
+        finally:
+            browser.close()
+
+
+def obtener_texto_playwright(url: str) -> Optional[str]:
+    """
+    Obtiene el texto completo de un fallo con Playwright.
+    Usado como fallback por el scraper HTTP cuando el detalle requiere JS.
+    """
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            return _extraer_texto(browser, url)
+        finally:
+            browser.close()
+
+
+def _extraer_pagina(
+    browser,
+    page,
+    url: str,
+    es_conocido: Optional[Callable[[Dict], bool]] = None
+) -> Tuple[List[Dict], bool]:
+    """
+    Extrae los fallos de una página del listado (incluye el detalle de cada uno)
+
+    Returns:
+        (fallos nuevos, si la página contenía fallos ya conocidos)
+    """
+    from scrapers.jujuy_http_scraper import CONTENEDOR_LISTADO
+
+    page.goto(url)
+    # El contenedor aparece también en la página vacía posterior a la última
+    page.wait_for_selector(f".resultado-fallo, {CONTENEDOR_LISTADO}", timeout=10000)
+
+    fallos = []
+    hay_conocidos = False
+
+    # Extraer información de cada fallo
+    items = page.query_selector_all(".resultado-fallo")
+
+    for item in items:
+        try:
+            caratula_elem = item.query_selector('.caratula')
+            fecha_elem = item.query_selector('.fecha')
+            tribunal_elem = item.query_selector('.tribunal')
+            link_elem = item.query_selector('a')
+
+            if not caratula_elem or not link_elem:
+                continue
+
+            href = link_elem.get_attribute('href')
+            fallo = {
+                'caratula': caratula_elem.inner_text(),
+                'fecha': fecha_elem.inner_text() if fecha_elem else None,
+                'tribunal': tribunal_elem.inner_text() if tribunal_elem else None,
+                # Absoluta, igual que el motor http (clave de deduplicación)
+                'url': urljoin(url, href) if href else None
+            }
+
+            if es_conocido and es_conocido(fallo):
+                hay_conocidos = True
+                continue
+
+            # Ir al detalle del fallo para obtener texto completo
+            if fallo['url']:
+                texto = _extraer_texto(browser, fallo['url'])
+                if texto:
+                    fallo['texto_completo'] = texto
+
+            fallos.append(fallo)
+
+        except Exception as e:
+            print(f"Error procesando fallo: {e}")
+            continue
+
+    return fallos, hay_conocidos
+
+
+def _extraer_texto(browser, url: str) -> Optional[str]:
+    """Abre el detalle de un fallo y devuelve su texto completo"""
+    detail_page = browser.new_page()
+    try:
+        detail_page.goto(url)
+        detail_page.wait_for_selector('.texto-fallo', timeout=10000)
+
+        texto_elem = detail_page.query_selector('.texto-fallo')
+        return texto_elem.inner_text() if texto_elem else None
+    finally:
+        detail_page.close()
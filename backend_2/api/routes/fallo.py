@@ -1,20 +1,116 @@
 """
-Endpoint para analizar fallos judiciales
+Endpoints para analizar fallos judiciales
 """
+import json
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
-from fastapi import APIRouter
 from core.services.ia_service import IAService
-from typing import Optional, List
+from core.utils import leer_archivo
 
 router = APIRouter()
-ia_service = IAService()
-
-# Modelo de Datos simple 
-class FalloSimple(BaseModel):
-    id: int 
-    titulo: str
-    materia: str 
-    fecha: str
-    
-    class Config:
-        
+
+
+@lru_cache
+def obtener_ia_service() -> IAService:
+    """Instancia única: el router de proveedores acumula sus estadísticas en ella"""
+    return IAService()
+
+
+async def _texto_del_pedido(archivo: Optional[UploadFile], texto: Optional[str]) -> str:
+    """Texto del fallo desde un archivo subido (.pdf o .txt) o desde el formulario"""
+    if archivo is not None:
+        sufijo = Path(archivo.filename or "").suffix.lower() or ".pdf"
+        with tempfile.NamedTemporaryFile(suffix=sufijo) as temporal:
+            temporal.write(await archivo.read())
+            temporal.flush()
+            try:
+                return await run_in_threadpool(leer_archivo, temporal.name)
+            except (ValueError, ImportError) as e:
+                raise HTTPException(status_code=400, detail=str(e))
+    if texto and texto.strip():
+        return texto
+    raise HTTPException(status_code=400, detail="Enviar un archivo (.pdf o .txt) o el texto del fallo")
+
+
+def _sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+@router.post("/analizar")
+async def analizar_fallo(
+    archivo: Optional[UploadFile] = File(None),
+    texto: Optional[str] = Form(None)
+):
+    """Análisis completo; el proveedor lo elige el router"""
+    contenido = await _texto_del_pedido(archivo, texto)
+    try:
+        return await run_in_threadpool(obtener_ia_service().analizar_fallo_con_router, contenido)
+    except ValueError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@router.post("/analizar/escalonado")
+async def analizar_fallo_escalonado(
+    archivo: Optional[UploadFile] = File(None),
+    texto: Optional[str] = Form(None),
+    confianza_minima: Optional[float] = Form(None, ge=0, le=1)
+):
+    """Clasificador local primero; escala al modelo si el fallo es largo o la confianza no alcanza"""
+    contenido = await _texto_del_pedido(archivo, texto)
+    try:
+        return await run_in_threadpool(
+            obtener_ia_service().analizar_fallo_escalonado, contenido, None, confianza_minima
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@router.post("/analizar/stream")
+async def analizar_fallo_stream(
+    archivo: Optional[UploadFile] = File(None),
+    texto: Optional[str] = Form(None)
+):
+    """
+    Análisis en streaming (Server-Sent Events)
+
+    Emite un evento 'campo' por cada campo apenas está completo (materia,
+    resultado, etiquetas... y el resumen al final), luego 'fin' con el
+    análisis validado, o 'error'.
+    """
+    contenido = await _texto_del_pedido(archivo, texto)
+    servicio = obtener_ia_service()
+
+    def eventos():
+        # Generador sincrónico: StreamingResponse lo itera en el threadpool
+        try:
+            for evento in servicio.analizar_fallo_stream(contenido):
+                yield _sse(evento.pop("evento"), evento)
+        except ValueError as e:
+            yield _sse("error", {"detalle": str(e)})
+        except Exception as e:
+            # La respuesta ya empezó (200): el error solo puede ir como evento
+            yield _sse("error", {"detalle": f"Error inesperado en el análisis: {e}"})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/estadisticas")
+async def estadisticas():
+    """Estadísticas del router de proveedores, de la validación de salidas y del análisis escalonado"""
+    servicio = obtener_ia_service()
+    return {
+        "proveedores": servicio.estadisticas_proveedores(),
+        "salida": servicio.estadisticas_salida(),
+        "niveles": servicio.estadisticas_niveles(),
+    }
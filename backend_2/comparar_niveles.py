@@ -0,0 +1,173 @@
+"""
+Compara el análisis escalonado (clasificador local + modelo) contra analizar
+todo con el modelo: rendimiento, costo y coincidencia.
+
+Cada fallo se analiza una vez con el modelo (vía router) y una con el
+clasificador local. Para cada umbral de confianza, el escalonado usa el
+resultado local si alcanza y el del modelo si escala, así que no hace falta
+repetir llamadas. La coincidencia se mide contra el modelo: materia,
+resultado y etiquetas (Jaccard), sobre los fallos resueltos localmente.
+
+Uso:
+    .venv/bin/python comparar_niveles.py fallos/
+    .venv/bin/python comparar_niveles.py fallos/ --cache modelo.json --umbrales 0.6 0.75 0.9
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.services.clasificador_service import ClasificadorLocal
+from core.services.ia_service import MAX_CARACTERES_LOCAL
+from core.services.router_service import costo_usd
+from core.utils import leer_archivo
+
+EXTENSIONES = {".pdf", ".txt"}
+
+
+def cargar_fallos(rutas: list[str]) -> dict[str, str]:
+    """Texto de cada fallo (archivos sueltos o carpetas con .pdf/.txt)"""
+    archivos = []
+    for ruta in map(Path, rutas):
+        if ruta.is_dir():
+            archivos.extend(sorted(p for p in ruta.iterdir() if p.suffix.lower() in EXTENSIONES))
+        else:
+            archivos.append(ruta)
+    return {str(archivo): leer_archivo(str(archivo)) for archivo in archivos}
+
+
+def analizar_con_modelo(fallos: dict[str, str], ruta_cache: Path | None) -> dict[str, dict]:
+    """Análisis de referencia con el modelo; la caché evita repetir llamadas entre corridas"""
+    cache = json.loads(ruta_cache.read_text()) if ruta_cache and ruta_cache.exists() else {}
+    pendientes = [nombre for nombre in fallos if nombre not in cache]
+    if pendientes:
+        from core.services.ia_service import IAService
+        servicio = IAService()
+        for nombre in pendientes:
+            inicio = time.perf_counter()
+            try:
+                resp = servicio.analizar_fallo_con_router(fallos[nombre])
+            except ValueError as e:
+                print(f"  ✗ {nombre}: {e}")
+                continue
+            cache[nombre] = {
+                "provider": resp["provider"],
+                "resultado": resp["resultado"],
+                "uso": resp["uso"],
+                "segundos": time.perf_counter() - inicio,
+            }
+            print(f"  ✓ {nombre} ({resp['provider']}, {cache[nombre]['segundos']:.1f}s)")
+        if ruta_cache:
+            ruta_cache.write_text(json.dumps(cache, indent=2, ensure_ascii=False))
+    return {nombre: cache[nombre] for nombre in fallos if nombre in cache}
+
+
+def analizar_local(fallos: dict[str, str]) -> dict[str, dict]:
+    clasificador = ClasificadorLocal()
+    resultados = {}
+    for nombre, texto in fallos.items():
+        inicio = time.perf_counter()
+        local = clasificador.clasificar(texto)
+        resultados[nombre] = {**local, "segundos": time.perf_counter() - inicio}
+    return resultados
+
+
+def _jaccard(a: dict, b: dict) -> float:
+    nombres_a = {e["nombre"] for e in a["etiquetas"]}
+    nombres_b = {e["nombre"] for e in b["etiquetas"]}
+    if not nombres_a and not nombres_b:
+        return 1.0
+    return len(nombres_a & nombres_b) / len(nombres_a | nombres_b)
+
+
+def _costo(referencia: dict) -> float:
+    return costo_usd(referencia["provider"], referencia["uso"]["input_tokens"], referencia["uso"]["output_tokens"])
+
+
+def comparar(fallos: dict[str, str], modelo: dict, local: dict, umbral: float) -> dict:
+    """Métricas del escalonado con un umbral, contra analizar todo con el modelo"""
+    locales, escalados = [], []
+    for nombre in modelo:
+        largo = len(fallos[nombre]) > MAX_CARACTERES_LOCAL
+        (escalados if largo or local[nombre]["confianza"] < umbral else locales).append(nombre)
+
+    segundos = sum(local[n]["segundos"] for n in modelo) + sum(modelo[n]["segundos"] for n in escalados)
+    coincidencia = {"materia": 0.0, "resultado": 0.0, "etiquetas": 0.0}
+    for nombre in locales:
+        propio, referencia = local[nombre]["resultado"], modelo[nombre]["resultado"]
+        coincidencia["materia"] += propio["materia"] == referencia["materia"]
+        coincidencia["resultado"] += propio["resultado"] == referencia["resultado"]
+        coincidencia["etiquetas"] += _jaccard(propio, referencia)
+
+    return {
+        "umbral": umbral,
+        "fallos": len(modelo),
+        "resueltos_local": len(locales),
+        "escalados": len(escalados),
+        "fallos_por_segundo": round(len(modelo) / segundos, 3) if segundos else None,
+        "costo_usd": round(sum(_costo(modelo[n]) for n in escalados), 6),
+        # Sobre los resueltos localmente (los escalados coinciden por construcción)
+        "coincidencia_local": {
+            campo: round(total / len(locales), 3) if locales else None for campo, total in coincidencia.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis escalonado vs todo con el modelo")
+    parser.add_argument("rutas", nargs="+", help="Archivos o carpetas con fallos (.pdf/.txt)")
+    parser.add_argument("--umbrales", type=float, nargs="+", default=[0.6, 0.75, 0.9])
+    parser.add_argument("--cache", type=Path, help="JSON con los análisis del modelo (se reutiliza y completa)")
+    parser.add_argument("--salida", type=Path, help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    print("Leyendo fallos...")
+    fallos = cargar_fallos(args.rutas)
+    if not fallos:
+        print("No se encontraron fallos (.pdf/.txt)")
+        sys.exit(1)
+
+    print(f"Analizando {len(fallos)} fallos con el modelo...")
+    modelo = analizar_con_modelo(fallos, args.cache)
+    if not modelo:
+        print("El modelo no pudo analizar ningún fallo")
+        sys.exit(1)
+    local = analizar_local(fallos)
+
+    segundos_modelo = sum(r["segundos"] for r in modelo.values())
+    base = {
+        "fallos": len(modelo),
+        "fallos_por_segundo": round(len(modelo) / segundos_modelo, 3) if segundos_modelo else None,
+        "costo_usd": round(sum(_costo(r) for r in modelo.values()), 6),
+    }
+    escalonado = [comparar(fallos, modelo, local, umbral) for umbral in args.umbrales]
+
+    print()
+    print(f"Todo con el modelo: {base['fallos_por_segundo']} fallos/s, USD {base['costo_usd']:.4f}")
+    print(f"{'umbral':>7} {'local':>6} {'escal.':>6} {'fallos/s':>9} {'USD':>9} {'materia':>8} {'result.':>8} {'etiq.':>6}")
+    for fila in escalonado:
+        c = fila["coincidencia_local"]
+        formato = lambda v: "-" if v is None else f"{v:.2f}"
+        print(
+            f"{fila['umbral']:>7.2f} {fila['resueltos_local']:>6} {fila['escalados']:>6} "
+            f"{fila['fallos_por_segundo'] or 0:>9.2f} {fila['costo_usd']:>9.4f} "
+            f"{formato(c['materia']):>8} {formato(c['resultado']):>8} {formato(c['etiquetas']):>6}"
+        )
+
+    if args.salida:
+        reporte = {
+            "modelo": base,
+            "escalonado": escalonado,
+            "confianza_local": {nombre: local[nombre]["confianza"] for nombre in modelo},
+        }
+        args.salida.write_text(json.dumps(reporte, indent=2, ensure_ascii=False))
+        print(f"\nReporte guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Etiquetador local: autómata Aho-Corasick sobre la taxonomía SAIJ
+
+Compila las etiquetas oficiales y sus sinónimos (SINONIMOS_SAIJ) en un
+único autómata sin tildes ni mayúsculas y recorre el texto del fallo una
+sola vez. Ej: "finalización del contrato" cuenta como DESPIDO. El autómata
+y la taxonomía están en jurisar_comun.taxonomia (compartidos con backend).
+
+Las etiquetas encontradas son candidatas: se le envía al modelo esa lista
+corta en lugar de la taxonomía completa.
+"""
+from collections import Counter
+from typing import Optional
+
+from jurisar_comun.taxonomia import ETIQUETAS_SAIJ_BASE, SINONIMOS_SAIJ, AutomataEtiquetas, plegar  # noqa: F401
+
+MAX_CANDIDATAS = 15
+
+
+class EtiquetadorLocal:
+    """Autómata de las etiquetas oficiales indicadas (o las base) y sus sinónimos"""
+
+    def __init__(self, etiquetas: Optional[list[str]] = None):
+        terminos = {etiqueta: etiqueta.upper() for etiqueta in etiquetas or ETIQUETAS_SAIJ_BASE}
+        oficiales = set(terminos.values())
+        for etiqueta, sinonimos in SINONIMOS_SAIJ.items():
+            if etiqueta in oficiales:
+                for sinonimo in sinonimos:
+                    terminos.setdefault(sinonimo, etiqueta)
+        self.automata = AutomataEtiquetas(terminos)
+
+    def buscar(self, texto: str) -> Counter:
+        """Apariciones de cada etiqueta en una pasada"""
+        return self.automata.buscar(texto)
+
+    def candidatas(self, texto: str, limite: int = MAX_CANDIDATAS) -> list[tuple[str, int]]:
+        """(etiqueta, apariciones), de la más frecuente a la menos"""
+        return self.buscar(texto).most_common(limite)
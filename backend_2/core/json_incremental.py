@@ -0,0 +1,97 @@
+"""
+Parser incremental de un objeto JSON que llega por partes (streaming)
+
+Recibe los fragmentos del modelo a medida que llegan y devuelve cada campo
+de primer nivel apenas su valor está completo, sin esperar al cierre del
+objeto. Ej: con '{"materia": "LAB' todavía no hay campos; al llegar
+'ORAL", "resul' ya se devuelve ("materia", "LABORAL").
+"""
+import json
+from typing import Any
+
+
+class ParserJSONIncremental:
+    """Emite los pares (campo, valor) de primer nivel de un objeto JSON en streaming"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0                # próximo carácter a examinar
+        self.profundidad = 0        # 1 = dentro del objeto raíz
+        self.en_string = False
+        self.escape = False
+        self.clave: str | None = None
+        self.inicio_clave: int | None = None
+        self.inicio_valor: int | None = None
+        self.esperando_valor = False
+        self.campos: dict[str, Any] = {}
+
+    def alimentar(self, fragmento: str) -> list[tuple[str, Any]]:
+        """Agrega un fragmento y devuelve los campos que se completaron con él"""
+        self.buffer += fragmento
+        completos = []
+
+        while self.pos < len(self.buffer):
+            c = self.buffer[self.pos]
+
+            if self.en_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.en_string = False
+                    if self.profundidad == 1 and self.inicio_clave is not None:
+                        # Fin de la clave de un campo de primer nivel
+                        self.clave = json.loads(self.buffer[self.inicio_clave:self.pos + 1])
+                        self.inicio_clave = None
+                    elif self.profundidad == 1 and self.inicio_valor is not None:
+                        completos.append(self._cerrar_valor(self.pos + 1))
+                self.pos += 1
+                continue
+
+            if c == '"':
+                self.en_string = True
+                if self.profundidad == 1:
+                    if self.esperando_valor:
+                        self._abrir_valor()
+                    elif self.clave is None:
+                        self.inicio_clave = self.pos
+            elif c in "{[":
+                if self.profundidad == 1 and self.esperando_valor:
+                    self._abrir_valor()
+                self.profundidad += 1
+            elif c in "}]":
+                if self.profundidad == 1 and self.inicio_valor is not None:
+                    # Número, true, false o null al final del objeto
+                    completos.append(self._cerrar_valor(self.pos))
+                self.profundidad -= 1
+                if self.profundidad == 1 and self.inicio_valor is not None:
+                    # Cierre de un objeto o array de primer nivel
+                    completos.append(self._cerrar_valor(self.pos + 1))
+            elif self.profundidad == 1:
+                if c == ":" and self.clave is not None:
+                    self.esperando_valor = True
+                elif c == ",":
+                    if self.inicio_valor is not None:
+                        completos.append(self._cerrar_valor(self.pos))
+                elif not c.isspace() and self.esperando_valor:
+                    self._abrir_valor()
+            self.pos += 1
+
+        return [campo for campo in completos if campo is not None]
+
+    def _abrir_valor(self):
+        self.inicio_valor = self.pos
+        self.esperando_valor = False
+
+    def _cerrar_valor(self, fin: int) -> tuple[str, Any] | None:
+        texto = self.buffer[self.inicio_valor:fin].strip()
+        clave = self.clave
+        self.clave = None
+        self.inicio_valor = None
+        try:
+            valor = json.loads(texto)
+        except json.JSONDecodeError:
+            return None
+        self.campos[clave] = valor
+        return clave, valor
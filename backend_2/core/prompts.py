@@ -3,7 +3,9 @@ Prompts para el análisis de fallos judiciales con Claude.
 
 SYSTEM_PROMPT: Configura el comportamiento y reglas de la IA.
 generar_prompt_usuario: Construye el prompt dinámico con el texto del fallo.
+generar_prompt_reparacion: Pide corregir una salida que no cumple el esquema.
 """
+from jurisar_comun.taxonomia import ETIQUETAS_SAIJ_BASE, SINONIMOS_SAIJ  # noqa: F401 (la taxonomía vive en jurisar_comun)
 
 SYSTEM_PROMPT = """
 Eres un Secretario Judicial experto en el sistema jurídico argentino y la jurisprudencia de la Provincia de Jujuy.
@@ -18,7 +20,6 @@ Tu tarea es realizar un ANALISIS ESTRUCTURADO de fallos judiciales para un motor
 ### FORMATO DE SALIDA (JSON ESTRICTO)
 Responde exclusivamente en formato JSON con esta estructura:
 {
-  "resumen": "Máx 150 palabras. Hechos, conflicto y decisión.",
   "materia": "LABORAL | CIVIL | PENAL | FAMILIA | CONTENCIOSO",
   "tipo_proceso": "Ej: ACCION DE AMPARO",
   "resultado": "SE HACE LUGAR | RECHAZO | NULIDAD | PARCIAL",
@@ -26,56 +27,17 @@ Responde exclusivamente en formato JSON con esta estructura:
     {"nombre": "ETIQUETA", "tipo": "oficial | generada", "relevancia": "alta | media"}
   ],
   "normativa_clave": ["Ley 20744 Art 245", "CPCC Jujuy Art 100"],
-  "partes": {"actor": "", "demandado": ""}
+  "partes": {"actor": "", "demandado": ""},
+  "resumen": "Máx 150 palabras. Hechos, conflicto y decisión."
 }
 """
 
-# Etiquetas base de la taxonomía SAIJ (ejemplo inicial)
-ETIQUETAS_SAIJ_BASE = [
-    "DESPIDO",
-    "INDEMNIZACION",
-    "ACCIDENTE DE TRANSITO",
-    "DAÑOS Y PERJUICIOS",
-    "RESPONSABILIDAD OBJETIVA",
-    "RESPONSABILIDAD SUBJETIVA",
-    "SEGURO DE RESPONSABILIDAD CIVIL",
-    "ACCION DE AMPARO",
-    "RECURSO DE APELACION",
-    "RECURSO DE INCONSTITUCIONALIDAD",
-    "NULIDAD",
-    "CONTRATO DE TRABAJO",
-    "PREAVISO",
-    "ANTIGÜEDAD",
-    "HORAS EXTRAS",
-    "ALIMENTOS",
-    "TENENCIA",
-    "REGIMEN DE VISITAS",
-    "DIVORCIO",
-    "SUCESION",
-    "HOMICIDIO",
-    "LESIONES",
-    "ROBO",
-    "HURTO",
-    "ESTAFA",
-    "PRESCRIPCION",
-    "CADUCIDAD",
-    "COSTAS",
-    "HONORARIOS",
-    "MEDIDA CAUTELAR",
-    "EMBARGO",
-    "INHIBICION",
-    "EJECUCION DE SENTENCIA",
-    "COSA JUZGADA",
-    "DEBIDO PROCESO",
-    "DERECHO DE DEFENSA",
-    "PRUEBA",
-    "PERICIA",
-    "TESTIGO",
-    "COMPETENCIA",
-]
-
-
-def generar_prompt_usuario(texto_del_fallo: str, etiquetas: list[str] | None = None) -> str:
+
+def generar_prompt_usuario(
+    texto_del_fallo: str,
+    etiquetas: list[str] | None = None,
+    candidatas: list[str] | None = None
+) -> str:
     """
     Construye el prompt de usuario inyectando las etiquetas oficiales
     y el texto del fallo a analizar.
@@ -83,17 +45,24 @@ def generar_prompt_usuario(texto_del_fallo: str, etiquetas: list[str] | None = N
     Args:
         texto_del_fallo: Texto completo o fragmento del fallo judicial.
         etiquetas: Lista de etiquetas oficiales. Si es None, usa las base.
+        candidatas: Etiquetas oficiales detectadas en el texto por el
+            etiquetador local. Si se indican, reemplazan a la lista completa.
 
     Returns:
         El prompt completo listo para enviar a Claude.
     """
-    lista_etiquetas = etiquetas or ETIQUETAS_SAIJ_BASE
+    if candidatas:
+        titulo = "ETIQUETAS OFICIALES CANDIDATAS (detectadas en el texto, de mayor a menor frecuencia)"
+        lista_etiquetas = candidatas
+    else:
+        titulo = "ETIQUETAS OFICIALES DISPONIBLES (Taxonomía SAIJ)"
+        lista_etiquetas = etiquetas or ETIQUETAS_SAIJ_BASE
     etiquetas_formateadas = "\n".join(f"- {e}" for e in lista_etiquetas)
 
     return f"""
 A continuación, procesa el siguiente fallo judicial.
 
-### ETIQUETAS OFICIALES DISPONIBLES (Taxonomía SAIJ):
+### {titulo}:
 {etiquetas_formateadas}
 
 ### FORMATO DE SALIDA (JSON ESTRICTO)
@@ -108,3 +77,40 @@ A continuación, procesa el siguiente fallo judicial.
 
 Genera el JSON siguiendo las instrucciones del sistema.
 """
+
+
+PROMPT_REPARACION_SISTEMA = """
+Eres un validador de datos. Recibes un análisis de un fallo judicial que no
+cumple el esquema esperado y lo corriges respetando el esquema.
+No inventes hechos: si un dato falta, usa una cadena vacía o una lista vacía.
+"""
+
+
+def generar_prompt_reparacion(salida: str, error: Exception) -> str:
+    """
+    Construye el prompt de reparación con la salida inválida y sus errores.
+    No incluye el texto del fallo: es una llamada corta y barata.
+
+    Args:
+        salida: Salida del proveedor que no pasó la validación.
+        error: ValidationError de pydantic o error de parseo.
+
+    Returns:
+        El prompt de reparación.
+    """
+    if hasattr(error, "errors"):
+        errores = "\n".join(
+            f"- {'.'.join(str(p) for p in e['loc']) or 'raíz'}: {e['msg']}" for e in error.errors()
+        )
+    else:
+        errores = f"- {error}"
+
+    return f"""
+Corrige SOLO los campos con errores del siguiente análisis y conserva el resto.
+
+### ERRORES:
+{errores}
+
+### ANÁLISIS A CORREGIR:
+{salida[:8000]}
+"""
@@ -0,0 +1,75 @@
+"""
+Modelo del análisis estructurado de un fallo (el JSON que describe SYSTEM_PROMPT)
+
+El mismo modelo genera el esquema que restringe la salida de cada
+proveedor: input_schema de la herramienta de Anthropic y response_format
+json_schema (modo estricto) de OpenAI.
+"""
+import copy
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator
+
+MATERIAS = ("LABORAL", "CIVIL", "PENAL", "FAMILIA", "CONTENCIOSO")
+
+
+class EtiquetaAnalisis(BaseModel):
+    nombre: str = Field(description="En MAYÚSCULAS, singular y sin artículos")
+    tipo: Literal["oficial", "generada"]
+    relevancia: Literal["alta", "media"]
+
+    @field_validator("tipo", "relevancia", mode="before")
+    @classmethod
+    def _minusculas(cls, valor):
+        return valor.strip().lower() if isinstance(valor, str) else valor
+
+
+class Partes(BaseModel):
+    actor: str = ""
+    demandado: str = ""
+
+
+class AnalisisFallo(BaseModel):
+    """Análisis estructurado de un fallo judicial"""
+    # El orden de los campos es el orden de generación: en streaming los
+    # datos cortos (materia, resultado, etiquetas) llegan antes que el resumen
+    materia: Literal[MATERIAS]
+    tipo_proceso: str = Field(description="Ej: ACCION DE AMPARO")
+    resultado: str = Field(description="SE HACE LUGAR | RECHAZO | NULIDAD | PARCIAL")
+    etiquetas: list[EtiquetaAnalisis] = Field(description="Entre 4 y 7 etiquetas")
+    normativa_clave: list[str] = Field(description="Ej: Ley 20744 Art 245, CPCC Jujuy Art 100")
+    partes: Partes
+    resumen: str = Field(description="Máx 150 palabras. Hechos, conflicto y decisión.")
+
+    @field_validator("materia", mode="before")
+    @classmethod
+    def _mayusculas(cls, valor):
+        return valor.strip().upper() if isinstance(valor, str) else valor
+
+
+def _estricto(nodo):
+    """Ajustes del modo estricto de OpenAI: todo requerido, sin propiedades extra ni defaults"""
+    if isinstance(nodo, list):
+        for item in nodo:
+            _estricto(item)
+        return
+    if not isinstance(nodo, dict):
+        return
+    nodo.pop("default", None)
+    propiedades = nodo.get("properties")
+    if isinstance(propiedades, dict):
+        nodo["required"] = list(propiedades)
+        nodo["additionalProperties"] = False
+        for subesquema in propiedades.values():
+            _estricto(subesquema)
+    for clave, valor in nodo.items():
+        if clave != "properties":
+            _estricto(valor)
+
+
+def esquema_json(estricto: bool = False) -> dict:
+    """JSON schema de AnalisisFallo (estricto: compatible con response_format de OpenAI)"""
+    esquema = copy.deepcopy(AnalisisFallo.model_json_schema())
+    if estricto:
+        _estricto(esquema)
+    return esquema
@@ -0,0 +1,252 @@
+"""
+Clasificador local de fallos: primer nivel del análisis escalonado
+
+Reglas de palabras clave y expresiones regulares, sin llamadas a la IA:
+- materia: términos característicos de cada fuero
+- resultado: fórmula de la parte resolutiva (RESUELVE, FALLA, POR ELLO...)
+- etiquetas: las del etiquetador local (taxonomía SAIJ y sinónimos)
+- normativa, partes y tipo de proceso: citas y carátula
+
+Devuelve un análisis con la forma de AnalisisFallo y una confianza entre 0
+y 1. Los fallos con confianza baja se escalan al modelo completo.
+"""
+import re
+from typing import Optional
+
+from jurisar_comun.citas import extraer_citas
+
+from core.etiquetador import EtiquetadorLocal, plegar
+from core.schemas import AnalisisFallo
+
+MODELO_LOCAL = "reglas-v1"
+NO_ESPECIFICADO = "No especificado"
+
+# Términos por materia (sobre texto normalizado: minúsculas y sin tildes)
+TERMINOS_MATERIA = {
+    "LABORAL": (
+        "despido", "trabajador", "empleador", "contrato de trabajo", "ley 20\\.?744", "l\\.?c\\.?t",
+        "tribunal del trabajo", "horas extras", "preaviso", "riesgos del trabajo", "remuneracion",
+        "indemnizacion por antiguedad",
+    ),
+    "CIVIL": (
+        "danos y perjuicios", "accidente de transito", "responsabilidad civil", "desalojo", "sucesion",
+        "locacion", "cobro de pesos", "escrituracion", "citada en garantia", "aseguradora",
+        "codigo civil", "camara (?:de apelaciones )?(?:en lo )?civil",
+    ),
+    "PENAL": (
+        "imputado", "delito", "codigo penal", "homicidio", "robo", "hurto", "estafa", "querella",
+        "prision", "sobreseimiento", "ministerio publico fiscal", "tribunal (?:en lo )?criminal",
+        "camara (?:en lo )?penal",
+    ),
+    "FAMILIA": (
+        "alimentos", "divorcio", "cuidado personal", "regimen de (?:comunicacion|visitas)", "progenitor",
+        "filiacion", "adopcion", "violencia familiar", "tenencia", "juzgado de familia",
+        "ninos?", "ninas?", "adolescente",
+    ),
+    "CONTENCIOSO": (
+        "contencioso administrativo", "acto administrativo", "estado provincial", "municipalidad",
+        "administracion publica", "fiscalia de estado", "empleo publico", "agente publico",
+        "tribunal contencioso",
+    ),
+}
+TOPE_POR_TERMINO = 5        # un término repetido no decide solo la materia
+EVIDENCIA_MATERIA = 4       # puntaje a partir del cual la materia es confiable
+
+# Inicio de la parte resolutiva (se toma la última aparición)
+PARTE_RESOLUTIVA = re.compile(r"\b(?:resuelve|resolvemos|falla|fallamos|por ello|por todo ello)\b", re.IGNORECASE)
+
+# (resultado, patrón, confianza) en orden de prioridad ante empates de posición
+FORMULAS_RESULTADO = (
+    ("PARCIAL", re.compile(r"\b(?:ha(?:cer|ce|ciendo) lugar|admitir|admite) parcialmente|\bparcialmente (?:procedente|admisible)"), 1.0),
+    ("RECHAZO", re.compile(r"\bno (?:se )?ha(?:cer|ce|ciendo) lugar|\b(?:rechazar|rechaza|desestimar|desestima)\b|\bdeclarar (?:mal concedido|inadmisible|improcedente)"), 1.0),
+    ("NULIDAD", re.compile(r"\bdeclarar la nulidad|\bdeclarar nul[oa]s?\b|\banular (?:la|el|lo)\b"), 1.0),
+    ("SE HACE LUGAR", re.compile(r"(?<!no )(?<!no se )\b(?:ha(?:cer|ce|cese|ciendo) lugar|admitir|revocar)\b"), 1.0),
+    # Confirmar la sentencia apelada equivale a rechazar el recurso, pero es menos claro
+    ("RECHAZO", re.compile(r"\bconfirmar (?:la|el) (?:sentencia|resolucion|auto|decision)"), 0.7),
+)
+
+TIPOS_PROCESO = (
+    "ACCION DE AMPARO", "RECURSO DE INCONSTITUCIONALIDAD", "RECURSO DE CASACION", "RECURSO DE APELACION",
+    "MEDIDA CAUTELAR", "INCIDENTE", "HABEAS CORPUS", "EJECUCION DE SENTENCIA", "DAÑOS Y PERJUICIOS",
+    "COBRO DE PESOS", "DESALOJO", "ALIMENTOS", "DIVORCIO", "SUCESION", "DESPIDO",
+)
+# Tipos de resolución breves: el nivel local suele bastar
+INTERLOCUTORIAS = re.compile(
+    r"\b(?:interlocutori[oa]|incidente|providencia|medida cautelar|regulacion de honorarios|"
+    r"beneficio de litigar sin gastos|excepcion de incompetencia)\b"
+)
+
+CARATULA = re.compile(
+    r"caratulad[oa]s?\s*:?\s*[\"“«]?\s*(?P<actor>[^\"”»\n]{2,120}?)\s+c\s*/\s*(?P<demandado>[^\"”»\n]{2,120}?)"
+    r"\s+s\s*/\s*(?P<tipo>[^\"”»\n]{2,120})",
+    re.IGNORECASE
+)
+CARATULA_SIMPLE = re.compile(
+    r"(?P<actor>[^\n\"“]{2,120}?)\s+c\s*/\s*(?P<demandado>[^\n\"“]{2,120}?)\s+s\s*/\s*(?P<tipo>[^\n\"”]{2,120})",
+    re.IGNORECASE
+)
+
+# Normas del extractor compartido → forma de normativa_clave ("Ley 20744 Art 245")
+NOMBRES_NORMA = {
+    "CCYC": "CCyC",
+    "CODIGO CIVIL": "Codigo Civil",
+    "CPCC": "CPCC Jujuy",
+    "CPP": "CPP Jujuy",
+    "CODIGO PENAL": "Codigo Penal",
+    "CONSTITUCION NACIONAL": "Constitucion Nacional",
+    "CONSTITUCION DE JUJUY": "Constitucion de Jujuy",
+}
+MAX_NORMAS = 8
+MAX_ETIQUETAS = 7
+PALABRAS_RESUMEN = 150
+
+
+class ClasificadorLocal:
+    """Análisis de primer nivel con reglas; las expresiones se compilan una vez"""
+
+    def __init__(self, etiquetador: Optional[EtiquetadorLocal] = None):
+        self.materias = {
+            materia: [re.compile(r"\b" + termino + r"\b") for termino in terminos]
+            for materia, terminos in TERMINOS_MATERIA.items()
+        }
+        self.etiquetador = etiquetador or EtiquetadorLocal()
+
+    def clasificar(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
+        """
+        Clasifica un fallo con reglas locales
+
+        Args:
+            texto_fallo: Texto completo del fallo judicial
+            etiquetas: Lista opcional de etiquetas oficiales (por defecto ETIQUETAS_SAIJ_BASE)
+
+        Returns:
+            {"resultado": análisis con la forma de AnalisisFallo, "confianza": 0..1,
+             "detalle": confianza por componente y si la resolución es interlocutoria}
+        """
+        if not texto_fallo or not texto_fallo.strip():
+            raise ValueError("El texto del fallo está vacío")
+
+        normal = plegar(texto_fallo)
+        etiquetador = EtiquetadorLocal(etiquetas) if etiquetas else self.etiquetador
+
+        materia, c_materia = self._materia(normal)
+        resolutiva = self._parte_resolutiva(normal)
+        resultado, c_resultado = self._resultado(resolutiva or normal[-len(normal) // 4:])
+        if resolutiva is None:
+            c_resultado *= 0.6
+        lista_etiquetas = self._etiquetas(texto_fallo, etiquetador)
+        c_etiquetas = min(1.0, len(lista_etiquetas) / 4)
+        actor, demandado, tipo_caratula = self._caratula(texto_fallo)
+        tipo_proceso = tipo_caratula or self._tipo_proceso(normal[:3000])
+
+        # Sin materia o sin resultado el análisis local no sirve
+        if c_materia == 0 or c_resultado == 0:
+            confianza = 0.0
+        else:
+            confianza = 0.4 * c_materia + 0.4 * c_resultado + 0.2 * c_etiquetas
+
+        analisis = AnalisisFallo(
+            materia=materia,
+            tipo_proceso=tipo_proceso,
+            resultado=resultado,
+            etiquetas=lista_etiquetas,
+            normativa_clave=self._normativa(normal),
+            partes={"actor": actor, "demandado": demandado},
+            resumen=self._resumen(materia, tipo_proceso, resultado, actor, demandado, self._parte_resolutiva(texto_fallo)),
+        )
+        return {
+            "resultado": analisis.model_dump(),
+            "confianza": round(confianza, 3),
+            "detalle": {
+                "materia": round(c_materia, 3),
+                "resultado": round(c_resultado, 3),
+                "etiquetas": round(c_etiquetas, 3),
+                "interlocutorio": bool(INTERLOCUTORIAS.search(normal[:3000])),
+            },
+        }
+
+    def _materia(self, normal: str) -> tuple[str, float]:
+        """Materia con más puntaje; confianza = participación x evidencia suficiente"""
+        puntajes = {
+            materia: sum(min(len(p.findall(normal)), TOPE_POR_TERMINO) for p in patrones)
+            for materia, patrones in self.materias.items()
+        }
+        materia, puntaje = max(puntajes.items(), key=lambda item: item[1])
+        total = sum(puntajes.values())
+        if puntaje == 0:
+            return "CIVIL", 0.0
+        return materia, (puntaje / total) * min(1.0, puntaje / EVIDENCIA_MATERIA)
+
+    @staticmethod
+    def _parte_resolutiva(texto: str) -> Optional[str]:
+        ultima = None
+        for ultima in PARTE_RESOLUTIVA.finditer(texto):
+            pass
+        return texto[ultima.end():] if ultima else None
+
+    @staticmethod
+    def _resultado(texto: str) -> tuple[str, float]:
+        """Primera fórmula de la parte resolutiva (el punto principal de la decisión)"""
+        mejor = None
+        for resultado, patron, confianza in FORMULAS_RESULTADO:
+            coincidencia = patron.search(texto)
+            if coincidencia and (mejor is None or coincidencia.start() < mejor[0]):
+                mejor = (coincidencia.start(), resultado, confianza)
+        if mejor is None:
+            return NO_ESPECIFICADO, 0.0
+        return mejor[1], mejor[2]
+
+    @staticmethod
+    def _etiquetas(texto: str, etiquetador: EtiquetadorLocal) -> list[dict]:
+        return [
+            {"nombre": nombre, "tipo": "oficial", "relevancia": "alta" if veces >= 3 else "media"}
+            for nombre, veces in etiquetador.candidatas(texto, MAX_ETIQUETAS)
+        ]
+
+    @staticmethod
+    def _normativa(normal: str) -> list[str]:
+        """
+        Citas más frecuentes (extractor de jurisar_comun.citas: "art. 245 de la
+        ley 20.744", "art 232 LCT", "art. 79 CP"). La norma sin artículo se
+        omite si también se citó alguno de sus artículos.
+        """
+        citas = extraer_citas(normal)
+        con_articulo = {norma for norma, articulo in citas if articulo}
+        normativa = []
+        for (norma, articulo), _ in citas.most_common():
+            if not articulo and norma in con_articulo:
+                continue
+            nombre = NOMBRES_NORMA.get(norma) or norma.replace("LEY ", "Ley ", 1)
+            normativa.append(f"{nombre} Art {articulo.lower()}" if articulo else nombre)
+        return normativa[:MAX_NORMAS]
+
+    @staticmethod
+    def _caratula(texto: str) -> tuple[str, str, Optional[str]]:
+        """Actor, demandado y tipo de proceso de la carátula ('X c/ Y s/ Z')"""
+        encabezado = texto[:3000]
+        coincidencia = CARATULA.search(encabezado) or CARATULA_SIMPLE.search(encabezado)
+        if not coincidencia:
+            return NO_ESPECIFICADO, NO_ESPECIFICADO, None
+        tipo = re.split(r"[\"”»]|\bexpte\b|\bexpediente\b", coincidencia.group("tipo"), flags=re.IGNORECASE)[0]
+        return (
+            coincidencia.group("actor").strip(" .,-"),
+            coincidencia.group("demandado").strip(" .,-"),
+            tipo.strip(" .,-").upper() or None,
+        )
+
+    @staticmethod
+    def _tipo_proceso(encabezado_normal: str) -> str:
+        for tipo in TIPOS_PROCESO:
+            if plegar(tipo) in encabezado_normal:
+                return tipo
+        return NO_ESPECIFICADO
+
+    @staticmethod
+    def _resumen(materia, tipo_proceso, resultado, actor, demandado, resolutiva: Optional[str]) -> str:
+        """Resumen extractivo: datos del caso y comienzo de la parte resolutiva"""
+        partes = f"{actor} c/ {demandado}" if actor != NO_ESPECIFICADO else "partes no especificadas"
+        resumen = f"Fallo {materia.lower()} ({tipo_proceso}), {partes}. Resultado: {resultado}."
+        if resolutiva:
+            palabras = resolutiva.lstrip(" :.,-\n").split()[:PALABRAS_RESUMEN - len(resumen.split())]
+            resumen += " Resuelve: " + " ".join(palabras)
+        return resumen
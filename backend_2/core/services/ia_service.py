@@ -1,19 +1,57 @@
 """
 Servicio para análisis de fallos judiciales con IA (Anthropic y OpenAI)
 Solo se encarga de procesar texto con IA, no maneja archivos
+
+La salida está restringida por el esquema de AnalisisFallo (tool use en
+Anthropic, json_schema estricto en OpenAI) y se valida con pydantic.
+
+El prompt lleva solo las etiquetas candidatas que el etiquetador local
+(Aho-Corasick sobre la taxonomía y sus sinónimos) encontró en el texto.
+
+El análisis escalonado resuelve primero con el clasificador local (reglas)
+y solo escala al modelo los fallos largos o de confianza baja.
 """
 import json
 import os
+import threading
+import time
 import anthropic
 import openai
-from typing import Optional
+from pydantic import ValidationError
+from typing import Iterator, Optional
 
-from core.prompts import SYSTEM_PROMPT, generar_prompt_usuario
+from core.etiquetador import EtiquetadorLocal
+from core.json_incremental import ParserJSONIncremental
+from core.prompts import PROMPT_REPARACION_SISTEMA, SYSTEM_PROMPT, generar_prompt_reparacion, generar_prompt_usuario
+from core.schemas import AnalisisFallo, esquema_json
+from core.services.clasificador_service import MODELO_LOCAL, ClasificadorLocal
+from core.services.router_service import TRAMOS, RouterProveedores
 
 # Modelos
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-haiku-4-5-20251001")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+# Tope de cada llamada en el cliente: acota los hilos que el router abandona
+TIMEOUT_CLIENTE_SEGUNDOS = float(os.getenv("IA_TIMEOUT", "120"))
+USAR_ROUTER = os.getenv("IA_ROUTER", "1") == "1"
+
+# Candidatas del etiquetador local en el prompt; con menos de MIN_CANDIDATAS
+# se envía la taxonomía completa
+USAR_CANDIDATAS = os.getenv("IA_CANDIDATAS", "1") == "1"
+MIN_CANDIDATAS = int(os.getenv("IA_MIN_CANDIDATAS", "3"))
+
+# Análisis escalonado: el nivel local alcanza si la confianza llega al umbral
+# y el fallo es corto (por defecto, el tramo "corto" del router)
+USAR_ESCALONADO = os.getenv("IA_ESCALONADO", "0") == "1"
+CONFIANZA_MINIMA = float(os.getenv("IA_CONFIANZA_MINIMA", "0.75"))
+MAX_CARACTERES_LOCAL = int(os.getenv("IA_MAX_CARACTERES_LOCAL", str(TRAMOS[0][1])))
+
+HERRAMIENTA_ANALISIS = "registrar_analisis"
+
+
+def _ms_desde(inicio: float) -> int:
+    return int((time.perf_counter() - inicio) * 1000)
+
 
 class IAService:
     """Servicio que conecta con Anthropic y OpenAI para analizar fallos judiciales."""
@@ -23,16 +61,164 @@ class IAService:
         anthropic_key = os.getenv("ANTHROPIC_API_KEY")
         if not anthropic_key:
             raise ValueError("ANTHROPIC_API_KEY no está configurada en las variables de entorno")
-        self.anthropic_client = anthropic.Anthropic(api_key=anthropic_key)
+        self.anthropic_client = anthropic.Anthropic(api_key=anthropic_key, timeout=TIMEOUT_CLIENTE_SEGUNDOS)
         self.anthropic_model = ANTHROPIC_MODEL
 
         # OpenAI
         openai_key = os.getenv("OPENAI_API_KEY")
         if not openai_key:
             raise ValueError("OPENAI_API_KEY no está configurada en las variables de entorno")
-        self.openai_client = openai.OpenAI(api_key=openai_key)
+        self.openai_client = openai.OpenAI(api_key=openai_key, timeout=TIMEOUT_CLIENTE_SEGUNDOS)
         self.openai_model = OPENAI_MODEL
 
+        self.herramienta_anthropic = {
+            "name": HERRAMIENTA_ANALISIS,
+            "description": "Registra el análisis estructurado del fallo judicial",
+            "input_schema": esquema_json(),
+        }
+        self.metricas_salida: dict[str, dict] = {}
+        self.metricas_niveles = {"local": 0, "escalados_confianza": 0, "escalados_largo": 0}
+        self._lock_salidas = threading.Lock()
+        self.etiquetador = EtiquetadorLocal()
+        self.clasificador = ClasificadorLocal(etiquetador=self.etiquetador)
+
+        # Elige proveedor por pedido (latencia, errores y costo), con failover y hedging
+        self.router = RouterProveedores({
+            "anthropic": self.analizar_fallo_anthropic,
+            "openai": self.analizar_fallo_openai,
+        })
+
+    # ------------------------------------------------------------------
+    # Llamadas con salida restringida por esquema
+    # ------------------------------------------------------------------
+
+    def _llamar_anthropic(self, system: str, contenido: str) -> tuple:
+        """Tool use forzado: la salida son los argumentos de la herramienta"""
+        try:
+            response = self.anthropic_client.messages.create(
+                model=self.anthropic_model,
+                max_tokens=2000,
+                system=system,
+                tools=[self.herramienta_anthropic],
+                tool_choice={"type": "tool", "name": HERRAMIENTA_ANALISIS},
+                messages=[{"role": "user", "content": contenido}]
+            )
+        except anthropic.APIError as e:
+            raise ValueError(f"Error de la API de Anthropic: {e}")
+
+        return self._salida_anthropic(response)
+
+    @staticmethod
+    def _salida_anthropic(response) -> tuple:
+        """Argumentos de la herramienta (o el texto, si Claude no la usó), uso y modelo"""
+        salida = next(
+            (b.input for b in response.content if b.type == "tool_use" and b.name == HERRAMIENTA_ANALISIS),
+            "".join(b.text for b in response.content if b.type == "text")
+        )
+        uso = {"input_tokens": response.usage.input_tokens, "output_tokens": response.usage.output_tokens}
+        return salida, uso, response.model
+
+    def _llamar_openai(self, system: str, contenido: str) -> tuple:
+        """response_format json_schema en modo estricto"""
+        try:
+            response = self.openai_client.chat.completions.create(
+                model=self.openai_model,
+                max_tokens=2000,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": HERRAMIENTA_ANALISIS, "schema": esquema_json(estricto=True), "strict": True},
+                },
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": contenido}
+                ]
+            )
+        except openai.APIError as e:
+            raise ValueError(f"Error de la API de OpenAI: {e}")
+
+        mensaje = response.choices[0].message
+        if getattr(mensaje, "refusal", None):
+            raise ValueError(f"OpenAI rechazó el pedido: {mensaje.refusal}")
+        uso = {"input_tokens": response.usage.prompt_tokens, "output_tokens": response.usage.completion_tokens}
+        return mensaje.content or "", uso, response.model
+
+    def _prompt_usuario(self, texto_fallo: str, etiquetas: Optional[list[str]]) -> str:
+        """Prompt con las etiquetas candidatas del texto (solo con la taxonomía base)"""
+        candidatas = None
+        if USAR_CANDIDATAS and etiquetas is None:
+            candidatas = [nombre for nombre, _ in self.etiquetador.candidatas(texto_fallo)]
+            if len(candidatas) < MIN_CANDIDATAS:
+                candidatas = None
+        return generar_prompt_usuario(texto_fallo, etiquetas, candidatas)
+
+    def _validar(self, salida) -> AnalisisFallo:
+        if isinstance(salida, str):
+            salida = self._parsear_respuesta_json(salida)
+        return AnalisisFallo.model_validate(salida)
+
+    def _analizar(self, provider: str, llamar, texto_fallo: str, etiquetas: Optional[list[str]]) -> dict:
+        """
+        Llamada principal y, si la salida no valida, una reparación dirigida:
+        se envían solo la salida y los errores, no el fallo completo.
+        """
+        if not texto_fallo or not texto_fallo.strip():
+            raise ValueError("El texto del fallo está vacío")
+
+        salida, uso, modelo = llamar(SYSTEM_PROMPT, self._prompt_usuario(texto_fallo, etiquetas))
+        resultado, uso, reparado = self._validar_o_reparar(provider, llamar, salida, uso)
+
+        return {
+            "provider": provider,
+            "modelo": modelo,
+            "resultado": resultado.model_dump(),
+            "uso": uso,
+            "reparado": reparado,
+        }
+
+    def _validar_o_reparar(self, provider: str, llamar, salida, uso: dict) -> tuple:
+        """Valida la salida; si no cumple el esquema, una única reparación dirigida"""
+        try:
+            resultado = self._validar(salida)
+        except (ValidationError, ValueError) as e:
+            salida_reparada, uso_reparacion, _ = llamar(
+                PROMPT_REPARACION_SISTEMA,
+                generar_prompt_reparacion(salida if isinstance(salida, str) else json.dumps(salida, ensure_ascii=False), e)
+            )
+            try:
+                resultado = self._validar(salida_reparada)
+            except (ValidationError, ValueError) as error_final:
+                self._registrar_salida(provider, "invalidas", uso, uso_reparacion)
+                raise ValueError(f"La respuesta de {provider} no cumple el esquema tras la reparación: {error_final}")
+            self._registrar_salida(provider, "reparadas", reparacion=uso_reparacion)
+            return resultado, {clave: uso[clave] + uso_reparacion[clave] for clave in uso}, True
+
+        self._registrar_salida(provider, "validas")
+        return resultado, uso, False
+
+    def _registrar_salida(self, provider: str, resultado: str, descartado: Optional[dict] = None, reparacion: Optional[dict] = None):
+        with self._lock_salidas:
+            metricas = self.metricas_salida.setdefault(
+                provider, {"validas": 0, "reparadas": 0, "invalidas": 0, "tokens_desperdiciados": 0}
+            )
+            metricas[resultado] += 1
+            for uso in (descartado, reparacion):
+                if uso:
+                    metricas["tokens_desperdiciados"] += uso["input_tokens"] + uso["output_tokens"]
+
+    def estadisticas_salida(self) -> dict:
+        """Por proveedor: salidas válidas, reparadas e inválidas, tasa de fallas de parseo y tokens desperdiciados"""
+        with self._lock_salidas:
+            resumen = {}
+            for provider, metricas in self.metricas_salida.items():
+                total = metricas["validas"] + metricas["reparadas"] + metricas["invalidas"]
+                fallas = metricas["reparadas"] + metricas["invalidas"]
+                resumen[provider] = {**metricas, "tasa_falla_parseo": round(fallas / total, 4) if total else 0.0}
+            return resumen
+
+    # ------------------------------------------------------------------
+    # Análisis por proveedor
+    # ------------------------------------------------------------------
+
     def analizar_fallo_anthropic(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
         """
         Analiza un fallo judicial usando Claude (Haiku 3.5)
@@ -44,35 +230,66 @@ class IAService:
         Returns:
             Dict con análisis estructurado y métricas de uso
         """
+        return self._analizar("anthropic", self._llamar_anthropic, texto_fallo, etiquetas)
+
+    def analizar_fallo_stream(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> Iterator[dict]:
+        """
+        Analiza un fallo con Claude en streaming: cada campo del análisis se
+        emite apenas su valor está completo, sin esperar al resto
+
+        Args:
+            texto_fallo: Texto completo del fallo judicial
+            etiquetas: Lista opcional de etiquetas oficiales
+
+        Yields:
+            {"evento": "campo", "campo": ..., "valor": ..., "ms": ...} por campo y al final
+            {"evento": "fin", "resultado": ..., "uso": ..., "reparado": ..., "ms": ...}
+            con el análisis validado (o reparado)
+        """
         if not texto_fallo or not texto_fallo.strip():
             raise ValueError("El texto del fallo está vacío")
 
-        prompt_usuario = generar_prompt_usuario(texto_fallo, etiquetas)
-
+        inicio = time.perf_counter()
+        parser = ParserJSONIncremental()
         try:
-            response = self.anthropic_client.messages.create(
+            with self.anthropic_client.messages.stream(
                 model=self.anthropic_model,
                 max_tokens=2000,
                 system=SYSTEM_PROMPT,
-                messages=[{"role": "user", "content": prompt_usuario}]
-            )
-
-            respuesta_texto = response.content[0].text
-            resultado = self._parsear_respuesta_json(respuesta_texto)
-
-            return {
-                "provider": "anthropic",
-                "modelo": response.model,
-                "resultado": resultado,
-                "uso": {
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens,
-                }
-            }
-
+                tools=[self.herramienta_anthropic],
+                tool_choice={"type": "tool", "name": HERRAMIENTA_ANALISIS},
+                messages=[{"role": "user", "content": self._prompt_usuario(texto_fallo, etiquetas)}]
+            ) as stream:
+                for evento in stream:
+                    if evento.type != "content_block_delta":
+                        continue
+                    # input_json_delta (herramienta) o text_delta si respondió en texto
+                    fragmento = getattr(evento.delta, "partial_json", None) or getattr(evento.delta, "text", None)
+                    for campo, valor in parser.alimentar(fragmento or ""):
+                        yield {"evento": "campo", "campo": campo, "valor": valor, "ms": _ms_desde(inicio)}
+                response = stream.get_final_message()
         except anthropic.APIError as e:
+            self.router.registrar_pedido("anthropic", texto_fallo, time.perf_counter() - inicio, error=True)
             raise ValueError(f"Error de la API de Anthropic: {e}")
 
+        salida, uso, modelo = self._salida_anthropic(response)
+        try:
+            resultado, uso, reparado = self._validar_o_reparar("anthropic", self._llamar_anthropic, salida, uso)
+        except ValueError:
+            self.router.registrar_pedido("anthropic", texto_fallo, time.perf_counter() - inicio, error=True)
+            raise
+        # Mismas estadísticas que los pedidos del router (latencia, tokens y costo)
+        self.router.registrar_pedido("anthropic", texto_fallo, time.perf_counter() - inicio, uso)
+        yield {
+            "evento": "fin",
+            "provider": "anthropic",
+            "modelo": modelo,
+            "resultado": resultado.model_dump(),
+            "uso": uso,
+            "reparado": reparado,
+            "ms": _ms_desde(inicio),
+        }
+
     def analizar_fallo_openai(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
         """
         Analiza un fallo judicial usando OpenAI (GPT-4o mini)
@@ -84,41 +301,12 @@ class IAService:
         Returns:
             Dict con análisis estructurado y métricas de uso
         """
-        if not texto_fallo or not texto_fallo.strip():
-            raise ValueError("El texto del fallo está vacío")
-
-        prompt_usuario = generar_prompt_usuario(texto_fallo, etiquetas)
-
-        try:
-            response = self.openai_client.chat.completions.create(
-                model=self.openai_model,
-                max_tokens=2000,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt_usuario}
-                ]
-            )
-
-            respuesta_texto = response.choices[0].message.content
-            resultado = self._parsear_respuesta_json(respuesta_texto)
-
-            return {
-                "provider": "openai",
-                "modelo": response.model,
-                "resultado": resultado,
-                "uso": {
-                    "input_tokens": response.usage.prompt_tokens,
-                    "output_tokens": response.usage.completion_tokens,
-                }
-            }
-
-        except openai.APIError as e:
-            raise ValueError(f"Error de la API de OpenAI: {e}")
+        return self._analizar("openai", self._llamar_openai, texto_fallo, etiquetas)
 
     def _parsear_respuesta_json(self, respuesta: str) -> dict:
         """
-        Extrae y parsea el JSON de la respuesta.
-        Maneja casos donde la IA envuelve el JSON en markdown.
+        Extrae y parsea el JSON de una respuesta de texto (si el proveedor
+        no respetó el formato estructurado). Maneja el JSON envuelto en markdown.
         """
         limpio = respuesta.replace("```json", "").replace("```", "").strip()
 
@@ -135,10 +323,100 @@ class IAService:
 
             raise ValueError(f"No se pudo parsear la respuesta como JSON: {respuesta[:200]}")
 
+    def analizar_fallo_con_router(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
+        """
+        Analiza un fallo con el proveedor que elija el router
+
+        Returns:
+            Dict con análisis estructurado, métricas de uso y "router"
+            (proveedores intentados, errores y si respondió un hedge)
+        """
+        return self.router.analizar(texto_fallo, etiquetas)
+
+    def analizar_fallos_lote(
+        self,
+        textos: list[str],
+        etiquetas: Optional[list[str]] = None,
+        concurrencia: int = 4
+    ) -> list[dict]:
+        """Etiquetado masivo vía router; {"error": ...} para los fallos que no se pudieron analizar"""
+        return self.router.analizar_lote(textos, etiquetas, concurrencia)
+
+    def analizar_fallo_escalonado(
+        self,
+        texto_fallo: str,
+        etiquetas: Optional[list[str]] = None,
+        confianza_minima: Optional[float] = None
+    ) -> dict:
+        """
+        Análisis en dos niveles: clasificador local y, si no alcanza, el modelo
+        (vía router, o solo Anthropic con IA_ROUTER=0). Un fallo largo se escala
+        salvo que sea una resolución interlocutoria: esa decide la confianza.
+
+        Args:
+            texto_fallo: Texto completo del fallo judicial
+            etiquetas: Lista opcional de etiquetas oficiales
+            confianza_minima: Umbral del nivel local (por defecto IA_CONFIANZA_MINIMA)
+
+        Returns:
+            Dict como analizar_fallo_con_router, más "nivel" (1 local, 2 modelo),
+            "confianza" del nivel local y "escalado" (None, "confianza" o "largo")
+        """
+        umbral = CONFIANZA_MINIMA if confianza_minima is None else confianza_minima
+        inicio = time.perf_counter()
+        local = self.clasificador.clasificar(texto_fallo, etiquetas)
+
+        if len(texto_fallo) > MAX_CARACTERES_LOCAL and not local["detalle"]["interlocutorio"]:
+            escalado = "largo"
+        elif local["confianza"] < umbral:
+            escalado = "confianza"
+        else:
+            escalado = None
+
+        with self._lock_salidas:
+            self.metricas_niveles["local" if escalado is None else f"escalados_{escalado}"] += 1
+
+        if escalado is None:
+            return {
+                "provider": "local",
+                "modelo": MODELO_LOCAL,
+                "resultado": local["resultado"],
+                "uso": {"input_tokens": 0, "output_tokens": 0},
+                "reparado": False,
+                "nivel": 1,
+                "confianza": local["confianza"],
+                "escalado": None,
+                "ms": _ms_desde(inicio),
+            }
+
+        if USAR_ROUTER:
+            resp = self.analizar_fallo_con_router(texto_fallo, etiquetas)
+        else:
+            resp = self.analizar_fallo_anthropic(texto_fallo, etiquetas)
+        return {**resp, "nivel": 2, "confianza": local["confianza"], "escalado": escalado, "ms": _ms_desde(inicio)}
+
+    def estadisticas_niveles(self) -> dict:
+        """Fallos resueltos en el nivel local y escalados al modelo (por motivo)"""
+        with self._lock_salidas:
+            total = sum(self.metricas_niveles.values())
+            return {
+                **self.metricas_niveles,
+                "tasa_local": round(self.metricas_niveles["local"] / total, 4) if total else 0.0,
+            }
+
+    def estadisticas_proveedores(self) -> dict:
+        """Latencia, errores, hedges, tokens y costo acumulados por proveedor"""
+        return self.router.estadisticas()
+
     # Alias de compatibilidad
     def analizar_fallo(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
-        """Alias para analizar_fallo_anthropic (compatibilidad)"""
-        resp = self.analizar_fallo_anthropic(texto_fallo, etiquetas)
+        """Análisis vía router (IA_ROUTER=0 vuelve a usar solo Anthropic; IA_ESCALONADO=1 prueba antes el nivel local)"""
+        if USAR_ESCALONADO:
+            resp = self.analizar_fallo_escalonado(texto_fallo, etiquetas)
+        elif USAR_ROUTER:
+            resp = self.analizar_fallo_con_router(texto_fallo, etiquetas)
+        else:
+            resp = self.analizar_fallo_anthropic(texto_fallo, etiquetas)
         return resp["resultado"]
 
     def etiquetar_fallo(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
@@ -0,0 +1,329 @@
+"""
+Router de proveedores de IA para el análisis de fallos
+
+Elige el proveedor de cada pedido según estadísticas en vivo:
+- latencia observada por tramo de largo del fallo (corto, medio, largo)
+- tasa de errores (promedio móvil) y corte temporal tras fallas seguidas
+- costo estimado del pedido (tokens del fallo x precio del proveedor)
+
+Si el proveedor elegido falla o no responde a tiempo, pasa al siguiente
+(failover). Si tarda más que su p90 habitual, lanza el mismo pedido a un
+segundo proveedor y se queda con la primera respuesta (hedging). Así el
+etiquetado masivo mantiene el ritmo aunque un proveedor se degrade.
+
+Las llamadas son sincrónicas (clientes de Anthropic y OpenAI), por eso
+corren en un pool de hilos. Un pedido abandonado (vencido o que perdió la
+carrera) no se puede interrumpir: termina en segundo plano, su respuesta se
+descarta pero su latencia, tokens y costo se registran igual (si no, un
+proveedor lento que siempre pierde el hedge seguiría primero para siempre).
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+# Precios por MTok (input/output), los mismos que usa procesar_fallo.py
+PRECIOS_MTOK = {
+    "anthropic": {"input": 0.80, "output": 4.00},
+    "openai": {"input": 0.15, "output": 0.60},
+}
+
+TIMEOUT_SEGUNDOS = float(os.getenv("IA_ROUTER_TIMEOUT", "90"))
+HEDGING = os.getenv("IA_ROUTER_HEDGING", "1") == "1"
+HEDGE_SEGUNDOS = float(os.getenv("IA_ROUTER_HEDGE", "20"))  # deadline mientras no hay historial
+HEDGE_PERCENTIL = 90
+SEGUNDOS_POR_CENTAVO = float(os.getenv("IA_ROUTER_SEGUNDOS_POR_CENTAVO", "2"))  # peso del costo
+EXPLORACION = float(os.getenv("IA_ROUTER_EXPLORACION", "0.05"))
+FALLAS_PARA_CORTAR = 3
+ENFRIAMIENTO_SEGUNDOS = 30.0
+MIN_MUESTRAS = 5
+VENTANA = 200
+
+# Tramos por cantidad de caracteres del fallo
+TRAMOS = (("corto", 15_000), ("medio", 50_000), ("largo", None))
+# Latencia supuesta (segundos) mientras un tramo tiene menos de MIN_MUESTRAS
+LATENCIA_PREVIA = {"corto": 10.0, "medio": 20.0, "largo": 40.0}
+TOKENS_PROMPT = 1_500  # system prompt + instrucciones + etiquetas
+
+
+def tramo_de(texto: str) -> str:
+    for nombre, limite in TRAMOS:
+        if limite is None or len(texto) < limite:
+            return nombre
+    return TRAMOS[-1][0]
+
+
+def costo_usd(proveedor: str, input_tokens: int, output_tokens: int) -> float:
+    precio = PRECIOS_MTOK.get(proveedor, {"input": 0.0, "output": 0.0})
+    return (input_tokens / 1_000_000) * precio["input"] + (output_tokens / 1_000_000) * precio["output"]
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(int(len(ordenados) * p / 100), len(ordenados) - 1)]
+
+
+class EstadisticasProveedor:
+    """Métricas de un proveedor (protegidas por el lock del router)"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.latencias = {tramo: deque(maxlen=VENTANA) for tramo, _ in TRAMOS}
+        self.pedidos = 0
+        self.exitos = 0
+        self.errores = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedges_ganados = 0
+        self.abandonados = 0
+        self.tasa_error = 0.0
+        self.fallas_seguidas = 0
+        self.cortado_hasta = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.costo_usd = 0.0
+        self.salida_promedio = 800.0
+
+    def disponible(self, ahora: float) -> bool:
+        return ahora >= self.cortado_hasta
+
+    def latencia_estimada(self, tramo: str) -> float:
+        """Mediana del tramo; con pocas muestras, su promedio completado con LATENCIA_PREVIA"""
+        muestras = self.latencias[tramo]
+        if len(muestras) < MIN_MUESTRAS:
+            return (sum(muestras) + LATENCIA_PREVIA[tramo] * (MIN_MUESTRAS - len(muestras))) / MIN_MUESTRAS
+        return _percentil(list(muestras), 50)
+
+    def deadline_hedge(self, tramo: str) -> float:
+        muestras = self.latencias[tramo]
+        if len(muestras) < MIN_MUESTRAS:
+            return HEDGE_SEGUNDOS
+        return _percentil(list(muestras), HEDGE_PERCENTIL)
+
+    def registrar_exito(self, tramo: str, segundos: float, uso: dict):
+        self.exitos += 1
+        self.fallas_seguidas = 0
+        self.tasa_error *= 0.9
+        self.latencias[tramo].append(segundos)
+        self.registrar_uso(uso)
+        self.salida_promedio = 0.9 * self.salida_promedio + 0.1 * uso.get("output_tokens", self.salida_promedio)
+
+    def registrar_uso(self, uso: dict):
+        self.input_tokens += uso.get("input_tokens", 0)
+        self.output_tokens += uso.get("output_tokens", 0)
+        self.costo_usd += costo_usd(self.nombre, uso.get("input_tokens", 0), uso.get("output_tokens", 0))
+
+    def registrar_error(self, timeout: bool = False):
+        if timeout:
+            self.timeouts += 1
+        else:
+            self.errores += 1
+        self.tasa_error = 0.9 * self.tasa_error + 0.1
+        self.fallas_seguidas += 1
+        if self.fallas_seguidas >= FALLAS_PARA_CORTAR:
+            # Corte temporal: vuelve a probarse después del enfriamiento
+            self.cortado_hasta = time.monotonic() + ENFRIAMIENTO_SEGUNDOS
+            self.fallas_seguidas = FALLAS_PARA_CORTAR - 1
+
+    def resumen(self) -> dict:
+        todas = [s for muestras in self.latencias.values() for s in muestras]
+        return {
+            "pedidos": self.pedidos,
+            "exitos": self.exitos,
+            "errores": self.errores,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedges_ganados": self.hedges_ganados,
+            "abandonados": self.abandonados,
+            "tasa_error": round(self.tasa_error, 3),
+            "cortado": not self.disponible(time.monotonic()),
+            "latencia_p50": round(_percentil(todas, 50), 2) if todas else None,
+            "latencia_p95": round(_percentil(todas, 95), 2) if todas else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "costo_usd": round(self.costo_usd, 6),
+        }
+
+
+class RouterProveedores:
+    """Elige proveedor por pedido, con failover y hedging"""
+
+    def __init__(self, proveedores: dict[str, Callable[..., dict]], max_hilos: int = 16):
+        """
+        Args:
+            proveedores: nombre → función(texto_fallo, etiquetas) que devuelve
+                {"provider", "modelo", "resultado", "uso"} (ver IAService)
+            max_hilos: llamadas simultáneas a los proveedores
+        """
+        self.proveedores = proveedores
+        self.stats = {nombre: EstadisticasProveedor(nombre) for nombre in proveedores}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="ia-router")
+
+    def puntaje(self, nombre: str, texto: str) -> float:
+        """Segundos equivalentes: latencia + costo + penalización por errores (menor es mejor)"""
+        stats = self.stats[nombre]
+        tramo = tramo_de(texto)
+        input_tokens = len(texto) / 3.5 + TOKENS_PROMPT
+        centavos = costo_usd(nombre, input_tokens, stats.salida_promedio) * 100
+        latencia = stats.latencia_estimada(tramo)
+        return (latencia + centavos * SEGUNDOS_POR_CENTAVO) / max(1.0 - stats.tasa_error, 0.05)
+
+    def _registrar_abandonado(self, futuro: Future, nombre: str, tramo: str, inicio: float, vencido: bool):
+        """
+        Registra un pedido que siguió corriendo después de perder la carrera
+        o de vencer. Uno vencido ya contó como error: solo suma su costo.
+        """
+        if futuro.cancelled():
+            return
+
+        def al_terminar(hecho: Future):
+            segundos = time.monotonic() - inicio
+            error = hecho.exception()
+            with self._lock:
+                stats = self.stats[nombre]
+                stats.abandonados += 1
+                if error is not None:
+                    if not vencido:
+                        stats.registrar_error()
+                elif vencido:
+                    stats.registrar_uso(hecho.result().get("uso", {}))
+                else:
+                    stats.registrar_exito(tramo, segundos, hecho.result().get("uso", {}))
+
+        futuro.add_done_callback(al_terminar)
+
+    def ordenar(self, texto: str) -> list[str]:
+        """Proveedores en orden de preferencia; los cortados van al final"""
+        ahora = time.monotonic()
+        with self._lock:
+            orden = sorted(
+                self.proveedores,
+                key=lambda n: (not self.stats[n].disponible(ahora), self.puntaje(n, texto))
+            )
+        # Algo de exploración para que las estadísticas del resto no envejezcan
+        if len(orden) > 1 and random.random() < EXPLORACION and self.stats[orden[1]].disponible(ahora):
+            orden[0], orden[1] = orden[1], orden[0]
+        return orden
+
+    def analizar(self, texto_fallo: str, etiquetas: Optional[list[str]] = None) -> dict:
+        """
+        Analiza el fallo con el mejor proveedor disponible.
+
+        Returns:
+            La respuesta del proveedor que ganó, con "router": proveedores
+            intentados, errores y si respondió un hedge.
+
+        Raises:
+            ValueError: si el texto está vacío o ningún proveedor respondió
+        """
+        if not texto_fallo or not texto_fallo.strip():
+            raise ValueError("El texto del fallo está vacío")
+
+        tramo = tramo_de(texto_fallo)
+        candidatos = iter(self.ordenar(texto_fallo))
+        en_vuelo: dict[Future, tuple[str, float, bool]] = {}
+        intentados: list[str] = []
+        errores: list[str] = []
+
+        def lanzar(es_hedge: bool = False) -> Optional[str]:
+            nombre = next(candidatos, None)
+            if nombre is None:
+                return None
+            with self._lock:
+                self.stats[nombre].pedidos += 1
+                if es_hedge:
+                    self.stats[nombre].hedges += 1
+            futuro = self._pool.submit(self.proveedores[nombre], texto_fallo, etiquetas)
+            en_vuelo[futuro] = (nombre, time.monotonic(), es_hedge)
+            intentados.append(nombre)
+            return nombre
+
+        primero = lanzar()
+        with self._lock:
+            hedge_en = time.monotonic() + min(self.stats[primero].deadline_hedge(tramo), TIMEOUT_SEGUNDOS)
+        if not HEDGING:
+            hedge_en = None
+
+        while en_vuelo:
+            proximo_vencimiento = min(inicio for _, inicio, _ in en_vuelo.values()) + TIMEOUT_SEGUNDOS
+            limite = min(proximo_vencimiento, hedge_en) if hedge_en else proximo_vencimiento
+            hechos, _ = wait(list(en_vuelo), timeout=max(limite - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+
+            for futuro in hechos:
+                nombre, inicio, es_hedge = en_vuelo.pop(futuro)
+                try:
+                    respuesta = futuro.result()
+                except Exception as e:
+                    with self._lock:
+                        self.stats[nombre].registrar_error()
+                    errores.append(f"{nombre}: {e}")
+                    continue
+
+                with self._lock:
+                    self.stats[nombre].registrar_exito(tramo, time.monotonic() - inicio, respuesta.get("uso", {}))
+                    if es_hedge:
+                        self.stats[nombre].hedges_ganados += 1
+                for pendiente, (otro, otro_inicio, _) in en_vuelo.items():
+                    pendiente.cancel()  # solo tiene efecto si todavía no empezó
+                    self._registrar_abandonado(pendiente, otro, tramo, otro_inicio, vencido=False)
+                respuesta["router"] = {"intentados": intentados, "errores": errores, "hedge": es_hedge}
+                return respuesta
+
+            ahora = time.monotonic()
+            for futuro, (nombre, inicio, _) in list(en_vuelo.items()):
+                if ahora - inicio >= TIMEOUT_SEGUNDOS:
+                    del en_vuelo[futuro]
+                    futuro.cancel()
+                    with self._lock:
+                        self.stats[nombre].registrar_error(timeout=True)
+                    self._registrar_abandonado(futuro, nombre, tramo, inicio, vencido=True)
+                    errores.append(f"{nombre}: sin respuesta en {TIMEOUT_SEGUNDOS:.0f}s")
+
+            if hedge_en and ahora >= hedge_en:
+                # Hedging: el primero sigue en carrera contra el siguiente proveedor
+                hedge_en = None
+                lanzar(es_hedge=True)
+            elif not en_vuelo:
+                # Failover: todos los lanzados fallaron o vencieron
+                lanzar()
+
+        raise ValueError(f"Ningún proveedor pudo analizar el fallo: {'; '.join(errores)}")
+
+    def registrar_pedido(self, nombre: str, texto: str, segundos: float,
+                         uso: Optional[dict] = None, error: bool = False):
+        """Pedido hecho por fuera de analizar (streaming): cuenta en las mismas estadísticas"""
+        with self._lock:
+            stats = self.stats[nombre]
+            stats.pedidos += 1
+            if error:
+                stats.registrar_error()
+            else:
+                stats.registrar_exito(tramo_de(texto), segundos, uso or {})
+
+    def analizar_lote(
+        self,
+        textos: list[str],
+        etiquetas: Optional[list[str]] = None,
+        concurrencia: int = 4
+    ) -> list[dict]:
+        """
+        Analiza varios fallos en paralelo. Cada elemento es la respuesta del
+        proveedor o {"error": mensaje} si ninguno pudo analizarlo.
+        """
+        def uno(texto: str) -> dict:
+            try:
+                return self.analizar(texto, etiquetas)
+            except ValueError as e:
+                return {"error": str(e)}
+
+        # Pool aparte: las tareas del lote esperan a las del pool de proveedores
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="ia-lote") as pool:
+            return list(pool.map(uno, textos))
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {nombre: stats.resumen() for nombre, stats in self.stats.items()}
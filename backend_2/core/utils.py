@@ -5,7 +5,6 @@ Utilidades para manejo de archivos y descargas
 - Conversión de formatos
 """
 import os
-import requests
 from pathlib import Path
 from typing import Union, Optional
 from urllib.parse import urlparse
@@ -156,6 +155,8 @@ def descargar_pdf_desde_url(url: str, ruta_destino: Optional[Union[str, Path]] =
         ValueError: Si la URL no es válida o no apunta a un PDF
         requests.RequestException: Si hay error al descargar
     """
+    import requests
+
     # Validar URL
     parsed = urlparse(url)
     if not parsed.scheme or not parsed.netloc:
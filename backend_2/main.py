@@ -5,6 +5,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+from api.routes import fallo
+
 app = FastAPI(
     title="Juris - Backend API",
     description="Motor de Inteligencia Jurídica y Búsqueda Semántica para la Jurisprudencia Argentina",
@@ -22,6 +24,7 @@ app.add_middleware(
 
 
 # Incluide routers 
+app.include_router(fallo.router, prefix="/api/fallo", tags=["fallo"])
 
 
 
@@ -0,0 +1,6 @@
+"""
+Código compartido por backend y backend_2 (solo biblioteca estándar)
+
+Se instala como dependencia de las dos aplicaciones:
+pip install -e ../comun
+"""
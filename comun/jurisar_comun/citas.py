@@ -0,0 +1,108 @@
+"""
+Extractor determinístico de citas de leyes, códigos y artículos
+
+Sobre texto plegado: "art. 245 de la LCT", "art 232 LCT", "arts. 232, 233
+y 245 LCT" y "Ley 20.744, art. 245" quedan todas como ("LEY 20744", "245").
+Cada norma citada cuenta además como (norma, '') (cita de la norma). Lo usan
+el índice fallo_normas de backend y el clasificador local de backend_2.
+"""
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from jurisar_comun.taxonomia import plegar
+
+# (norma normalizada, nombre completo, siglas) sobre texto plegado. El orden
+# importa: los nombres más largos antes que sus prefijos ("codigo civil y
+# comercial" antes que "codigo civil", "c.p.c.c." antes que "c.p.")
+CODIGOS = (
+    ("LEY 20744", r"ley de contrato de trabajo", r"l\.?c\.?t\.?"),
+    ("CCYC", r"codigo civil y comercial(?: de la nacion)?", r"c\.?c\.?y\.?c\.?(?:n\.?)?|cccn"),
+    ("CODIGO CIVIL", r"codigo civil", r"c\.?\s*c\.?"),
+    ("CPCC", r"codigo procesal civil(?: y comercial)?", r"c\.?p\.?c\.?(?:c\.?)?"),
+    ("CPP", r"codigo procesal penal", r"c\.?p\.?p\.?"),
+    ("CODIGO PENAL", r"codigo penal", r"c\.?\s*p\.?"),
+    ("CONSTITUCION NACIONAL", r"constitucion nacional", r"c\.?\s*n\.?"),
+    ("CONSTITUCION DE JUJUY", r"constitucion (?:provincial|de (?:la provincia de )?jujuy)", None),
+)
+# Sin un artículo delante, las siglas sueltas ("c.p.", "cn") dan falsos
+# positivos: la cita directa solo acepta leyes y nombres completos
+CODIGOS_ARTICULO = tuple((norma, f"{nombre}|{siglas}" if siglas else nombre) for norma, nombre, siglas in CODIGOS)
+CODIGOS_NOMBRE = tuple((norma, nombre) for norma, nombre, _ in CODIGOS)
+
+_FIN = r"(?![a-z0-9])"
+_NUMERO_ARTICULO = r"\d+(?:\s*bis)?"
+
+
+def _norma(sufijo: str, codigos) -> str:
+    ley = rf"(?P<ley{sufijo}>ley(?:es)?\s+(?:nacional\s+|provincial\s+)?(?:n(?:ro|°|º|o)?\.?\s*)?(?P<numero{sufijo}>\d{{1,2}}\.?\d{{3}}))"
+    alias = "|".join(rf"(?P<c{i}{sufijo}>{patron}){_FIN}" for i, (_, patron) in enumerate(codigos))
+    return rf"(?:{ley}{_FIN}|{alias})"
+
+
+def _articulos(sufijo: str) -> str:
+    return (
+        rf"\bart(?:iculos?|s?)\.?\s*(?P<arts{sufijo}>{_NUMERO_ARTICULO}"
+        rf"(?:\s*(?:,|y|e|-)\s*{_NUMERO_ARTICULO})*){_FIN}"
+    )
+
+
+# "art. 245 [inc. b,] de la ley 20.744" | "ley 20.744[, art. 245]"
+CITA = re.compile(
+    _articulos("a")
+    + r"\s*,?\s*(?:inc(?:iso)?s?\.?\s*[a-z0-9]{1,3}\)?\s*,?\s*)?(?:(?:de la|del|de)\s+)?"
+    + _norma("a", CODIGOS_ARTICULO)
+    + "|"
+    + r"\b" + _norma("b", CODIGOS_NOMBRE)
+    + r"(?:\s*,?\s*(?:en su |y su |en el )?" + _articulos("b") + ")?"
+)
+_ARTICULO = re.compile(_NUMERO_ARTICULO)
+
+MAX_ARTICULO = 20
+
+
+def _leer_cita(m: re.Match, sufijo: str, codigos) -> Tuple[Optional[str], List[str]]:
+    if m.group(f"ley{sufijo}"):
+        norma = "LEY " + m.group(f"numero{sufijo}").replace(".", "")
+    else:
+        norma = next((n for i, (n, _) in enumerate(codigos) if m.group(f"c{i}{sufijo}")), None)
+    arts = m.group(f"arts{sufijo}")
+    articulos = [" ".join(a.upper().split()) for a in _ARTICULO.findall(arts)] if arts else []
+    return norma, articulos
+
+
+def extraer_citas(texto: str) -> Counter:
+    """
+    Citas normalizadas del texto: (norma, articulo) → menciones.
+    Cada norma cuenta también como (norma, '').
+    """
+    citas = Counter()
+    if not texto:
+        return citas
+    for m in CITA.finditer(plegar(texto)):
+        if m.group("artsa") is not None:
+            norma, articulos = _leer_cita(m, "a", CODIGOS_ARTICULO)
+        else:
+            norma, articulos = _leer_cita(m, "b", CODIGOS_NOMBRE)
+        if norma is None:
+            continue
+        citas[(norma, "")] += 1
+        for articulo in articulos:
+            citas[(norma, articulo[:MAX_ARTICULO])] += 1
+    return citas
+
+
+def formatear_cita(norma: str, articulo: str) -> str:
+    """Forma de lectura: "LEY 20744 ART 245" (o solo la norma)"""
+    return f"{norma} ART {articulo}" if articulo else norma
+
+
+def interpretar_consulta(consulta: str) -> Tuple[str, str]:
+    """
+    Norma y artículo de un filtro escrito por el usuario ("art 245 LCT",
+    "Ley 20744 Art 245", "ley 20.744"). Sin artículo devuelve ''.
+    """
+    citas = [cita for cita in extraer_citas(consulta) if cita[1]] or list(extraer_citas(consulta))
+    if not citas:
+        raise ValueError(f"No se reconoce la norma: {consulta!r} (Ej: 'art 245 LCT', 'Ley 20744 Art 245')")
+    return citas[0]
@@ -0,0 +1,193 @@
+"""
+Taxonomía SAIJ y etiquetador Aho-Corasick compartidos
+
+Única copia de ETIQUETAS_SAIJ_BASE, SINONIMOS_SAIJ y del autómata que las
+busca en el texto (sin tildes ni mayúsculas, con límites de palabra y
+plurales). La usan backend y backend_2; solo depende de la biblioteca
+estándar.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # dependencia opcional (pyahocorasick): sin ella se usa el autómata en Python
+    ahocorasick = None
+
+# Etiquetas base de la taxonomía SAIJ (ejemplo inicial)
+ETIQUETAS_SAIJ_BASE = [
+    "DESPIDO",
+    "INDEMNIZACION",
+    "ACCIDENTE DE TRANSITO",
+    "DAÑOS Y PERJUICIOS",
+    "RESPONSABILIDAD OBJETIVA",
+    "RESPONSABILIDAD SUBJETIVA",
+    "SEGURO DE RESPONSABILIDAD CIVIL",
+    "ACCION DE AMPARO",
+    "RECURSO DE APELACION",
+    "RECURSO DE INCONSTITUCIONALIDAD",
+    "NULIDAD",
+    "CONTRATO DE TRABAJO",
+    "PREAVISO",
+    "ANTIGÜEDAD",
+    "HORAS EXTRAS",
+    "ALIMENTOS",
+    "TENENCIA",
+    "REGIMEN DE VISITAS",
+    "DIVORCIO",
+    "SUCESION",
+    "HOMICIDIO",
+    "LESIONES",
+    "ROBO",
+    "HURTO",
+    "ESTAFA",
+    "PRESCRIPCION",
+    "CADUCIDAD",
+    "COSTAS",
+    "HONORARIOS",
+    "MEDIDA CAUTELAR",
+    "EMBARGO",
+    "INHIBICION",
+    "EJECUCION DE SENTENCIA",
+    "COSA JUZGADA",
+    "DEBIDO PROCESO",
+    "DERECHO DE DEFENSA",
+    "PRUEBA",
+    "PERICIA",
+    "TESTIGO",
+    "COMPETENCIA",
+]
+
+# Expresiones frecuentes en los fallos → etiqueta oficial (etiquetado local)
+SINONIMOS_SAIJ = {
+    "DESPIDO": [
+        "finalización del contrato", "extinción del contrato de trabajo", "distracto",
+        "despido incausado", "despido indirecto", "ruptura del vínculo laboral",
+    ],
+    "INDEMNIZACION": ["resarcimiento", "reparación integral", "monto indemnizatorio"],
+    "ACCIDENTE DE TRANSITO": ["siniestro vial", "colisión vehicular", "choque", "embestimiento"],
+    "DAÑOS Y PERJUICIOS": ["daño moral", "lucro cesante", "daño emergente", "incapacidad sobreviniente"],
+    "SEGURO DE RESPONSABILIDAD CIVIL": ["citada en garantía", "compañía aseguradora", "póliza"],
+    "ACCION DE AMPARO": ["amparo", "acción expedita y rápida"],
+    "RECURSO DE APELACION": ["apelación", "recurso de alzada", "expresión de agravios"],
+    "RECURSO DE INCONSTITUCIONALIDAD": ["inconstitucionalidad", "planteo de inconstitucionalidad"],
+    "CONTRATO DE TRABAJO": ["relación laboral", "vínculo laboral", "ley de contrato de trabajo", "LCT"],
+    "PREAVISO": ["indemnización sustitutiva de preaviso", "falta de preaviso"],
+    "HORAS EXTRAS": ["horas suplementarias", "jornada extraordinaria"],
+    "ALIMENTOS": ["cuota alimentaria", "obligación alimentaria", "prestación alimentaria"],
+    "TENENCIA": ["cuidado personal"],
+    "REGIMEN DE VISITAS": ["régimen de comunicación", "régimen comunicacional"],
+    "SUCESION": ["juicio sucesorio", "declaratoria de herederos", "acervo hereditario"],
+    "LESIONES": ["lesiones graves", "lesiones leves", "lesiones culposas"],
+    "ESTAFA": ["defraudación", "ardid"],
+    "PRESCRIPCION": ["prescripción liberatoria", "acción prescripta"],
+    "CADUCIDAD": ["caducidad de instancia", "perención"],
+    "HONORARIOS": ["regulación de honorarios", "emolumentos"],
+    "MEDIDA CAUTELAR": ["medida precautoria", "prohibición de innovar", "medida de no innovar"],
+    "EMBARGO": ["embargo preventivo", "embargo ejecutorio", "traba de embargo"],
+    "INHIBICION": ["inhibición general de bienes"],
+    "EJECUCION DE SENTENCIA": ["ejecución de la sentencia", "trámite de ejecución"],
+    "DEBIDO PROCESO": ["garantía del debido proceso", "defensa en juicio"],
+    "PRUEBA": ["carga de la prueba", "onus probandi", "material probatorio"],
+    "PERICIA": ["dictamen pericial", "perito", "informe pericial"],
+    "TESTIGO": ["prueba testimonial", "declaración testimonial"],
+    "COMPETENCIA": ["incompetencia", "cuestión de competencia"],
+}
+
+_SIN_TILDES = {ord(c): unicodedata.normalize("NFD", c)[0] for c in "áéíóúàèìòùâêîôûäëïöüñç"}
+_ESPACIOS = re.compile(r"\s+")
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas, sin tildes y con espacios simples"""
+    return _ESPACIOS.sub(" ", texto.lower().translate(_SIN_TILDES))
+
+
+def _es_limite(texto: str, posicion: int) -> bool:
+    return posicion < 0 or posicion >= len(texto) or not texto[posicion].isalnum()
+
+
+class AutomataEtiquetas:
+    """Aho-Corasick sobre texto plegado: término → etiqueta, con límites de palabra"""
+
+    def __init__(self, terminos: Dict[str, str]):
+        self.terminos: Dict[str, str] = {}
+        for termino, etiqueta in terminos.items():
+            plegado = plegar(termino).strip()
+            if plegado:
+                # Plurales: "despidos", "lesiones" → misma etiqueta
+                for variante in (plegado, plegado + "s", plegado + "es"):
+                    self.terminos.setdefault(variante, etiqueta)
+
+        if ahocorasick is not None:
+            self._automata = ahocorasick.Automaton()
+            for termino, etiqueta in self.terminos.items():
+                self._automata.add_word(termino, (len(termino), etiqueta))
+            self._automata.make_automaton()
+        else:
+            self._construir()
+
+    def _construir(self):
+        """Trie con enlaces de falla (BFS); cada nodo acumula las salidas de su sufijo"""
+        self._hijos: List[Dict[str, int]] = [{}]
+        self._falla: List[int] = [0]
+        self._salidas: List[List[Tuple[int, str]]] = [[]]
+
+        for termino, etiqueta in self.terminos.items():
+            nodo = 0
+            for caracter in termino:
+                siguiente = self._hijos[nodo].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._hijos)
+                    self._hijos[nodo][caracter] = siguiente
+                    self._hijos.append({})
+                    self._falla.append(0)
+                    self._salidas.append([])
+                nodo = siguiente
+            self._salidas[nodo].append((len(termino), etiqueta))
+
+        # Los hijos de la raíz fallan a la raíz; el resto, por niveles
+        cola = list(self._hijos[0].values())
+        for nodo in cola:
+            for caracter, hijo in self._hijos[nodo].items():
+                falla = self._falla[nodo]
+                while falla and caracter not in self._hijos[falla]:
+                    falla = self._falla[falla]
+                self._falla[hijo] = self._hijos[falla].get(caracter, 0)
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._falla[hijo]]
+                cola.append(hijo)
+
+    def _coincidencias(self, plegado: str) -> Iterable[Tuple[int, int, str]]:
+        """(fin, largo, etiqueta) de cada término que termina en cada posición"""
+        if ahocorasick is not None:
+            return ((fin, largo, etiqueta) for fin, (largo, etiqueta) in self._automata.iter(plegado))
+
+        hijos, falla, salidas = self._hijos, self._falla, self._salidas
+        encontradas = []
+        nodo = 0
+        for fin, caracter in enumerate(plegado):
+            siguiente = hijos[nodo].get(caracter)
+            while siguiente is None and nodo:
+                nodo = falla[nodo]
+                siguiente = hijos[nodo].get(caracter)
+            nodo = siguiente or 0
+            if salidas[nodo]:
+                encontradas.extend((fin, largo, etiqueta) for largo, etiqueta in salidas[nodo])
+        return encontradas
+
+    def buscar(self, texto: str) -> Counter:
+        """Apariciones de cada etiqueta (términos que empiezan o terminan juntos cuentan una vez)"""
+        plegado = plegar(texto)
+        inicios, fines = set(), set()
+        conteo = Counter()
+        for fin, largo, etiqueta in self._coincidencias(plegado):
+            inicio = fin - largo + 1
+            if (inicio, etiqueta) in inicios or (fin, etiqueta) in fines:
+                continue
+            if _es_limite(plegado, inicio - 1) and _es_limite(plegado, fin + 1):
+                inicios.add((inicio, etiqueta))
+                fines.add((fin, etiqueta))
+                conteo[etiqueta] += 1
+        return conteo